@@ -8,6 +8,7 @@ from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import Platform
 
 from .const import DOMAIN
+from .code_library import async_close_code_libraries
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -50,6 +51,9 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry):
     unloaded = await hass.config_entries.async_unload_platforms(entry, platforms)
     if unloaded:
         hass.data.get(DOMAIN, {}).pop(entry.entry_id, None)
+        if not hass.data.get(DOMAIN):
+            # The libraries are shared, closed with the last entry
+            await async_close_code_libraries(hass)
     return unloaded
 
 async def update_listener(hass: HomeAssistant, entry: ConfigEntry):
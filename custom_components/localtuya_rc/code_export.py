@@ -0,0 +1,208 @@
+"""
+Export of stored codes to files, for backups and for moving codes to another
+hub or Home Assistant instance.
+
+Formats:
+  - json: {device: {command: code}}, read back by code_import
+  - yaml: the same as YAML
+  - flipper: a directory with a Flipper Zero .ir file per device
+
+write_codes() takes the codes from an iterator and writes them one at a time,
+so the file is never built in memory. Files are written next to the target
+and replace it once complete.
+
+With decode, codes given as durations ("raw", "pronto", "broadlink") are
+decoded device by device (see rc_batch.canonical_commands()) and a decoded
+form is written next to the code: {"code": "raw:...", "decoded": "nec:..."}.
+Flipper files get a parsed signal instead of the raw one.
+"""
+
+import itertools
+import json
+import os
+
+try:
+    from . import rc_batch
+    from . import rc_encoder
+    from .code_import import FLIPPER_PROTOCOLS, FLIPPER_SUFFIX
+    from .tuya_codec import base64_to_pulses
+except ImportError:
+    import rc_batch
+    import rc_encoder
+    from code_import import FLIPPER_PROTOCOLS, FLIPPER_SUFFIX
+    from tuya_codec import base64_to_pulses
+
+EXPORT_FORMATS = ("json", "yaml", "flipper")
+# Suffix of the exported file; flipper exports are directories
+EXPORT_SUFFIXES = {"json": ".json", "yaml": ".yaml", "flipper": ""}
+
+# RC_CONVERTERS format -> Flipper protocol name, the first name of FLIPPER_PROTOCOLS
+FLIPPER_NAMES = {fmt: name for name, fmt in reversed(FLIPPER_PROTOCOLS.items())}
+
+FLIPPER_HEADER = "Filetype: IR signals file\nVersion: 1\n"
+FLIPPER_FREQUENCY = 38000
+FLIPPER_DUTY_CYCLE = 0.33
+
+
+def _by_device(codes):
+    # (device, commands) with the (device, command, code) of one device together
+    for device, group in itertools.groupby(codes, key=lambda entry: entry[0]):
+        yield device, [(command, code) for _, command, code in group]
+
+
+def _with_decoded(commands, decode):
+    # (command, code, decoded or None)
+    if not decode:
+        return [(command, code, None) for command, code in commands]
+    decoded = rc_batch.canonical_commands(code for _, code in commands)
+    return [
+        (command, code, new if new != code else None)
+        for (command, code), new in zip(commands, decoded)
+    ]
+
+
+def _json_value(code, decoded):
+    if decoded is None:
+        return json.dumps(code)
+    return json.dumps({"code": code, "decoded": decoded})
+
+
+def _write_json(f, devices):
+    f.write("{")
+    for i, (device, commands) in enumerate(devices):
+        f.write(",\n" if i else "\n")
+        f.write(f"  {json.dumps(device)}: {{")
+        for j, (command, code, decoded) in enumerate(commands):
+            f.write(",\n" if j else "\n")
+            f.write(f"    {json.dumps(command)}: {_json_value(code, decoded)}")
+        f.write("\n  }")
+    f.write("\n}\n")
+
+
+def _write_yaml(f, devices):
+    # JSON strings are valid YAML double-quoted scalars
+    for device, commands in devices:
+        f.write(f"{json.dumps(device)}:\n")
+        for command, code, decoded in commands:
+            if decoded is None:
+                f.write(f"  {json.dumps(command)}: {json.dumps(code)}\n")
+            else:
+                f.write(f"  {json.dumps(command)}:\n")
+                f.write(f"    code: {json.dumps(code)}\n")
+                f.write(f"    decoded: {json.dumps(decoded)}\n")
+
+
+def _flipper_bytes(value):
+    # 7 -> "07 00 00 00", bytes are little-endian
+    return " ".join(f"{b:02X}" for b in value.to_bytes(4, "little"))
+
+
+def flipper_signal(command, code):
+    """
+    Build the lines of a Flipper signal.
+
+    Protocol codes with just an address and a command are written as parsed
+    signals, everything else as raw durations.
+
+    Args:
+        command (str): The name of the signal.
+        code (str): The command string.
+
+    Returns:
+        str: The lines of the signal.
+
+    Raises:
+        ValueError: If the code is not an IR code or cannot be encoded.
+    """
+    fmt, _, data = code.partition(":")
+    name = FLIPPER_NAMES.get(fmt)
+    if name is not None:
+        try:
+            params = dict(item.split("=") for item in data.split(","))
+            if set(params) == {"addr", "cmd"}:
+                addr, cmd = int(params["addr"], 0), int(params["cmd"], 0)
+                rc_encoder.compile_command(code)
+                if name == "RC5" and cmd > 0x3F:
+                    # Flipper's RC5 has 6 command bits, RC5X 7
+                    name = "RC5X"
+                return f"name: {command}\ntype: parsed\nprotocol: {name}\n" \
+                    f"address: {_flipper_bytes(addr)}\ncommand: {_flipper_bytes(cmd)}\n"
+        except (ValueError, OverflowError):
+            pass
+    if fmt == "tuya":
+        pulses = base64_to_pulses(data)
+    elif fmt in ("rf", "rfraw"):
+        raise ValueError("RF codes cannot be written to .ir files")
+    else:
+        pulses = rc_encoder.rc_auto_encode(code)
+    return f"name: {command}\ntype: raw\nfrequency: {FLIPPER_FREQUENCY}\n" \
+        f"duty_cycle: {FLIPPER_DUTY_CYCLE:.6f}\ndata: {' '.join(map(str, pulses))}\n"
+
+
+def _write_flipper(f, commands):
+    # Returns the number of signals that could not be written
+    skipped = 0
+    f.write(FLIPPER_HEADER)
+    for command, code, decoded in commands:
+        try:
+            signal = flipper_signal(command, decoded or code)
+        except ValueError:
+            skipped += 1
+            continue
+        f.write("#\n")
+        f.write(signal)
+    return skipped
+
+
+def _file_name(device):
+    # The device as a file name
+    return "".join("_" if c in '/\\:*?"<>|' else c for c in device) or "_"
+
+
+def write_codes(path, codes, fmt="json", decode=False):
+    """
+    Write codes to a file, or to a directory of files for the flipper format.
+
+    Blocking, run it in the executor.
+
+    Args:
+        path (str): The file, or the directory for the flipper format.
+        codes (iterable of tuple): (device, command, code), grouped by device.
+        fmt (str, optional): One of EXPORT_FORMATS. Defaults to "json".
+        decode (bool, optional): Write decoded forms next to codes given as durations.
+
+    Returns:
+        tuple: (number of codes written, number of codes that could not be written).
+
+    Raises:
+        ValueError: If the format is unknown.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    count = skipped = 0
+
+    def devices():
+        nonlocal count
+        for device, commands in _by_device(codes):
+            count += len(commands)
+            yield device, _with_decoded(commands, decode)
+
+    if fmt == "flipper":
+        os.makedirs(path, exist_ok=True)
+        for device, commands in devices():
+            file = os.path.join(path, _file_name(device) + FLIPPER_SUFFIX)
+            with open(file + ".tmp", "w", encoding="utf-8") as f:
+                skipped += _write_flipper(f, commands)
+            os.replace(file + ".tmp", file)
+        return count - skipped, skipped
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        if fmt == "json":
+            _write_json(f, devices())
+        else:
+            _write_yaml(f, devices())
+    os.replace(path + ".tmp", path)
+    return count, skipped
@@ -0,0 +1,469 @@
+"""
+Bulk import of IR codes from files of other tools.
+
+Supported:
+  - Flipper Zero .ir files (parsed and raw signals)
+  - LIRC lircd.conf files (raw_codes and space/pulse or RC5 encoded codes)
+  - JSON codes files: the codes of Home Assistant's Broadlink integration
+    (.storage/broadlink_remote_<mac>_codes, or .json files of the same form)
+    and files written by code_export
+
+Flipper and LIRC files are read line by line and every signal is converted as
+soon as it is complete, so even large files and directories are never held in
+memory. JSON files are read whole, their codes are decoded as one batch (see
+rc_batch.canonical_commands()).
+read_codes() yields (device, command, code, error) for every signal, with
+code in the "fmt:data" form rc_auto_encode() accepts.
+
+Run as:
+    python code_import.py <file or directory>...
+to print the converted codes as tab separated device, command and code.
+"""
+
+import json
+import os
+import sys
+
+try:
+    from . import rc_batch
+    from . import rc_encoder
+except ImportError:
+    import rc_batch
+    import rc_encoder
+
+FLIPPER_SUFFIX = ".ir"
+LIRC_SUFFIX = ".conf"
+JSON_SUFFIX = ".json"
+# Name of the codes files of the Broadlink integration: broadlink_remote_<mac>_codes
+BROADLINK_STORAGE_PREFIX = "broadlink_remote_"
+BROADLINK_STORAGE_SUFFIX = "_codes"
+
+# Flipper protocol name -> RC_CONVERTERS format. Flipper's Kaseikyo address
+# packs the vendor and genre fields differently, such signals are skipped.
+FLIPPER_PROTOCOLS = {
+    "NEC": "nec",
+    "NECext": "nec-ext",
+    "NEC42": "nec42",
+    "NEC42ext": "nec42-ext",
+    "Samsung32": "samsung32",
+    "RC5": "rc5",
+    "RC5X": "rc5",
+    "RC6": "rc6",
+    "SIRC": "sirc",
+    "SIRC15": "sirc15",
+    "SIRC20": "sirc20",
+    "RCA": "rca",
+    "Pioneer": "pioneer",
+}
+
+
+def _decode(pulses):
+    # A known protocol if one matches, "raw:..." otherwise
+    code = rc_encoder.rc_auto_decode(pulses)
+    if code.startswith("raw:"):
+        # Checks the durations fit the Tuya payload
+        rc_encoder.compile_command(code)
+    return code
+
+
+def _flipper_value(value):
+    # "07 00 00 00" -> 7, bytes are little-endian
+    return int.from_bytes(bytes.fromhex(value), "little")
+
+
+def flipper_signal_code(signal):
+    """
+    Convert one Flipper signal to a command string.
+
+    Args:
+        signal (dict): The key/value lines of the signal ("type", "protocol", ...).
+
+    Returns:
+        str: The code. Raw signals are decoded if a known protocol matches,
+            "raw:..." otherwise.
+
+    Raises:
+        ValueError: If the signal cannot be converted.
+    """
+    kind = signal.get("type")
+    if kind == "parsed":
+        protocol = signal.get("protocol")
+        fmt = FLIPPER_PROTOCOLS.get(protocol)
+        if fmt is None:
+            raise ValueError(f"Unsupported protocol: {protocol}")
+        addr = _flipper_value(signal.get("address", ""))
+        cmd = _flipper_value(signal.get("command", ""))
+        code = f"{fmt}:addr=0x{addr:02X},cmd=0x{cmd:02X}"
+        # Checks the ranges of the encoder
+        rc_encoder.compile_command(code)
+        return code
+    if kind == "raw":
+        pulses = [int(v) for v in signal.get("data", "").split()]
+        if not pulses:
+            raise ValueError("Raw signal without data")
+        return _decode(pulses)
+    raise ValueError(f"Unknown signal type: {kind}")
+
+
+def read_flipper(lines):
+    """
+    Parse the lines of a Flipper .ir file.
+
+    Yields:
+        tuple: (command, code, error) for every signal; code is None and error
+            a message if the signal cannot be converted.
+    """
+    signal = {}
+
+    def finish():
+        name = signal.get("name")
+        if name is None:
+            return None
+        try:
+            return name, flipper_signal_code(signal), None
+        except ValueError as e:
+            return name, None, str(e)
+
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        key, sep, value = line.partition(":")
+        if not sep:
+            continue
+        key, value = key.strip(), value.strip()
+        if key == "name":
+            # A new signal starts
+            result = finish()
+            if result:
+                yield result
+            signal = {}
+        signal[key] = value
+    result = finish()
+    if result:
+        yield result
+
+
+# lircd.conf flags of encodings lirc_pulses() cannot build
+LIRC_UNSUPPORTED_FLAGS = frozenset({"RC6", "RCMM", "GRUNDIG", "BO", "XMP", "SERIAL", "SPACE_FIRST"})
+# lircd.conf parameters with a pulse and a space
+_LIRC_PAIRS = frozenset({"header", "one", "zero", "pre", "post", "foot", "repeat"})
+
+
+def _lirc_value(value):
+    # Codes are usually hex, timings decimal (leading zeros are allowed)
+    if value[:2].lower() == "0x":
+        return int(value, 16)
+    return int(value)
+
+
+def _lirc_bits(value, bits, reverse):
+    # The bits of a field, most significant first unless REVERSE is set
+    order = range(bits) if reverse else range(bits - 1, -1, -1)
+    return [(value >> i) & 1 for i in order]
+
+
+def lirc_pulses(remote, code):
+    """
+    Build the durations of one frame of an encoded lircd.conf code.
+
+    Args:
+        remote (dict): The parameters of the remote ("flags", "bits", "one", ...).
+        code (int): The code of the button.
+
+    Returns:
+        list of int: The pulse and space durations, starting and ending with a pulse.
+
+    Raises:
+        ValueError: If the encoding is not supported or the remote has no timings.
+    """
+    flags = remote.get("flags", frozenset())
+    unsupported = flags & LIRC_UNSUPPORTED_FLAGS
+    if unsupported:
+        raise ValueError(f"Unsupported encoding: {'|'.join(sorted(unsupported))}")
+    if "one" not in remote or "zero" not in remote:
+        raise ValueError("Remote without one/zero timings")
+    biphase = bool(flags & {"RC5", "SHIFT_ENC"})
+    reverse = "REVERSE" in flags
+    one, zero = remote["one"], remote["zero"]
+    values = []
+
+    def add(duration, is_pulse):
+        # Even indexes are pulses; consecutive pulses or spaces are joined
+        if not duration or (not values and not is_pulse):
+            return
+        if (len(values) % 2 == 0) == is_pulse:
+            values.append(duration)
+        else:
+            values[-1] += duration
+
+    def add_pair(pair):
+        if pair:
+            add(pair[0], True)
+            add(pair[1], False)
+
+    def add_bits(value, bits):
+        for bit in _lirc_bits(value, bits, reverse):
+            if biphase and bit:
+                # Manchester: a one is a space followed by a pulse
+                add(one[1], False)
+                add(one[0], True)
+            else:
+                add_pair(one if bit else zero)
+
+    add_pair(remote.get("header"))
+    add(remote.get("plead"), True)
+    add_bits(remote.get("pre_data", 0), remote.get("pre_data_bits", 0))
+    add_pair(remote.get("pre"))
+    add_bits(code, remote.get("bits", 0))
+    add_pair(remote.get("post"))
+    add_bits(remote.get("post_data", 0), remote.get("post_data_bits", 0))
+    add(remote.get("ptrail"), True)
+    add_pair(remote.get("foot"))
+    if len(values) % 2 == 0:
+        # Must end with a pulse
+        values = values[:-1]
+    if not values:
+        raise ValueError("Empty code")
+    return values
+
+
+def read_lirc(lines):
+    """
+    Parse the lines of a lircd.conf file, which may describe many remotes.
+
+    Every button is converted as soon as its line (or, for raw codes, its
+    durations) is read. Only the first code of buttons sending several is used,
+    and repeats, gaps and the carrier frequency are ignored.
+
+    Yields:
+        tuple: (remote name, command, code, error) for every button; code is None
+            and error a message if the button cannot be converted.
+    """
+    remote = None
+    section = None
+    raw_name = None
+    raw_values = []
+
+    def finish_raw():
+        if raw_name is None:
+            return None
+        try:
+            if raw_values is None:
+                raise ValueError("Invalid raw code durations")
+            values = raw_values if len(raw_values) % 2 else raw_values[:-1]
+            if not values:
+                raise ValueError("Raw code without durations")
+            return remote.get("name"), raw_name, _decode(values), None
+        except ValueError as e:
+            return remote.get("name"), raw_name, None, str(e)
+
+    for line in lines:
+        words = line.split("#", 1)[0].split()
+        if not words:
+            continue
+        key = words[0].lower()
+        if key == "begin" and len(words) > 1:
+            section = words[1].lower()
+            if section == "remote":
+                remote = {"flags": frozenset()}
+            raw_name = None
+            raw_values = []
+            continue
+        if key == "end" and len(words) > 1:
+            if section == "raw_codes":
+                result = finish_raw()
+                if result:
+                    yield result
+            section = "remote" if words[1].lower() in ("codes", "raw_codes") else None
+            raw_name = None
+            continue
+        if remote is None:
+            continue
+        try:
+            if section == "remote":
+                if key == "flags":
+                    remote["flags"] = frozenset(
+                        flag.strip().upper() for flag in " ".join(words[1:]).split("|") if flag.strip()
+                    )
+                elif key == "name":
+                    remote["name"] = " ".join(words[1:])
+                elif key in _LIRC_PAIRS and len(words) > 2:
+                    remote[key] = (_lirc_value(words[1]), _lirc_value(words[2]))
+                elif len(words) > 1:
+                    remote[key] = _lirc_value(words[1])
+            elif section == "codes" and len(words) > 1:
+                try:
+                    yield remote.get("name"), words[0], _decode(lirc_pulses(remote, _lirc_value(words[1]))), None
+                except ValueError as e:
+                    yield remote.get("name"), words[0], None, str(e)
+            elif section == "raw_codes":
+                if key == "name":
+                    # A new button starts
+                    result = finish_raw()
+                    if result:
+                        yield result
+                    raw_name = " ".join(words[1:])
+                    raw_values = []
+                elif raw_name is not None and raw_values is not None:
+                    raw_values.extend(_lirc_value(word) for word in words)
+        except ValueError:
+            if section == "raw_codes":
+                # Reported when the button is finished
+                raw_values = None
+            # Otherwise a parameter with a value this importer does not need
+
+
+def _json_code(code):
+    # The command string of a code of a JSON file, None if it is not a code
+    if isinstance(code, dict):
+        # Exported with decoded forms
+        code = code.get("decoded") or code.get("code")
+    if isinstance(code, list):
+        # Learned as a toggle by Broadlink, two codes sent in turn
+        code = code[0] if code else None
+    if not isinstance(code, str):
+        return None
+    if code.startswith("b64:"):
+        code = code[4:]
+    if ":" not in code:
+        # Base64 has no colons, it is a Broadlink code
+        code = f"broadlink:{code}"
+    return code
+
+
+def read_json(file):
+    """
+    Parse a JSON codes file.
+
+    The file holds {device: {command: code}}, or is a Home Assistant storage
+    file with them in "data". Codes are Broadlink base64 codes (the Broadlink
+    integration) or command strings (code_export). Commands learned as toggles
+    (a list of two codes) use the first code.
+
+    Yields:
+        tuple: (device, command, code, error) for every command; Broadlink codes
+            are decoded if a protocol matches and "broadlink:..." otherwise. Code is
+            None and error a message if the command cannot be converted.
+
+    Raises:
+        ValueError: If the file is not a codes file.
+    """
+    data = json.load(file)
+    if isinstance(data, dict) and isinstance(data.get("data"), dict) and "version" in data:
+        data = data["data"]
+    if not isinstance(data, dict) or not all(isinstance(commands, dict) for commands in data.values()):
+        raise ValueError("Not a codes file")
+    entries = [
+        (device, command, _json_code(code))
+        for device, commands in data.items()
+        for command, code in commands.items()
+    ]
+    converted = rc_batch.canonical_commands(code for _, _, code in entries if code is not None)
+    converted = iter(converted)
+    for device, command, code in entries:
+        if code is None:
+            yield device, command, None, "Not a code"
+            continue
+        code = next(converted)
+        if code.startswith("rf:"):
+            # Sent as it is
+            yield device, command, code, None
+            continue
+        try:
+            # Checks codes no decoder matched
+            rc_encoder.compile_command(code)
+        except ValueError as e:
+            yield device, command, None, str(e)
+            continue
+        yield device, command, code, None
+
+
+def _read_flipper_file(lines, stem):
+    for command, code, error in read_flipper(lines):
+        yield stem, command, code, error
+
+
+def _read_lirc_file(lines, stem):
+    for remote, command, code, error in read_lirc(lines):
+        yield remote or stem, command, code, error
+
+
+def _read_json_file(file, stem):
+    return read_json(file)
+
+
+# File suffix -> reader of an open file, yielding (device, command, code, error)
+READERS = {
+    FLIPPER_SUFFIX: _read_flipper_file,
+    LIRC_SUFFIX: _read_lirc_file,
+    JSON_SUFFIX: _read_json_file,
+}
+
+
+def _reader(name):
+    # The reader of a file name, None if the file is not supported
+    stem, suffix = os.path.splitext(name)
+    reader = READERS.get(suffix.lower())
+    if reader is None and name.startswith(BROADLINK_STORAGE_PREFIX) and name.endswith(BROADLINK_STORAGE_SUFFIX):
+        reader = _read_json_file
+    return reader
+
+
+def _files(path):
+    # The file itself, or the supported files in a directory
+    if not os.path.isdir(path):
+        yield path
+        return
+    for root, dirs, names in os.walk(path):
+        dirs.sort()
+        for name in sorted(names):
+            if _reader(name) is not None:
+                yield os.path.join(root, name)
+
+
+def read_codes(path, device=None):
+    """
+    Read the codes of a file or of every supported file in a directory.
+
+    Args:
+        path (str): The file or directory.
+        device (str, optional): Device name of the codes. Defaults to the file name
+            without the suffix (Flipper), the name of the remote (LIRC) or the
+            device of the codes (JSON).
+
+    Yields:
+        tuple: (device, command, code, error) for every signal; code is None and
+            error a message if the signal cannot be converted.
+
+    Raises:
+        ValueError: If a file is not in a supported format.
+    """
+    for file in _files(path):
+        name = os.path.basename(file)
+        reader = _reader(name)
+        if reader is None:
+            raise ValueError(f"Unsupported file: {file}")
+        with open(file, encoding="utf-8", errors="replace") as f:
+            for file_device, command, code, error in reader(f, os.path.splitext(name)[0]):
+                yield device or file_device, command, code, error
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print("Usage: python code_import.py <file or directory>...", file=sys.stderr)
+        return 2
+    skipped = 0
+    for path in argv:
+        for device, command, code, error in read_codes(path):
+            if code is None:
+                skipped += 1
+                print(f"Skipped {device}/{command}: {error}", file=sys.stderr)
+            else:
+                print(f"{device}\t{command}\t{code}")
+    return 1 if skipped else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,262 @@
+"""
+Read-only IR code libraries (brand/device/command -> code), memory-mapped.
+
+A library is a pair of files built offline with write_library():
+  - <name>.data: the keys and codes, UTF-8, one after another
+  - <name>.index: a header and one fixed-size entry per key, sorted by key
+
+Both files are opened with mmap, so nothing is parsed when a library is
+opened and the pages are only read (and cached by the OS, not the process)
+when a lookup touches them. A lookup is a binary search over the index.
+
+Libraries are looked up from the LIBRARY_DIR directory of the Home Assistant
+configuration: a `device` that has no learned codes is resolved as
+"<brand>/<device>" against every library there.
+
+Build a library from a tab separated file (brand, device, command, code):
+    python code_library.py build <library path without extension> <file.tsv>
+"""
+
+import asyncio
+import bisect
+import logging
+import mmap
+import os
+import struct
+import sys
+
+try:
+    from .const import DOMAIN
+except ImportError:
+    from const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+# Directory of the libraries, relative to the configuration directory
+LIBRARY_DIR = f"{DOMAIN}_library"
+DATA_SUFFIX = ".data"
+INDEX_SUFFIX = ".index"
+
+# hass.data key of the task opening the libraries
+DATA_CODE_LIBRARIES = f"{DOMAIN}_code_libraries"
+
+_MAGIC = b"LTRCLIB1"
+# magic, number of entries
+_HEADER = struct.Struct("<8sI")
+# key offset, key length, code offset, code length (in the data file)
+_ENTRY = struct.Struct("<IIII")
+# Separates brand, device and command in a key
+_SEP = "\0"
+
+
+def library_key(brand, device, command):
+    """Return the key of a code as stored in the library."""
+    return _SEP.join((brand, device, command)).encode("utf-8")
+
+
+def write_library(path, entries):
+    """
+    Build a library from (brand, device, command, code) tuples.
+
+    The codes are written to the data file as they come; only the keys and
+    offsets are kept in memory until the index is written. Later entries with
+    the same key replace earlier ones.
+
+    Args:
+        path (str): Path of the library, without the suffixes.
+        entries (iterable of tuple): The (brand, device, command, code) strings.
+
+    Returns:
+        int: Number of codes in the library.
+    """
+    offsets = {}
+    with open(path + DATA_SUFFIX + ".tmp", "wb") as data:
+        position = 0
+        for brand, device, command, code in entries:
+            key = library_key(brand, device, command)
+            value = code.encode("utf-8")
+            data.write(key)
+            data.write(value)
+            offsets[key] = (position, len(key), position + len(key), len(value))
+            position += len(key) + len(value)
+        if position > 0xFFFFFFFF:
+            raise ValueError("Library data is larger than 4 GiB")
+    with open(path + INDEX_SUFFIX + ".tmp", "wb") as index:
+        index.write(_HEADER.pack(_MAGIC, len(offsets)))
+        for key in sorted(offsets):
+            index.write(_ENTRY.pack(*offsets[key]))
+    # Replace both files only once both are complete
+    os.replace(path + DATA_SUFFIX + ".tmp", path + DATA_SUFFIX)
+    os.replace(path + INDEX_SUFFIX + ".tmp", path + INDEX_SUFFIX)
+    return len(offsets)
+
+
+class _Keys:
+    # The sorted keys of a library as a sequence, for bisect
+    __slots__ = ("_index", "_data")
+
+    def __init__(self, index, data):
+        self._index = index
+        self._data = data
+
+    def __len__(self):
+        return (len(self._index) - _HEADER.size) // _ENTRY.size
+
+    def __getitem__(self, i):
+        key_offset, key_length, _, _ = _ENTRY.unpack_from(self._index, _HEADER.size + i * _ENTRY.size)
+        return self._data[key_offset:key_offset + key_length]
+
+
+class CodeLibrary:
+    """
+    A read-only code library opened with mmap.
+
+    Args:
+        path (str): Path of the library, without the suffixes.
+
+    Raises:
+        ValueError: If the files are not a valid library.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._index = None
+        self._data = None
+        self._count = 0
+        with open(path + INDEX_SUFFIX, "rb") as f:
+            self._index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._index) < _HEADER.size:
+            self.close()
+            raise ValueError(f"Invalid code library index: {path}{INDEX_SUFFIX}")
+        magic, self._count = _HEADER.unpack_from(self._index)
+        if magic != _MAGIC or len(self._index) != _HEADER.size + self._count * _ENTRY.size:
+            self.close()
+            raise ValueError(f"Invalid code library index: {path}{INDEX_SUFFIX}")
+        if self._count:
+            try:
+                with open(path + DATA_SUFFIX, "rb") as f:
+                    self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except OSError:
+                self.close()
+                raise
+        self._keys = _Keys(self._index, self._data)
+
+    def __len__(self):
+        return self._count
+
+    def __repr__(self):
+        return f"CodeLibrary({self.path!r}, {self._count} codes)"
+
+    def lookup(self, brand, device, command):
+        """
+        Find a code.
+
+        Returns:
+            str: The code, or None if the library does not have it.
+        """
+        if not self._count:
+            return None
+        key = library_key(brand, device, command)
+        i = bisect.bisect_left(self._keys, key)
+        if i == self._count or self._keys[i] != key:
+            return None
+        _, _, code_offset, code_length = _ENTRY.unpack_from(self._index, _HEADER.size + i * _ENTRY.size)
+        return self._data[code_offset:code_offset + code_length].decode("utf-8")
+
+    def close(self):
+        for mapped in (self._index, self._data):
+            if mapped is not None:
+                mapped.close()
+        self._index = self._data = None
+        self._count = 0
+
+
+class CodeLibraries:
+    """All libraries of a directory, looked up in name order.
+
+    Libraries that cannot be opened are logged and skipped.
+    """
+
+    def __init__(self, directory):
+        self.libraries = []
+        if not os.path.isdir(directory):
+            return
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(INDEX_SUFFIX):
+                path = os.path.join(directory, name[:-len(INDEX_SUFFIX)])
+                try:
+                    self.libraries.append(CodeLibrary(path))
+                except (OSError, ValueError) as e:
+                    _LOGGER.error("Cannot open code library %s: %s", path, e)
+
+    def lookup_device(self, device, command):
+        """
+        Find the code of a command of a "<brand>/<device>" device.
+
+        Returns:
+            str: The code, or None if no library has it.
+        """
+        brand, sep, model = device.partition("/")
+        if not sep:
+            return None
+        for library in self.libraries:
+            code = library.lookup(brand, model, command)
+            if code is not None:
+                return code
+        return None
+
+    def close(self):
+        for library in self.libraries:
+            library.close()
+        self.libraries = []
+
+
+async def async_get_code_libraries(hass):
+    """Return the CodeLibraries of the configuration, opening them on first use."""
+    task = hass.data.get(DATA_CODE_LIBRARIES)
+    if task is None:
+        directory = hass.config.path(LIBRARY_DIR)
+        task = hass.data[DATA_CODE_LIBRARIES] = asyncio.ensure_future(
+            hass.async_add_executor_job(CodeLibraries, directory)
+        )
+    try:
+        return await task
+    except Exception:
+        # Not kept, the next lookup opens them again
+        if hass.data.get(DATA_CODE_LIBRARIES) is task:
+            del hass.data[DATA_CODE_LIBRARIES]
+        raise
+
+
+async def async_close_code_libraries(hass):
+    """Close the libraries opened by async_get_code_libraries(), if any."""
+    task = hass.data.pop(DATA_CODE_LIBRARIES, None)
+    if task is None:
+        return
+    try:
+        libraries = await task
+    except Exception:
+        return
+    libraries.close()
+
+
+def _read_tsv(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if line and not line.startswith("#"):
+                yield line.split("\t", 3)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 3 or argv[0] != "build":
+        print("Usage: python code_library.py build <library path> <file.tsv>", file=sys.stderr)
+        return 2
+    count = write_library(argv[1], _read_tsv(argv[2]))
+    print(f"{count} codes written to {argv[1]}{INDEX_SUFFIX} and {argv[1]}{DATA_SUFFIX}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
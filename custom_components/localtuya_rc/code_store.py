@@ -0,0 +1,324 @@
+"""Learned codes storage, one file per hub, loaded once and kept in memory."""
+import asyncio
+import copy
+import logging
+
+from homeassistant.const import CONF_DEVICE_ID
+from homeassistant.helpers.storage import Store
+
+from .const import (
+    DOMAIN,
+    CODE_STORAGE_VERSION,
+    CODE_STORAGE_CODES,
+    CODE_STORAGE_INDEX,
+    CODE_INDEX_STORAGE_VERSION,
+)
+from .rc_encoder import compile_command
+from .tuya_codec import base64_to_pulses
+
+_LOGGER = logging.getLogger(__name__)
+
+# Seconds to wait for further changes before writing the codes to disk
+SAVE_DELAY = 10
+
+# hass.data key of the {dev_id: CodeStore} dict
+DATA_CODE_STORES = f"{DOMAIN}_code_stores"
+# hass.data key of the CodeIndex
+DATA_CODE_INDEX = f"{DOMAIN}_code_index"
+# hass.data key of the task reading the shared codes of older versions
+DATA_LEGACY_CODES = f"{DOMAIN}_legacy_codes"
+# hass.data key of the set of dev_ids of the hubs set up, YAML ones included
+DATA_CODE_HUBS = f"{DOMAIN}_code_hubs"
+# Storage key the shared codes of older versions are moved to once migrated
+CODE_STORAGE_LEGACY_BACKUP = f"{CODE_STORAGE_CODES}.backup"
+
+
+def code_storage_key(dev_id):
+    """Return the storage key of the codes of a hub."""
+    return f"{CODE_STORAGE_CODES}_{dev_id}"
+
+
+def code_record(code):
+    """
+    Build the stored record of a command string.
+
+    The record holds "payload", the Tuya base64 payload, for every IR code that
+    encodes to the same payload on every send, so sending it needs no encoding.
+    The payload is the durations packed as little-endian uint16, so raw codes
+    are stored as the payload only, without "code". Other records keep the
+    command string as "code"; RF codes, codes of toggle-bit protocols and
+    codes that cannot be encoded have no payload.
+
+    Args:
+        code (str): The command string ("nec:addr=0x01,cmd=0x02", "raw:...", "rf:...").
+
+    Returns:
+        dict: The record.
+    """
+    if code.startswith("rf:"):
+        return {"code": code}
+    try:
+        compiled = compile_command(code)
+    except ValueError:
+        # Stored as it is, the send reports the error
+        return {"code": code}
+    if compiled.toggles:
+        return {"code": code}
+    if compiled.format == "raw":
+        return {"payload": compiled.payload()}
+    return {"code": code, "payload": compiled.payload()}
+
+
+def record_code(record):
+    """Return the command string of a stored record."""
+    code = record.get("code")
+    if code is None:
+        code = "raw:" + ",".join(map(str, base64_to_pulses(record["payload"])))
+    return code
+
+
+def iter_codes(codes):
+    """Yield (device, command, code) for {device: {command: record}} codes, in name order."""
+    for device in sorted(codes):
+        commands = codes[device]
+        for command in sorted(commands):
+            yield device, command, record_code(commands[command])
+
+
+class CodeStorage(Store):
+    """Store of learned codes, migrating files of older versions."""
+
+    migrated = False
+
+    async def _async_migrate_func(self, old_major_version, old_minor_version, old_data):
+        if old_major_version == 1:
+            # Command strings to records, encoded once here instead of on every send
+            old_data = {
+                device: {command: code_record(code) for command, code in commands.items()}
+                for device, commands in old_data.items()
+            }
+            self.migrated = True
+        return old_data
+
+
+def async_get_code_store(hass, dev_id):
+    """Return the CodeStore of a hub, creating it on first use."""
+    stores = hass.data.setdefault(DATA_CODE_STORES, {})
+    code_store = stores.get(dev_id)
+    if code_store is None:
+        code_store = stores[dev_id] = CodeStore(hass, dev_id)
+    return code_store
+
+
+def async_register_hub(hass, dev_id):
+    """Record a hub being set up, so the shared codes are kept until it is migrated."""
+    hass.data.setdefault(DATA_CODE_HUBS, set()).add(dev_id)
+
+
+def async_get_code_index(hass):
+    """Return the CodeIndex, creating it on first use."""
+    index = hass.data.get(DATA_CODE_INDEX)
+    if index is None:
+        index = hass.data[DATA_CODE_INDEX] = CodeIndex(hass)
+    return index
+
+
+class CodeIndex:
+    """Which hub has the codes of which device, and which hubs were migrated.
+
+    Stored as {"hubs": {dev_id: [device, ...]}, "migrated": [dev_id, ...]},
+    so the devices of all hubs are known without loading their codes.
+    """
+
+    def __init__(self, hass):
+        self._store = Store(hass, CODE_INDEX_STORAGE_VERSION, CODE_STORAGE_INDEX)
+        self._data = None
+        self._load_lock = asyncio.Lock()
+
+    async def async_load(self):
+        """Load the index on the first call."""
+        if self._data is None:
+            async with self._load_lock:
+                if self._data is None:
+                    data = await self._store.async_load() or {}
+                    data.setdefault("hubs", {})
+                    data.setdefault("migrated", [])
+                    self._data = data
+
+    def hubs(self, device):
+        """Return the hubs having codes for the device."""
+        return [dev_id for dev_id, devices in self._data["hubs"].items() if device in devices]
+
+    def is_migrated(self, dev_id):
+        return dev_id in self._data["migrated"]
+
+    def async_set_devices(self, dev_id, devices):
+        """Record the devices of a hub and schedule a save if they changed."""
+        devices = sorted(devices)
+        if self._data["hubs"].get(dev_id, []) == devices:
+            return
+        if devices:
+            self._data["hubs"][dev_id] = devices
+        else:
+            self._data["hubs"].pop(dev_id, None)
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    def async_set_migrated(self, dev_id):
+        if dev_id not in self._data["migrated"]:
+            self._data["migrated"].append(dev_id)
+            self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    def _data_to_save(self):
+        return self._data
+
+
+class CodeStore:
+    """In-memory learned codes ({device: {command: record}}) of one hub.
+
+    The storage file is read once, by the first async_load() call, and lookups
+    are served from memory after that. Changes are written with a delayed save,
+    so a burst of learns or deletes ends up as one write, SAVE_DELAY seconds
+    after the last change (Home Assistant also writes pending saves on stop).
+
+    A hub without a storage file yet starts with a copy of the codes older
+    versions kept for all hubs in one file, since every hub could send them.
+
+    Attributes:
+        loads (int): Number of times the storage file was read.
+        changes (int): Number of changes made since the store was created.
+        saves (int): Number of times the codes were written to disk.
+    """
+
+    def __init__(self, hass, dev_id):
+        self._hass = hass
+        self._dev_id = dev_id
+        self._key = code_storage_key(dev_id)
+        self._store = CodeStorage(hass, CODE_STORAGE_VERSION, self._key)
+        self._index = async_get_code_index(hass)
+        self._codes = None
+        self._summary = None
+        self._load_lock = asyncio.Lock()
+        self.loads = 0
+        self.changes = 0
+        self.saves = 0
+
+    @property
+    def loaded(self):
+        return self._codes is not None
+
+    @property
+    def codes(self):
+        """The codes, {device: {command: record}}; empty until loaded."""
+        return self._codes if self._codes is not None else {}
+
+    @property
+    def summary(self):
+        """Device names and the number of commands, rebuilt only after a change."""
+        if self._summary is None:
+            codes = self.codes
+            self._summary = {
+                "learned_devices": sorted(codes),
+                "learned_commands_count": sum(len(commands) for commands in codes.values()),
+            }
+        return self._summary
+
+    async def async_load(self):
+        """Load the codes on the first call and return them."""
+        if self._codes is None:
+            async with self._load_lock:
+                # Another caller may have loaded them while we waited
+                if self._codes is None:
+                    await self._index.async_load()
+                    codes = await self._store.async_load()
+                    self.loads += 1
+                    if codes is None and not self._index.is_migrated(self._dev_id):
+                        codes = await self._async_migrate()
+                    codes = codes or {}
+                    _LOGGER.debug("Loaded %d device(s) from code storage '%s'", len(codes), self._key)
+                    self._codes = codes
+                    self._summary = None
+                    self._index.async_set_devices(self._dev_id, codes)
+                    if self._store.migrated:
+                        # Write the records instead of migrating on every start
+                        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+        return self._codes
+
+    async def _async_migrate(self):
+        # One-time copy of the codes shared by all hubs in older versions
+        legacy = await _async_load_legacy_codes(self._hass)
+        codes = copy.deepcopy(legacy)
+        if codes:
+            _LOGGER.info("Migrating %d device(s) from code storage '%s' to '%s'", len(codes), CODE_STORAGE_CODES, self._key)
+            await self._store.async_save(codes)
+            self.saves += 1
+        self._index.async_set_migrated(self._dev_id)
+        await self._async_remove_legacy_codes()
+        return codes
+
+    async def _async_remove_legacy_codes(self):
+        # The shared file is moved to a backup once the hubs of all config
+        # entries and YAML platforms have their own copy; a hub added later
+        # starts without codes
+        dev_ids = set(self._hass.data.get(DATA_CODE_HUBS, ()))
+        dev_ids.update(entry.data.get(CONF_DEVICE_ID) for entry in self._hass.config_entries.async_entries(DOMAIN))
+        if dev_ids and all(self._index.is_migrated(dev_id) for dev_id in dev_ids):
+            _LOGGER.info("All hubs are migrated, moving code storage '%s' to '%s'", CODE_STORAGE_CODES, CODE_STORAGE_LEGACY_BACKUP)
+            legacy = await _async_load_legacy_codes(self._hass)
+            if legacy:
+                await CodeStorage(self._hass, CODE_STORAGE_VERSION, CODE_STORAGE_LEGACY_BACKUP).async_save(legacy)
+            await CodeStorage(self._hass, CODE_STORAGE_VERSION, CODE_STORAGE_CODES).async_remove()
+            self._hass.data.pop(DATA_LEGACY_CODES, None)
+
+    def code(self, device, command):
+        """Return the command string of a command, or None if it is not stored."""
+        record = self.codes.get(device, {}).get(command)
+        return record_code(record) if record is not None else None
+
+    def async_set_code(self, device, command, code):
+        """Store the code of a command and schedule a save."""
+        self._codes.setdefault(device, {})[command] = code_record(code)
+        self._async_schedule_save()
+
+    def async_set_records(self, records):
+        """Store the records of many commands ({device: {command: record}}) with one save."""
+        if not records:
+            return
+        for device, commands in records.items():
+            self._codes.setdefault(device, {}).update(commands)
+        self._async_schedule_save()
+
+    def async_delete_code(self, device, command):
+        """Delete the code of a command, and the device once it has no commands left.
+
+        Returns:
+            bool: True if the command was found and deleted.
+        """
+        commands = self._codes.get(device)
+        if commands is None or command not in commands:
+            return False
+        del commands[command]
+        if not commands:
+            del self._codes[device]
+        self._async_schedule_save()
+        return True
+
+    def _async_schedule_save(self):
+        self._summary = None
+        self.changes += 1
+        self._index.async_set_devices(self._dev_id, self._codes)
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    def _data_to_save(self):
+        # Called by the Store when the delayed save is written
+        self.saves += 1
+        _LOGGER.debug("Saving %d device(s) to code storage '%s' (%d change(s) so far)", len(self._codes), self._key, self.changes)
+        return self._codes
+
+
+async def _async_load_legacy_codes(hass):
+    # Read the shared file once for all hubs migrating from it
+    task = hass.data.get(DATA_LEGACY_CODES)
+    if task is None:
+        store = CodeStorage(hass, CODE_STORAGE_VERSION, CODE_STORAGE_CODES)
+        task = hass.data[DATA_LEGACY_CODES] = asyncio.ensure_future(store.async_load())
+    return await task or {}
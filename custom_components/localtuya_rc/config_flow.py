@@ -6,6 +6,7 @@ import tinytuya
 from tinytuya import Contrib, Cloud
 
 from .const import *
+from .send_queue import OVERFLOW_POLICIES
 
 from homeassistant import config_entries
 from homeassistant.core import callback
@@ -463,6 +464,9 @@ class LocalTuyaIROptionsFlow(config_entries.OptionsFlow):
             # re-run its own auto-detection on next setup.
             ct_input = user_input.get(CONF_CONTROL_TYPE, "Auto")
             self.config[CONF_CONTROL_TYPE] = 0 if ct_input == "Auto" else int(ct_input)
+            self.config[CONF_TRANSPORT] = user_input.get(CONF_TRANSPORT, DEFAULT_TRANSPORT)
+            self.config[CONF_SEND_QUEUE_OVERFLOW] = user_input.get(CONF_SEND_QUEUE_OVERFLOW, DEFAULT_SEND_QUEUE_OVERFLOW)
+            self.config[CONF_MERGE_COMMANDS] = user_input.get(CONF_MERGE_COMMANDS, DEFAULT_MERGE_COMMANDS)
             _LOGGER.debug("Config updated: %s", self.config)
             self.hass.config_entries.async_update_entry(self.entry, data=self.config)
             return self.async_create_entry(data=self.config)
@@ -472,6 +476,9 @@ class LocalTuyaIROptionsFlow(config_entries.OptionsFlow):
         options_schema = vol.Schema({
             vol.Required(CONF_PERSISTENT_CONNECTION, default=self.config.get(CONF_PERSISTENT_CONNECTION, DEFAULT_PERSISTENT_CONNECTION)): cv.boolean,
             vol.Required(CONF_CONTROL_TYPE, default=ct_default): vol.In(["Auto", "1", "2"]),
+            vol.Required(CONF_TRANSPORT, default=self.config.get(CONF_TRANSPORT, DEFAULT_TRANSPORT)): vol.In(TRANSPORTS),
+            vol.Required(CONF_SEND_QUEUE_OVERFLOW, default=self.config.get(CONF_SEND_QUEUE_OVERFLOW, DEFAULT_SEND_QUEUE_OVERFLOW)): vol.In(OVERFLOW_POLICIES),
+            vol.Required(CONF_MERGE_COMMANDS, default=self.config.get(CONF_MERGE_COMMANDS, DEFAULT_MERGE_COMMANDS)): cv.boolean,
         })
 
         return self.async_show_form(
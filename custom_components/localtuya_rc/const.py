@@ -14,11 +14,37 @@ CONF_PRODUCT_CATEGORY = "product_category"
 CONF_PRODUCT_NAME = "product_name"
 CONF_PRODUCT_ID = "product_id"
 CONF_PERSISTENT_CONNECTION = "persistent_connection"
+CONF_TRANSPORT = "transport"
+CONF_SEND_QUEUE_OVERFLOW = "send_queue_overflow"
+CONF_MERGE_COMMANDS = "merge_commands"
 
 DEFAULT_PERSISTENT_CONNECTION = False
 
-CODE_STORAGE_VERSION = 1
+# How the hub is reached: tinytuya in the executor, or tuya_transport on the event loop
+TRANSPORT_TINYTUYA = "tinytuya"
+TRANSPORT_ASYNCIO = "asyncio"
+TRANSPORTS = [TRANSPORT_TINYTUYA, TRANSPORT_ASYNCIO]
+DEFAULT_TRANSPORT = TRANSPORT_TINYTUYA
+# What happens to commands sent while the send queue is full, see send_queue.OVERFLOW_POLICIES
+DEFAULT_SEND_QUEUE_OVERFLOW = "reject"
+# Join the IR codes of a send_command call into one transmission, see tuya_codec.merge_pulses()
+DEFAULT_MERGE_COMMANDS = False
+
+# 1: {device: {command: code}}
+# 2: {device: {command: record}}, see code_store.code_record()
+CODE_STORAGE_VERSION = 2
+CODE_INDEX_STORAGE_VERSION = 1
+# Per hub codes are stored as f"{CODE_STORAGE_CODES}_{dev_id}"; the key itself
+# holds the codes of all hubs written by older versions
 CODE_STORAGE_CODES = f"{DOMAIN}_codes"
+# Which hub has the codes of which device
+CODE_STORAGE_INDEX = f"{DOMAIN}_codes_index"
+
+SERVICE_IMPORT_CODES = "import_codes"
+SERVICE_EXPORT_CODES = "export_codes"
+ATTR_PATH = "path"
+ATTR_FORMAT = "format"
+ATTR_DECODE = "decode"
 
 # Tuya protocol versions in order of preference
 TUYA_VERSIONS = [3.3, 3.4, 3.5, 3.2, 3.1]
\ No newline at end of file
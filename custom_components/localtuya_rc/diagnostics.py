@@ -0,0 +1,29 @@
+"""Diagnostics support for LocalTuyaIR Remote Control."""
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_DEVICE_ID
+from homeassistant.core import HomeAssistant
+
+from .code_store import async_get_code_store, record_code
+from .const import CONF_LOCAL_KEY
+
+TO_REDACT = {CONF_LOCAL_KEY}
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry):
+    """Return diagnostics for a config entry, including all learned codes of the hub."""
+    code_store = async_get_code_store(hass, entry.data[CONF_DEVICE_ID])
+    codes = await code_store.async_load()
+    return {
+        "entry": async_redact_data(dict(entry.data), TO_REDACT),
+        "options": dict(entry.options),
+        "learned_codes": {
+            device: {command: record_code(record) for command, record in commands.items()}
+            for device, commands in codes.items()
+        },
+        "code_storage": {
+            "loads": code_store.loads,
+            "changes": code_store.changes,
+            "saves": code_store.saves,
+        },
+    }
@@ -17,12 +17,13 @@ from homeassistant.helpers.event import (
 from homeassistant.components.infrared import InfraredCommand, InfraredEmitterEntity
 
 from .const import DOMAIN
+from .tuya_codec import MAX_DURATION
 
 _LOGGER = logging.getLogger(__name__)
 
-# tinytuya's raw pulse encoder (Contrib.IRRemoteControlDevice.pulses_to_base64)
-# packs each duration as an unsigned 16-bit int.
-_MAX_PULSE_DURATION_US = 0xFFFF
+# The Tuya pulse encoder (tuya_codec.pulses_to_base64) packs each duration
+# as an unsigned 16-bit int.
+_MAX_PULSE_DURATION_US = MAX_DURATION
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities):
@@ -45,7 +46,7 @@ def _timings_to_pulses(raw_timings):
     tinytuya infers mark/space from position, not sign, so a leading space
     is dropped and same-sign runs are merged before taking abs(). Clamped
     to _MAX_PULSE_DURATION_US since some protocols' repeat-gaps (e.g. NEC's
-    ~96ms) overflow tinytuya's 16-bit encoding.
+    ~96ms) overflow the 16-bit Tuya encoding.
 
     Raises HomeAssistantError if nothing is left to send.
     """
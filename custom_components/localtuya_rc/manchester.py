@@ -1,3 +1,8 @@
+try:
+    from .pulse import Pulses
+except ImportError:
+    from pulse import Pulses
+
 def decode(values, T, bit_length, start_sequence, phase, double_bits=[], msb_first=True):
     """
     Decodes a list of values into a sequence of bytes using Manchester encoding.
@@ -17,40 +22,65 @@ def decode(values, T, bit_length, start_sequence, phase, double_bits=[], msb_fir
         ValueError: If the data length is invalid.
         ValueError: If an invalid bit sequence is encountered.
     """
-    bits = []
-    for i in range(len(values)):
-        n = round(values[i] / T)
-        bits = bits + [True] * n if i % 2 == 0 else bits + [False] * n
-
-    # Check and remove start sequence
-    if bits[:len(start_sequence)] != start_sequence:
-        raise ValueError("Invalid start sequence")
-    bits = bits[len(start_sequence):]
+    # Work on run lengths (in half-bit periods) instead of expanding every
+    # duration into a list of half-bits: even runs are marks, odd are spaces.
+    runs = [round(v / T) for v in values]
+    runs = [n if n > 0 else 0 for n in runs]
+    run_index = -1
+    run_left = 0
+    padded = False
 
-    # Check and remove double bits
-    for i in sorted(double_bits, reverse=True):
-        if bits[i * 2] != bits[i * 2 + 1] or bits[i * 2 + 2] != bits[i * 2 + 3]:
-            raise ValueError("Invalid double bit")
-        bits = bits[:i * 2 + 1] + bits[i * 2 + 3:]
+    def next_half_bit():
+        # Return the next half-bit of the capture. Past the end of the
+        # capture, the implicit trailing space yields one more False.
+        nonlocal run_index, run_left, padded
+        while run_left == 0:
+            run_index += 1
+            if run_index >= len(runs):
+                if padded:
+                    raise ValueError("Invalid data length")
+                padded = True
+                return False
+            run_left = runs[run_index]
+        run_left -= 1
+        return run_index % 2 == 0
 
-    if len(bits) % 2 == 1:
-        bits += [False]
+    # Check and skip start sequence
+    if sum(runs) < len(start_sequence):
+        raise ValueError("Invalid start sequence")
+    for expected in start_sequence:
+        if next_half_bit() != expected:
+            raise ValueError("Invalid start sequence")
 
-    if len(bits) < bit_length * 2:
-        raise ValueError(f"Invalid data length: {len(bits)} (must be at least {bit_length * 2})")
-    
-    if phase:
-        bits = [not bits[i] for i in range(len(bits))]
+    # Each double bit occupies four half-bits instead of two
+    length = sum(runs) - len(start_sequence) - 2 * len(double_bits)
+    if length % 2 == 1:
+        length += 1
+    if length < bit_length * 2:
+        raise ValueError(f"Invalid data length: {length} (must be at least {bit_length * 2})")
 
+    double_bits = set(double_bits)
     decoded = 0
     data = []
     # Decode bits in chunks of 8
     while decoded < bit_length:
         i = 0
         for bit in range(8):
-            if not bits[decoded * 2] and bits[decoded * 2 + 1]:
+            first = next_half_bit()
+            if decoded in double_bits:
+                # Both halves of a double bit are stretched to a full bit
+                if first != next_half_bit():
+                    raise ValueError("Invalid double bit")
+                second = next_half_bit()
+                if second != next_half_bit():
+                    raise ValueError("Invalid double bit")
+            else:
+                second = next_half_bit()
+            if phase:
+                first, second = not first, not second
+            if not first and second:
                 i |= 1 << (7 - bit) if msb_first else 1 << bit
-            elif bits[decoded * 2] and not bits[decoded * 2 + 1]:
+            elif first and not second:
                 pass
             else:
                 raise ValueError("Invalid bit sequence")
@@ -74,36 +104,45 @@ def encode(values, T, bit_length, start_sequence, phase, double_bits=[], msb_fir
     msb_first (bool, optional): If True, encode the most significant bit first. Defaults to True.
 
     Returns:
-    list of int: The encoded sequence of pulses.
+    Pulses: The encoded sequence of pulses.
 
     Raises:
     ValueError: If bit_length is greater than the number of bits in values.
     """
     if bit_length is not None and bit_length > len(values) * 8:
         raise ValueError(f"bit_length {bit_length} is greater than the number of bits in values")
-    bits = start_sequence[:]
+    # Merge equal neighbouring half-bits into durations as they are produced
+    pulses = Pulses()
+    last_v = None
+    duration = 0
+    for v in _encode_half_bits(values, bit_length, start_sequence, phase, double_bits, msb_first):
+        if v == last_v:
+            duration += T
+        else:
+            if duration:
+                pulses.append(duration)
+            duration = T
+            last_v = v
+    if duration:
+        pulses.append(duration)
+
+    if len(pulses) % 2 == 0:
+        pulses.pop()
+    return pulses
+
+def _encode_half_bits(values, bit_length, start_sequence, phase, double_bits, msb_first):
+    # Yield the half-bit levels of the start sequence followed by the data bits
+    yield from start_sequence
     total = 0
     for i in values:
         for bit in range(8):
-            if i & (1 << (7 - bit) if msb_first else 1 << bit):
-                bits += [True, False] if phase else [False, True]
-            else:
-                bits += [False, True] if phase else [True, False]
+            first = bool(i & (1 << (7 - bit) if msb_first else 1 << bit)) == bool(phase)
+            yield first
             if total in double_bits:
-                bits = bits[:-1] + [bits[-2], bits[-1], bits[-1]]
+                # Double bit: both halves last a full bit period
+                yield first
+                yield not first
+            yield not first
             total += 1
             if bit_length is not None and total >= bit_length:
-                break
-
-    last_v = False
-    pulses = []
-    for v in bits:
-        if len(pulses) > 0 and v == last_v:
-            pulses[-1] += T
-        else:
-            pulses.append(T)
-            last_v = v
-
-    if len(pulses) % 2 == 0:
-        pulses = pulses[:-1]
-    return pulses
\ No newline at end of file
+                return
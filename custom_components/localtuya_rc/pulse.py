@@ -1,3 +1,6 @@
+import array
+import functools
+
 MAX_ERROR_PERCENT = 25
 
 def in_range(value, target, max_error_percent=MAX_ERROR_PERCENT):
@@ -15,7 +18,151 @@ def in_range(value, target, max_error_percent=MAX_ERROR_PERCENT):
     max_error = max_error_percent / 100
     return target * (1 - max_error) <= value <= target * (1 + max_error)
 
-def distance_decode(pulses, leading_pulse, leading_gap, pulse, gap_0, gap_1, bit_length, msb_first=False, max_error_percent=MAX_ERROR_PERCENT):
+class Pulses(array.array):
+    """
+    Pulse and gap durations (microseconds) packed as unsigned 16-bit integers.
+
+    The encoders build their output in it, and it goes into a Tuya code
+    (tuya_codec.pulses_to_base64) without converting it element by element.
+    Slicing, concatenation and repetition return Pulses, and it compares
+    equal to a list or tuple of the same durations, so it can be used where
+    a list of durations was used before.
+    """
+
+    def __new__(cls, values=()):
+        return array.array.__new__(cls, "H", values)
+
+    def _wrap(self, values):
+        # New Pulses with the contents of an array('H'), copied as a block
+        result = Pulses()
+        result.extend(values)
+        return result
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._wrap(array.array.__getitem__(self, index))
+        return array.array.__getitem__(self, index)
+
+    def __add__(self, other):
+        result = self._wrap(self)
+        result.extend(other)
+        return result
+
+    def __radd__(self, other):
+        result = Pulses(other)
+        result.extend(self)
+        return result
+
+    def __iadd__(self, other):
+        self.extend(other)
+        return self
+
+    def __mul__(self, count):
+        return self._wrap(array.array.__mul__(self, count))
+
+    __rmul__ = __mul__
+
+    def __eq__(self, other):
+        if isinstance(other, (list, tuple)):
+            return len(self) == len(other) and self.tolist() == list(other)
+        return array.array.__eq__(self, other)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Pulses({self.tolist()!r})"
+
+    def __reduce__(self):
+        return (Pulses, (self.tolist(),))
+
+# bytes(bits) -> the same bits as binary digits
+_BIT_DIGITS = bytes.maketrans(b"\x00\x01", b"01")
+
+def _pack_bits(bits, bit_length, msb_first):
+    # Pack the first bit_length bools into bytes (the last one zero-padded),
+    # by parsing them as one binary number instead of bit by bit
+    if bit_length <= 0:
+        return []
+    size = (bit_length + 7) // 8
+    if msb_first:
+        digits = bytes(bits[:bit_length]).translate(_BIT_DIGITS).ljust(size * 8, b"0")
+        return list(int(digits, 2).to_bytes(size, "big"))
+    digits = bytes(bits[bit_length - 1::-1]).translate(_BIT_DIGITS)
+    return list(int(digits, 2).to_bytes(size, "little"))
+
+class Capture(tuple):
+    """
+    An immutable capture (pulse and gap durations) that memoizes bit extraction.
+
+    distance_decode() stores the bits it classifies for a given offset and timing
+    family (pulse, gap_0, gap_1, max_error_percent) on the capture, so decoders of
+    protocols sharing the same timings (NEC, NEC42, AC, Midea, ...) classify the
+    durations once and only apply their own header, bit count and checksum rules.
+    Plain lists are decoded the same way, just without the cache.
+    """
+
+    def __new__(cls, values=()):
+        capture = super().__new__(cls, values)
+        capture.bit_cache = {}
+        return capture
+
+def distance_bits(pulses, pulse, gap_0, gap_1, bit_length, offset=0, max_error_percent=MAX_ERROR_PERCENT):
+    """
+    Classify the mark/space pairs that follow a leading pulse and gap into bits.
+
+    Classification stops at the first pair that does not match the timings. For a
+    Capture, the result is cached per offset and timing family and only extended on
+    demand.
+
+    Args:
+        pulses (list of int): The list of pulse lengths to classify.
+        pulse (int): The expected length of the pulse.
+        gap_0 (int): The expected length of the gap representing a '0' bit.
+        gap_1 (int): The expected length of the gap representing a '1' bit.
+        bit_length (int): The number of bits wanted; the caller must make sure there are enough durations.
+        offset (int, optional): Index of the leading pulse. Defaults to 0.
+
+    Returns:
+        tuple: (bits, error), where bits is a list of bools (at least bit_length long unless
+        classification failed) and error is the message for the first invalid pair or None.
+    """
+    cache = getattr(pulses, "bit_cache", None)
+    key = (offset, pulse, gap_0, gap_1, max_error_percent)
+    entry = cache.get(key) if cache is not None else None
+    if entry is None:
+        entry = [[], None]
+        if cache is not None:
+            cache[key] = entry
+    bits = entry[0]
+    if len(bits) >= bit_length or entry[1] is not None:
+        return bits, entry[1]
+
+    # Same bounds as in_range(), computed once
+    max_error = max_error_percent / 100
+    pulse_min, pulse_max = pulse * (1 - max_error), pulse * (1 + max_error)
+    gap_0_min, gap_0_max = gap_0 * (1 - max_error), gap_0 * (1 + max_error)
+    gap_1_min, gap_1_max = gap_1 * (1 - max_error), gap_1 * (1 + max_error)
+    threshold = (gap_0 + gap_1) / 2
+    long_gap_v = gap_1 > gap_0
+    p = offset + 3 + len(bits) * 2
+    while len(bits) < bit_length:
+        v = pulses[p - 1]
+        if not pulse_min <= v <= pulse_max:
+            entry[1] = f"Invalid pulse length: {v}"
+            break
+        v = pulses[p]
+        if not gap_0_min <= v <= gap_0_max and not gap_1_min <= v <= gap_1_max:
+            entry[1] = f"Invalid gap length: {v}"
+            break
+        bits.append(long_gap_v if v > threshold else not long_gap_v)
+        p += 2
+    return bits, entry[1]
+
+def distance_decode(pulses, leading_pulse, leading_gap, pulse, gap_0, gap_1, bit_length, msb_first=False, max_error_percent=MAX_ERROR_PERCENT, offset=0):
     """
     Decode a sequence of pulses into bits based on provided timings and bit length.
 
@@ -28,6 +175,7 @@ def distance_decode(pulses, leading_pulse, leading_gap, pulse, gap_0, gap_1, bit
         gap_1 (int): The expected length of the gap representing a '1' bit.
         bit_length (int): The number of bits to decode.
         msb_first (bool, optional): If True, decode bits with the most significant bit first. Defaults to False.
+        offset (int, optional): Index of the leading pulse, for frames inside a longer capture. Defaults to 0.
 
     Returns:
         list of int: The decoded data as a list of bytes.
@@ -36,37 +184,17 @@ def distance_decode(pulses, leading_pulse, leading_gap, pulse, gap_0, gap_1, bit
         ValueError: If the pulse sequence does not match the expected format.
     """
     # Decode pulses into bits based on provided timings and bit_length
-    if not in_range(pulses[0], leading_pulse, max_error_percent):
-        raise ValueError(f"Invalid leading pulse length: {pulses[0]}")
-    if not in_range(pulses[1], leading_gap, max_error_percent):
-        raise ValueError(f"Invalid leading gap length: {pulses[1]}")
-    if len(pulses) < 3 + bit_length * 2:
-        raise ValueError(f"Invalid data length: {len(pulses)} (must be at least {3 + bit_length * 2})")
+    if not in_range(pulses[offset], leading_pulse, max_error_percent):
+        raise ValueError(f"Invalid leading pulse length: {pulses[offset]}")
+    if not in_range(pulses[offset + 1], leading_gap, max_error_percent):
+        raise ValueError(f"Invalid leading gap length: {pulses[offset + 1]}")
+    if len(pulses) - offset < 3 + bit_length * 2:
+        raise ValueError(f"Invalid data length: {len(pulses) - offset} (must be at least {3 + bit_length * 2})")
 
-    long_pulse_v = True if gap_1 > gap_0 else False
-    short_pulse_v = not long_pulse_v
-    decoded = 0
-    data = []
-    # Decode bits in chunks of 8
-    while decoded < bit_length:
-        i = 0
-        for bit in range(8):
-            p = 3 + decoded * 2
-            if not in_range(pulses[p - 1], pulse, max_error_percent):
-                raise ValueError(f"Invalid pulse length: {pulses[p - 1]}")
-            v = pulses[p]
-            if not in_range(v, gap_0, max_error_percent) and not in_range(v, gap_1, max_error_percent):
-                raise ValueError(f"Invalid gap length: {v}")
-            v = long_pulse_v if v > (gap_0 + gap_1) / 2 else short_pulse_v
-            if msb_first:
-                i |= (1 if v else 0) << (7 - bit) # MSB
-            else:
-                i |= (1 if v else 0) << bit # LSB
-            decoded += 1
-            if decoded == bit_length:
-                break
-        data.append(i)
-    return data
+    bits, error = distance_bits(pulses, pulse, gap_0, gap_1, bit_length, offset, max_error_percent)
+    if len(bits) < bit_length:
+        raise ValueError(error)
+    return _pack_bits(bits, bit_length, msb_first)
 
 def width_decode(pulses, leading_pulse, leading_gap, gap, pulse_0, pulse_1, bit_length, msb_first=False):
     """
@@ -133,7 +261,7 @@ def distance_encode(values, leading_pulse, leading_gap, pulse, gap_0, gap_1, bit
         msb_first (bool, optional): If True, encode the most significant bit first. If False, encode the least significant bit first. Defaults to False.
 
     Returns:
-        list of int: List of pulse and gap durations representing the encoded values.
+        Pulses: Pulse and gap durations representing the encoded values.
 
     Raises:
         ValueError: If `bit_length` is greater than the number of bits in `values`.
@@ -141,22 +269,8 @@ def distance_encode(values, leading_pulse, leading_gap, pulse, gap_0, gap_1, bit
     # Encode a list of bytes into pulses/gaps based on given timings
     if bit_length is not None and bit_length > len(values) * 8:
         raise ValueError(f"bit_length {bit_length} is greater than the number of bits in values")
-    pulses = []
-    pulses.append(leading_pulse)
-    pulses.append(leading_gap)
-    total = 0
-    for i in values:
-        for bit in range(8):
-            pulses.append(pulse)
-            if msb_first:
-                pulses.append(gap_1 if (i & (1 << (7 - bit))) > 0 else gap_0)
-            else:
-                pulses.append(gap_1 if (i & (1 << bit)) > 0 else gap_0)
-            total += 1
-            if bit_length is not None and total >= bit_length:
-                break
-        if bit_length is not None and total >= bit_length:
-            break
+    pulses = Pulses((leading_pulse, leading_gap))
+    _append_bytes(pulses, _distance_table(pulse, gap_0, gap_1, msb_first), values, bit_length)
     pulses.append(pulse)
     return pulses
 
@@ -175,7 +289,7 @@ def width_encode(values, leading_pulse, leading_gap, gap, pulse_0, pulse_1, bit_
         msb_first (bool, optional): If True, encode the most significant bit first. If False, encode the least significant bit first. Defaults to False.
 
     Returns:
-        list of int: List of pulse and gap durations representing the encoded values.
+        Pulses: Pulse and gap durations representing the encoded values.
 
     Raises:
         ValueError: If `bit_length` is greater than the number of bits in `values`.
@@ -183,20 +297,38 @@ def width_encode(values, leading_pulse, leading_gap, gap, pulse_0, pulse_1, bit_
     # Encode a list of bytes into pulses/gaps based on given timings
     if bit_length is not None and bit_length > len(values) * 8:
         raise ValueError(f"bit_length {bit_length} is greater than the number of bits in values")
-    pulses = []
-    pulses.append(leading_pulse)
-    pulses.append(leading_gap)
-    total = 0
-    for i in values:
-        for bit in range(8):
-            if msb_first:
-                pulses.append(pulse_1 if (i & (1 << (7 - bit))) > 0 else pulse_0)
-            else:
-                pulses.append(pulse_1 if (i & (1 << bit)) > 0 else pulse_0)
-            pulses.append(gap)
-            total += 1
-            if bit_length is not None and total >= bit_length:
-                break
-        if bit_length is not None and total >= bit_length:
-            break
+    pulses = Pulses((leading_pulse, leading_gap))
+    _append_bytes(pulses, _width_table(gap, pulse_0, pulse_1, msb_first), values, bit_length)
     return pulses
+
+def _bit_order(msb_first):
+    # Bit masks of a byte in transmission order
+    return [1 << (7 - bit) for bit in range(8)] if msb_first else [1 << bit for bit in range(8)]
+
+@functools.lru_cache(maxsize=64)
+def _distance_table(pulse, gap_0, gap_1, msb_first):
+    # Pulse/gap fragment (16 durations) for each of the 256 byte values
+    order = _bit_order(msb_first)
+    return tuple(
+        array.array("H", (v for mask in order for v in (pulse, gap_1 if i & mask else gap_0)))
+        for i in range(256)
+    )
+
+@functools.lru_cache(maxsize=64)
+def _width_table(gap, pulse_0, pulse_1, msb_first):
+    # Pulse/gap fragment (16 durations) for each of the 256 byte values
+    order = _bit_order(msb_first)
+    return tuple(
+        array.array("H", (v for mask in order for v in (pulse_1 if i & mask else pulse_0, gap)))
+        for i in range(256)
+    )
+
+def _append_bytes(pulses, table, values, bit_length):
+    # Append the fragments of `values`, cutting the last one at bit_length bits
+    if bit_length is None:
+        bit_length = len(values) * 8
+    full, rest = divmod(bit_length, 8)
+    for i in values[:full]:
+        pulses.extend(table[i & 0xFF])
+    if rest:
+        pulses.extend(table[values[full] & 0xFF][:rest * 2])
@@ -0,0 +1,164 @@
+"""
+Batch decoding of many captures at once (stored raw codes, imported code dumps).
+
+rc_auto_decode_batch() returns exactly what rc_auto_decode() returns for every
+capture. When NumPy is available, the captures are padded into a 2-D array and
+the mark/space classification of every distance-coded protocol (see
+rc_encoder.RC_DECODER_BITS) is done with vectorized array operations. The
+classified bits are handed to the decoders through the pulse.Capture bit cache,
+so the Python side only checks headers, inverses and checksums. Without NumPy,
+the captures are decoded one by one.
+"""
+
+import itertools
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from . import pulse
+    from . import rc_encoder
+except ImportError:
+    import pulse
+    import rc_encoder
+
+# Captures per 2-D array, bounds the memory used by one batch
+BATCH_SIZE = 1024
+
+# Decoders that decode further frames at fixed offsets: name -> frame period
+REPEATED_FRAMES = {
+    "midea": rc_encoder.MIDEA_HALF_LEN + 1,
+    "ac": 100,
+}
+# Frames classified per capture, including the first one
+MAX_FRAMES = 4
+
+def rc_auto_decode_batch(captures, batch_size=BATCH_SIZE):
+    """
+    Decode many captures at once.
+
+    Args:
+        captures (iterable of list of int): The captures (pulse and gap durations) to decode.
+        batch_size (int, optional): Number of captures classified per array. Defaults to BATCH_SIZE.
+
+    Returns:
+        list of str: For every capture, the same string rc_auto_decode() returns for it.
+    """
+    if np is None:
+        return [rc_encoder.rc_auto_decode(values) for values in captures]
+    families = _timing_families()
+    results = []
+    # One batch at a time, so the classified captures do not pile up
+    batch = []
+    for values in captures:
+        batch.append(pulse.Capture(values))
+        if len(batch) == batch_size:
+            results += _decode_batch(batch, families)
+            batch = []
+    if batch:
+        results += _decode_batch(batch, families)
+    return results
+
+def _decode_batch(captures, families):
+    _classify(captures, families)
+    return [rc_encoder.rc_auto_decode(capture) for capture in captures]
+
+def _timing_families():
+    # Distinct (pulse, gap_0, gap_1, max_error_percent) timings, with the
+    # largest number of bits any decoder reads with them, the headers of
+    # those decoders and the offsets of the frames they read
+    families = {}
+    for name, (pulse_len, gap_0, gap_1, bit_length, max_error_percent) in rc_encoder.RC_DECODER_BITS.items():
+        key = (pulse_len, gap_0, gap_1, max_error_percent)
+        max_bits, headers, offsets = families.get(key, (0, [], {0}))
+        headers.append(rc_encoder.RC_DECODER_HEADERS[name])
+        period = REPEATED_FRAMES.get(name)
+        if period is not None:
+            offsets.update(range(period, period * MAX_FRAMES, period))
+        families[key] = (max(max_bits, bit_length), headers, offsets)
+    return families
+
+def _classify(captures, families):
+    # Classify the data bits of every capture against every timing family
+    # and store the result in the capture's bit cache, in the same format
+    # pulse.distance_bits() uses
+    lengths = np.array([len(c) for c in captures])
+    width = max(max(offsets) + 3 + 2 * bit_length for bit_length, _, offsets in families.values())
+    # Zero-padded captures, one per row
+    matrix = np.zeros((len(captures), width))
+    matrix[np.arange(width) < np.minimum(lengths, width)[:, None]] = \
+        np.fromiter(itertools.chain.from_iterable(c[:width] for c in captures), dtype=float)
+    for (pulse_len, gap_0, gap_1, max_error_percent), (bit_length, headers, offsets) in families.items():
+        for offset in sorted(offsets):
+            _classify_frames(captures, matrix, lengths, offset, headers, pulse_len, gap_0, gap_1, bit_length, max_error_percent)
+
+def _classify_frames(captures, matrix, lengths, offset, headers, pulse_len, gap_0, gap_1, bit_length, max_error_percent):
+    # Only captures with a frame some decoder of this family would classify
+    wanted = np.zeros(len(captures), dtype=bool)
+    for (pulse_lo, pulse_hi), (gap_lo, gap_hi), min_length in headers:
+        wanted |= (matrix[:, offset] >= pulse_lo) & (matrix[:, offset] <= pulse_hi) & \
+            (matrix[:, offset + 1] >= gap_lo) & (matrix[:, offset + 1] <= gap_hi) & (lengths - offset >= min_length)
+    rows = np.flatnonzero(wanted)
+    if not len(rows):
+        return
+    frames = matrix[rows]
+    # Same bounds as pulse.in_range()
+    max_error = max_error_percent / 100
+    marks = frames[:, offset + 2:offset + 2 + 2 * bit_length:2]
+    spaces = frames[:, offset + 3:offset + 3 + 2 * bit_length:2]
+    marks_ok = (marks >= pulse_len * (1 - max_error)) & (marks <= pulse_len * (1 + max_error))
+    spaces_ok = ((spaces >= gap_0 * (1 - max_error)) & (spaces <= gap_0 * (1 + max_error))) | \
+        ((spaces >= gap_1 * (1 - max_error)) & (spaces <= gap_1 * (1 + max_error)))
+    valid = marks_ok & spaces_ok
+    # Index of the first invalid bit, bit_length if there is none
+    first_invalid = np.where(valid.all(axis=1), bit_length, np.argmin(valid, axis=1))
+    # Bits whose mark and space are both in the capture
+    available = np.clip((lengths[rows] - offset - 2) // 2, 0, bit_length)
+    counts = np.minimum(first_invalid, available)
+    bits = (spaces > (gap_0 + gap_1) / 2) == (gap_1 > gap_0)
+    key = (offset, pulse_len, gap_0, gap_1, max_error_percent)
+    for row, count, row_available, row_bits in zip(rows.tolist(), counts.tolist(), available.tolist(), bits.tolist()):
+        capture = captures[row]
+        error = None
+        if count < row_available:
+            p = offset + 3 + count * 2
+            if not pulse.in_range(capture[p - 1], pulse_len, max_error_percent):
+                error = f"Invalid pulse length: {capture[p - 1]}"
+            else:
+                error = f"Invalid gap length: {capture[p]}"
+        capture.bit_cache[key] = [row_bits[:count], error]
+
+def canonical_commands(commands, batch_size=BATCH_SIZE):
+    """
+    Rewrite commands given as durations into protocol commands where a decoder matches.
+
+    Commands in the formats of rc_encoder.PULSE_FORMATS ("raw", "pronto",
+    "broadlink") are converted to durations and decoded as one batch with
+    rc_auto_decode_batch(). A decoded command is much shorter and is encoded
+    with the exact protocol timings on send.
+
+    Args:
+        commands (iterable of str): The command strings.
+        batch_size (int, optional): Number of captures classified per array. Defaults to BATCH_SIZE.
+
+    Returns:
+        list of str: For every command, the decoded command ("nec:...") if a decoder
+            matches, the command itself otherwise (also if it cannot be parsed).
+    """
+    commands = list(commands)
+    indexes = []
+    captures = []
+    for i, command in enumerate(commands):
+        if command.split(":", 1)[0] not in rc_encoder.PULSE_FORMATS:
+            continue
+        try:
+            captures.append(rc_encoder.rc_auto_encode(command))
+        except ValueError:
+            continue
+        indexes.append(i)
+    for i, decoded in zip(indexes, rc_auto_decode_batch(captures, batch_size)):
+        if not decoded.startswith("raw:"):
+            commands[i] = decoded
+    return commands
@@ -16,12 +16,18 @@ Sources:
 Tested with Flipper Zero.
 """
 
+import base64
+import bisect
+import functools
+
 try:
     from . import pulse
     from . import manchester
+    from . import tuya_codec
 except ImportError:
     import pulse
     import manchester
+    import tuya_codec
 
 global_toggle = 0
 
@@ -344,15 +350,14 @@ def _sirc_repeat(frame, repeats):
         raise ValueError(f"rep must be in range 1-{SIRC_MAX_REP}")
     if repeats == 1:
         return frame
-    frame_no_tail = frame[:-1]
-    frame_len = sum(frame_no_tail)
+    frame_len = sum(frame) - frame[-1]
     inter_gap = max(SIRC_FRAME_PERIOD - frame_len, SIRC_GAP * 2)
-    out = []
-    for i in range(repeats):
-        out.extend(frame_no_tail)
-        if i != repeats - 1:
-            out.append(inter_gap)
-    return out
+    # The frame is built for this call only, so it is reused in place:
+    # replace the trailing gap, repeat the buffer and drop the last gap
+    frame[-1] = inter_gap
+    frame *= repeats
+    frame.pop()
+    return frame
 
 def _sirc_decode_with_rep(values, bit_length):
     """Decode a SIRC stream and detect how many copies of the same frame are
@@ -580,21 +585,21 @@ AC_GAP_1 = 1690
 def air_conditioner_decode(values):
     if len(values) < 100:
         raise ValueError("Invalid AC data: too short")
-    def ac_decode_half(values):
-        data = pulse.distance_decode(values, AC_LEADING_PULSE, AC_LEADING_GAP, AC_PULSE, AC_GAP_0, AC_GAP_1, 48)
+    def ac_decode_half(offset):
+        data = pulse.distance_decode(values, AC_LEADING_PULSE, AC_LEADING_GAP, AC_PULSE, AC_GAP_0, AC_GAP_1, 48, offset=offset)
         if data[0] != data[1] ^ 0xFF or data[2] != data[3] ^ 0xFF or data[4] != data[5] ^ 0xFF:
             raise ValueError("Invalid AC xored data")
         addr = data[0]
         cmd = data[2] | (data[4] << 8)
         return (addr, cmd)
-    addr, cmd = ac_decode_half(values[:100])
+    addr, cmd = ac_decode_half(0)
     double = 0
     closing = NEC_GAP_0
     if len(values) >= 200:
         # closing gap is known to be either AC_LEADING_GAP or NEC_GAP_0
         if pulse.in_range(values[99], AC_LEADING_GAP):
             closing = AC_LEADING_GAP
-        addr2, cmd2 = ac_decode_half(values[100:])
+        addr2, cmd2 = ac_decode_half(100)
         if addr == addr2 and cmd == cmd2:
             double = 1
     result = f"addr=0x{addr:02X},cmd=0x{cmd:04X}"
@@ -767,12 +772,12 @@ def midea_decode(values):
     if len(values) < MIDEA_HALF_LEN:
         raise ValueError(f"Midea: too short, need at least {MIDEA_HALF_LEN} elements")
 
-    def decode_half(half):
+    def decode_half(offset):
         data = pulse.distance_decode(
-            half,
+            values,
             MIDEA_LEADING_PULSE, MIDEA_LEADING_GAP,
             MIDEA_PULSE, MIDEA_GAP_0, MIDEA_GAP_1,
-            48, msb_first=True,
+            48, msb_first=True, offset=offset,
         )
         if data[0] != data[1] ^ 0xFF:
             raise ValueError("Midea: invalid inverse pair (B0/B1)")
@@ -800,7 +805,7 @@ def midea_decode(values):
     pos = 0
     while pos + MIDEA_HALF_LEN <= len(values):
         try:
-            packets.append(decode_half(values[pos:pos + MIDEA_HALF_LEN]))
+            packets.append(decode_half(pos))
         except ValueError:
             # A whole-packet slice failed to decode. If we already collected
             # at least one valid packet AND we're at the tail (less than a
@@ -821,7 +826,7 @@ def midea_decode(values):
 
     if not packets:
         # Re-raise the original error with full context.
-        decode_half(values[:MIDEA_HALF_LEN])  # raises
+        decode_half(0)  # raises
         raise ValueError("Midea: no valid packets")  # unreachable
 
     # Real captures always contain at least one repeated state packet (the
@@ -1126,25 +1131,148 @@ RC_CONVERTERS = {
     "ac": (air_conditioner_encode, air_conditioner_decode),
 }
 
-def rc_auto_decode(values, force_raw=False):
+def _tolerance(target, max_error_percent=pulse.MAX_ERROR_PERCENT):
+    # Inclusive (low, high) bounds that pulse.in_range() accepts for target
+    max_error = max_error_percent / 100
+    return (target * (1 - max_error), target * (1 + max_error))
+
+# Necessary conditions each decoder checks before doing any real work:
+# (leading pulse bounds, leading gap bounds, minimum number of durations).
+# A bound of None means the decoder does not constrain it. These feed the
+# dispatch index below, so they must never be stricter than the decoder
+# itself, otherwise rc_auto_decode() would skip a decoder that could match.
+RC_DECODER_HEADERS = {
+    "nec42": (_tolerance(NEC_LEADING_PULSE), _tolerance(NEC_LEADING_GAP), 3 + 42 * 2),
+    "nec": (_tolerance(NEC_LEADING_PULSE, NEC_MAX_ERROR_PERCENT), _tolerance(NEC_LEADING_GAP, NEC_MAX_ERROR_PERCENT), 3 + 32 * 2),
+    "nec42-ext": (_tolerance(NEC_LEADING_PULSE), _tolerance(NEC_LEADING_GAP), 3 + 42 * 2),
+    "nec-ext": (_tolerance(NEC_LEADING_PULSE, NEC_MAX_ERROR_PERCENT), _tolerance(NEC_LEADING_GAP, NEC_MAX_ERROR_PERCENT), 3 + 32 * 2),
+    # Manchester: the first mark must round to 1-2 half-bits for RC5 (start
+    # bit + first data bit) and to exactly 6 half-bits for RC6 (leader),
+    # followed by at least 2 half-bits of space.
+    "rc5": ((RC5_T * 0.5, RC5_T * 2.5), (None, None), 1),
+    "rc6": ((RC6_T * 5.5, RC6_T * 6.5), (RC6_T * 1.5, None), 1),
+    "samsung32": (_tolerance(SAMSUNG_LEADING_PULSE), _tolerance(SAMSUNG_LEADING_GAP), 3 + 32 * 2),
+    # SIRC tolerates the missing trailing gap of the last frame
+    "sirc20": (_tolerance(SIRC_LEADING_PULSE), _tolerance(SIRC_LEADING_GAP), 1 + 20 * 2),
+    "sirc15": (_tolerance(SIRC_LEADING_PULSE), _tolerance(SIRC_LEADING_GAP), 1 + 15 * 2),
+    "sirc": (_tolerance(SIRC_LEADING_PULSE), _tolerance(SIRC_LEADING_GAP), 1 + 12 * 2),
+    "kaseikyo": (_tolerance(KASEIKYO_LEADING_PULSE), _tolerance(KASEIKYO_LEADING_GAP), 3 + 48 * 2),
+    "rca": (_tolerance(RCA_LEADING_PULSE), _tolerance(RCA_LEADING_GAP), 3 + 12 * 2),
+    "pioneer": (_tolerance(PIONEER_LEADING_PULSE), _tolerance(PIONEER_LEADING_GAP), 3 + 32 * 2),
+    "midea": (_tolerance(MIDEA_LEADING_PULSE), _tolerance(MIDEA_LEADING_GAP), MIDEA_HALF_LEN),
+    "ac": (_tolerance(AC_LEADING_PULSE), _tolerance(AC_LEADING_GAP), 100),
+}
+
+# Granularity of the leading pulse/gap fingerprint, microseconds. Everything
+# at or above DISPATCH_MAX_US shares the last (overflow) bucket.
+DISPATCH_BUCKET_US = 100
+DISPATCH_MAX_US = 20000
+
+def _bucket(value):
+    # Map a duration to its fingerprint bucket
+    if value >= DISPATCH_MAX_US:
+        return DISPATCH_MAX_US // DISPATCH_BUCKET_US
+    if value <= 0:
+        return 0
+    return int(value // DISPATCH_BUCKET_US)
+
+def _bucket_masks(bounds):
+    # For every bucket, a bitmask of the decoders (by RC_CONVERTERS position)
+    # whose (low, high) bounds overlap that bucket
+    count = DISPATCH_MAX_US // DISPATCH_BUCKET_US + 1
+    masks = [0] * count
+    for bit, (low, high) in enumerate(bounds):
+        for i in range(count):
+            start = i * DISPATCH_BUCKET_US
+            end = float("inf") if i == count - 1 else start + DISPATCH_BUCKET_US
+            if (high is None or start <= high) and (low is None or end > low):
+                masks[i] |= 1 << bit
+    return masks
+
+def build_dispatch_index():
+    """
+    (Re)build the decoder dispatch index used by rc_auto_decode().
+
+    Every capture is reduced to a coarse fingerprint: leading pulse bucket,
+    leading gap bucket and length class. Each fingerprint axis maps to a
+    bitmask of decoders that can possibly accept it, and the index maps the
+    combined mask to the matching decoders in RC_CONVERTERS priority order.
+    Decoders without an entry in RC_DECODER_HEADERS are always tried.
+
+    Call again after modifying RC_CONVERTERS or RC_DECODER_HEADERS.
+    """
+    global _DISPATCH_PULSE_MASKS, _DISPATCH_GAP_MASKS, _DISPATCH_LENGTHS, _DISPATCH_LENGTH_MASKS, _DISPATCH_INDEX
+    converters = list(RC_CONVERTERS.items())
+    headers = [RC_DECODER_HEADERS.get(name, ((None, None), (None, None), 0)) for name, _ in converters]
+    _DISPATCH_PULSE_MASKS = _bucket_masks([h[0] for h in headers])
+    _DISPATCH_GAP_MASKS = _bucket_masks([h[1] for h in headers])
+    # Length class N means "at least _DISPATCH_LENGTHS[N - 1] durations"
+    _DISPATCH_LENGTHS = sorted({h[2] for h in headers})
+    _DISPATCH_LENGTH_MASKS = [0]
+    for length in _DISPATCH_LENGTHS:
+        _DISPATCH_LENGTH_MASKS.append(sum(1 << bit for bit, h in enumerate(headers) if h[2] <= length))
+    _DISPATCH_INDEX = {}
+    for pulse_mask in set(_DISPATCH_PULSE_MASKS):
+        for gap_mask in set(_DISPATCH_GAP_MASKS):
+            for length_mask in set(_DISPATCH_LENGTH_MASKS):
+                mask = pulse_mask & gap_mask & length_mask
+                if mask not in _DISPATCH_INDEX:
+                    _DISPATCH_INDEX[mask] = tuple((name, decoder) for bit, (name, (_, decoder)) in enumerate(converters) if mask >> bit & 1)
+
+def fingerprint(values):
+    """
+    Compute the coarse dispatch fingerprint of a capture.
+
+    Args:
+        values (list of int): Pulse and gap durations.
+
+    Returns:
+        tuple: (leading pulse bucket, leading gap bucket, length class), or None if the capture
+        is too short to have a header.
+    """
+    if len(values) < 2:
+        return None
+    return (_bucket(values[0]), _bucket(values[1]), bisect.bisect_right(_DISPATCH_LENGTHS, len(values)))
+
+def decoder_candidates(values):
+    """
+    Return the (name, decoder) pairs that can possibly decode the given capture,
+    in RC_CONVERTERS priority order.
+    """
+    fp = fingerprint(values)
+    if fp is None:
+        return ()
+    pulse_bucket, gap_bucket, length_class = fp
+    return _DISPATCH_INDEX[_DISPATCH_PULSE_MASKS[pulse_bucket] & _DISPATCH_GAP_MASKS[gap_bucket] & _DISPATCH_LENGTH_MASKS[length_class]]
+
+build_dispatch_index()
+
+def rc_auto_decode(values, force_raw=False, force_pronto=False):
     """
     Attempt to decode a list of pulse and gap durations using various decoders.
 
-    This function iterates through a collection of decoders defined in RC_CONVERTERS.
-    It tries to decode the provided values using each decoder until one succeeds.
+    This function looks up the decoders from RC_CONVERTERS that can possibly match the
+    capture's header and length (see build_dispatch_index()) and tries them in priority order.
     If a decoder successfully decodes the values, it returns a string in the format
     "decoder_name:decoded_value". If none of the decoders succeed, it returns the raw
     data as a comma-separated string prefixed with "raw:".
 
     Args:
         values (list of int): A list of integers representing the pulse and gap durations.
+        force_raw (bool): Skip the decoders and return the raw data.
+        force_pronto (bool): Skip the decoders and return the data as a Pronto hex code.
 
     Returns:
         str: The decoded value prefixed with the decoder name, or the raw data if decoding fails.
     """
-    # Try every decoder
+    if force_pronto:
+        return pulses_to_pronto(values)
+    # Try every decoder that can possibly match. Wrapping the values in a
+    # Capture lets decoders with shared timings reuse each other's bits.
     if not force_raw:
-        for name, (_, decoder) in RC_CONVERTERS.items():
+        if not isinstance(values, pulse.Capture):
+            values = pulse.Capture(values)
+        for name, decoder in decoder_candidates(values):
             try:
                 return f"{name}:{decoder(values)}"
             except ValueError:
@@ -1155,41 +1283,308 @@ def rc_auto_decode(values, force_raw=False):
         values = values[:-1]
     return "raw:" + ",".join(str(int(v)) for v in values)
 
-def rc_auto_encode(s):
+def _durations(count):
+    # The decoder only reads the first count durations
+    return lambda values: len(values) >= count
+
+def _half_bits(T, count):
+    # The Manchester decoder only reads the first count half-bits
+    return lambda values: sum(max(round(v / T), 0) for v in values) >= count
+
+# Distance-coded data right after the header, for early rejection by
+# IncrementalDecoder: (pulse, gap_0, gap_1, bit_length, max_error_percent).
+# Like RC_DECODER_HEADERS, this must never be stricter than the decoder.
+RC_DECODER_BITS = {
+    "nec42": (NEC_PULSE, NEC_GAP_0, NEC_GAP_1, 42, pulse.MAX_ERROR_PERCENT),
+    "nec": (NEC_PULSE, NEC_GAP_0, NEC_GAP_1, 32, NEC_MAX_ERROR_PERCENT),
+    "nec42-ext": (NEC_PULSE, NEC_GAP_0, NEC_GAP_1, 42, pulse.MAX_ERROR_PERCENT),
+    "nec-ext": (NEC_PULSE, NEC_GAP_0, NEC_GAP_1, 32, NEC_MAX_ERROR_PERCENT),
+    "samsung32": (SAMSUNG_PULSE, SAMSUNG_GAP_0, SAMSUNG_GAP_1, 32, pulse.MAX_ERROR_PERCENT),
+    "kaseikyo": (KASEIKYO_PULSE, KASEIKYO_GAP_0, KASEIKYO_GAP_1, 48, pulse.MAX_ERROR_PERCENT),
+    "rca": (RCA_PULSE, RCA_GAP_0, RCA_GAP_1, 12, pulse.MAX_ERROR_PERCENT),
+    "pioneer": (PIONEER_PULSE, PIONEER_GAP_0, PIONEER_GAP_1, 32, pulse.MAX_ERROR_PERCENT),
+    "midea": (MIDEA_PULSE, MIDEA_GAP_0, MIDEA_GAP_1, 48, pulse.MAX_ERROR_PERCENT),
+    "ac": (AC_PULSE, AC_GAP_0, AC_GAP_1, 48, pulse.MAX_ERROR_PERCENT),
+}
+
+# When a decoder has seen a whole frame: name -> predicate(values) that is
+# true once more durations can no longer change the decoder's result.
+# Decoders that read the whole capture (SIRC repeats, Midea packets) or are
+# missing here are only resolved by IncrementalDecoder.finish().
+RC_DECODER_FRAMES = {
+    "nec42": _durations(3 + 42 * 2),
+    "nec": _durations(3 + 32 * 2),
+    "nec42-ext": _durations(3 + 42 * 2),
+    "nec-ext": _durations(3 + 32 * 2),
+    "rc5": _half_bits(RC5_T, len(RC5_START) + 13 * 2),
+    "rc6": _half_bits(RC6_T, len(RC6_START) + 21 * 2 + 2),
+    "samsung32": _durations(3 + 32 * 2),
+    "kaseikyo": _durations(3 + 48 * 2),
+    "rca": _durations(3 + 12 * 2),
+    "pioneer": _durations(3 + 32 * 2),
+    # Both halves, the second one is optional but changes the result
+    "ac": _durations(200),
+}
+
+# Decoders that read the whole capture but always fail when they fail on
+# its first frame alone: name -> number of durations of that first frame.
+# IncrementalDecoder uses these to drop such decoders before finish().
+RC_DECODER_FIRST_FRAMES = {
+    # The last frame may miss its trailing gap
+    "sirc20": 1 + 20 * 2,
+    "sirc15": 1 + 15 * 2,
+    "sirc": 1 + 12 * 2,
+    "midea": MIDEA_HALF_LEN,
+}
+
+class _Buffer(list):
+    # A growing capture; distance_bits() caches on it like on pulse.Capture
+    def __init__(self):
+        super().__init__()
+        self.bit_cache = {}
+
+class IncrementalDecoder:
+    """
+    Decode a capture while its durations are still arriving.
+
+    Feed durations in chunks (a chunked study response, lines of an import
+    file, ...). The decoder keeps the protocols that can still match, drops
+    them as soon as the header or a data bit does not fit, and reports a
+    result as soon as the highest priority protocol left has seen a complete
+    valid frame. The result is the same rc_auto_decode() would return for
+    the whole capture; durations fed after that are ignored.
+
+    Example:
+        decoder = IncrementalDecoder()
+        for chunk in chunks:
+            if decoder.feed(chunk) is not None:
+                break
+        result = decoder.finish()
     """
-    Encodes a string command into a list of pulse and gap durations based on the specified format.
 
-    The input string `s` should be in the format "fmt:data", where `fmt` is the format
-    identifier and `data` is the data to be encoded. The function supports the following formats:
-    - "raw": The data is a comma-separated list of values to be converted to integers.
-    - Other formats: The data is a comma-separated list of key=value pairs, where the values
-      are converted to integers and passed to the corresponding encoder function.
+    def __init__(self):
+        self._values = _Buffer()
+        self._candidates = None
+        self._first_frames = set()
+        self._result = None
+
+    @property
+    def result(self):
+        """The decoded "decoder_name:decoded_value" string, or None while still undecided."""
+        return self._result
+
+    @property
+    def candidates(self):
+        """Names of the protocols that can still match, in priority order."""
+        if self._candidates is None:
+            return list(RC_CONVERTERS)
+        return [name for name, _ in self._candidates]
+
+    def feed(self, durations):
+        """
+        Append pulse and gap durations to the capture.
+
+        Args:
+            durations (iterable of int): The next durations of the capture.
+
+        Returns:
+            str: The decoded value prefixed with the decoder name, or None if more data is needed.
+        """
+        if self._result is not None:
+            return self._result
+        self._values.extend(durations)
+        if len(self._values) < 2:
+            return None
+        if self._candidates is None:
+            # Header fingerprint only: the capture is not complete yet
+            pulse_bucket, gap_bucket, _ = fingerprint(self._values)
+            mask = _DISPATCH_PULSE_MASKS[pulse_bucket] & _DISPATCH_GAP_MASKS[gap_bucket] & _DISPATCH_LENGTH_MASKS[-1]
+            self._candidates = list(_DISPATCH_INDEX[mask])
+        while self._candidates:
+            name, decoder = self._candidates[0]
+            try:
+                if self._check(name, decoder):
+                    return self._result
+                return None
+            except ValueError:
+                self._candidates.pop(0)
+        return None
+
+    def _check(self, name, decoder):
+        # True if the candidate decoded a complete frame (and is the result),
+        # False if it needs more data; raises ValueError if it can not match
+        values = self._values
+        bits = RC_DECODER_BITS.get(name)
+        if bits is not None:
+            pulse_len, gap_0, gap_1, bit_length, max_error_percent = bits
+            (pulse_lo, pulse_hi), (gap_lo, gap_hi), _ = RC_DECODER_HEADERS[name]
+            if not pulse_lo <= values[0] <= pulse_hi or not gap_lo <= values[1] <= gap_hi:
+                raise ValueError(f"Invalid {name} header")
+            available = min(bit_length, max(0, (len(values) - 2) // 2))
+            decoded, error = pulse.distance_bits(values, pulse_len, gap_0, gap_1, available, 0, max_error_percent)
+            if len(decoded) < available:
+                raise ValueError(error)
+        first_frame = RC_DECODER_FIRST_FRAMES.get(name)
+        if first_frame is not None and name not in self._first_frames and len(values) >= first_frame:
+            decoder(values[:first_frame])
+            self._first_frames.add(name)
+        complete = RC_DECODER_FRAMES.get(name)
+        if complete is None or not complete(values):
+            return False
+        self._result = f"{name}:{decoder(values)}"
+        return True
+
+    def finish(self):
+        """
+        End the capture and return its decoded value.
+
+        Returns:
+            str: The decoded value prefixed with the decoder name, or the raw data if decoding fails
+            (see rc_auto_decode()).
+        """
+        if self._result is None:
+            self._result = rc_auto_decode(self._values)
+        return self._result
+
+""" Pronto hex """
+# Pronto clock: carrier frequency word -> period of one carrier cycle
+PRONTO_CLOCK = 0.241246
+# Carrier of the Pronto codes pulses_to_pronto() builds; the Tuya hub has a
+# fixed carrier, so the frequency of parsed codes is ignored
+PRONTO_FREQUENCY = 38000
+# Lead-out gap added to make pulses_to_pronto() codes end with a gap
+PRONTO_LEAD_OUT = 40000
+# Preamble words of learned (modulated and unmodulated) codes
+PRONTO_LEARNED = (0x0000, 0x0100)
+
+def pronto_to_pulses(words):
+    """
+    Convert the words of a learned Pronto hex code to pulse and gap durations.
+
+    The code is a preamble (format, carrier frequency, number of burst pairs of
+    the once sequence and of the repeat sequence) followed by the burst pairs,
+    in carrier cycles. One press sends the once sequence, or the repeat sequence
+    if the code has no once sequence.
 
     Args:
-        s (str): The input string command to be encoded.
+        words (list of int): The 16-bit words of the code.
 
     Returns:
-        list: A list of integers representing the pulse and gap durations.
+        list of int: The durations in microseconds, ending with a pulse.
 
     Raises:
-        ValueError: If the input string is not in the correct format, or if the format identifier
-                    is unknown.
+        ValueError: If the code is not a valid learned Pronto code.
     """
-    def _coerce(v):
-        # Try int first (handles 0xAB, 0b101, 42); fall back to the raw
-        # string so encoders that accept named parameters (e.g. midea
-        # mode="cool") receive them unchanged.
-        try:
-            return int(v, 0)
-        except (ValueError, TypeError):
-            return v
+    if len(words) < 4:
+        raise ValueError("Pronto code is too short")
+    fmt, frequency, once, repeat = words[:4]
+    if fmt not in PRONTO_LEARNED:
+        raise ValueError(f"Unsupported Pronto format: {fmt:04X}")
+    if not frequency:
+        raise ValueError("Invalid Pronto carrier frequency")
+    if len(words) != 4 + 2 * (once + repeat):
+        raise ValueError("Pronto burst pair count does not match the code length")
+    if once:
+        start, end = 4, 4 + 2 * once
+    elif repeat:
+        start, end = 4, 4 + 2 * repeat
+    else:
+        raise ValueError("Pronto code without burst pairs")
+    period = frequency * PRONTO_CLOCK
+    # The trailing gap separates the frames, it is not transmitted
+    return [round(word * period) for word in words[start:end - 1]]
+
+def pulses_to_pronto(values, frequency=PRONTO_FREQUENCY):
+    """
+    Convert pulse and gap durations to a learned Pronto hex code (once sequence only).
+
+    Args:
+        values (list of int): The pulse and gap durations in microseconds.
+        frequency (int): The carrier frequency to put in the code, Hz.
+
+    Returns:
+        str: The code, "pronto:0000 006D ...".
+    """
+    frequency_word = round(1000000 / (frequency * PRONTO_CLOCK))
+    period = frequency_word * PRONTO_CLOCK
+    values = list(values)
+    if len(values) % 2:
+        values.append(PRONTO_LEAD_OUT)
+    words = [0x0000, frequency_word, len(values) // 2, 0]
+    words += [min(max(round(v / period), 1), 0xFFFF) for v in values]
+    return "pronto:" + " ".join(f"{word:04X}" for word in words)
+
+""" Broadlink packets """
+# Broadlink duration unit: 269/8192 ticks per microsecond
+BROADLINK_TICK = 8192 / 269
+# Packet type of IR codes (RF codes use 0xB2 and 0xD7)
+BROADLINK_IR = 0x26
+
+def broadlink_to_pulses(packet):
+    """
+    Convert a Broadlink IR packet to pulse and gap durations.
+
+    The packet is a type byte, a repeat count, the little-endian length of the
+    durations and the durations in ticks, one byte each, or a zero byte and a
+    big-endian 16-bit value for longer ones. The repeat count is ignored.
+
+    Args:
+        packet (bytes): The packet (the base64-decoded Broadlink code).
+
+    Returns:
+        list of int: The durations in microseconds, ending with a pulse.
 
+    Raises:
+        ValueError: If the packet is not a valid Broadlink IR packet.
+    """
+    if len(packet) < 4 or packet[0] != BROADLINK_IR:
+        raise ValueError("Not a Broadlink IR code")
+    end = 4 + int.from_bytes(packet[2:4], "little")
+    if end > len(packet):
+        raise ValueError("Broadlink code is truncated")
+    values = []
+    i = 4
+    while i < end:
+        ticks = packet[i]
+        i += 1
+        if ticks == 0:
+            if i + 2 > end:
+                break
+            ticks = int.from_bytes(packet[i:i + 2], "big")
+            i += 2
+        values.append(round(ticks * BROADLINK_TICK))
+    if len(values) % 2 == 0:
+        # The trailing gap ends the code, it is not transmitted
+        values = values[:-1]
+    if not values:
+        raise ValueError("Broadlink code without durations")
+    return values
+
+def _coerce(v):
+    # Try int first (handles 0xAB, 0b101, 42); fall back to the raw
+    # string so encoders that accept named parameters (e.g. midea
+    # mode="cool") receive them unchanged.
+    try:
+        return int(v, 0)
+    except (ValueError, TypeError):
+        return v
+
+def _parse_command(s):
+    # Split a "fmt:data" command string into its format and parsed data:
+    # a list of durations for "raw", "pronto" and "broadlink", the base64
+    # string for "tuya" and a dict of
+    # encoder parameters for everything else.
     try:
         fmt, data = s.split(":", 1)
         if fmt == "raw":
-            return [int(v, 0) for v in data.split(",")]
+            return fmt, [int(v, 0) for v in data.split(",")]
         if fmt == "tuya":
-            return data  # raw base64 Tuya-format
+            return fmt, data  # raw base64 Tuya-format
+        if fmt == "broadlink":
+            return fmt, broadlink_to_pulses(base64.b64decode(data, validate=True))
+        if fmt == "pronto":
+            # Converted once here, sent like raw durations
+            return fmt, pronto_to_pulses([int(v, 16) for v in data.replace(",", " ").split()])
         # Each k=v pair must contain exactly one '='; split(...) returns a
         # list of length 1 or >2 otherwise, which dict() then rejects with
         # ValueError. We catch ValueError specifically (parse failure) so
@@ -1200,8 +1595,189 @@ def rc_auto_encode(s):
         raise ValueError(f"Invalid command format: {s}") from exc
     if fmt not in RC_CONVERTERS:
         raise ValueError(f"Unknown format: {fmt}")
+    return fmt, data
+
+def rc_auto_encode(s):
+    """
+    Encodes a string command into a list of pulse and gap durations based on the specified format.
+
+    The input string `s` should be in the format "fmt:data", where `fmt` is the format
+    identifier and `data` is the data to be encoded. The function supports the following formats:
+    - "raw": The data is a comma-separated list of values to be converted to integers.
+    - "pronto": The data is a learned Pronto hex code, words separated by spaces.
+    - "broadlink": The data is a Broadlink IR code, base64.
+    - Other formats: The data is a comma-separated list of key=value pairs, where the values
+      are converted to integers and passed to the corresponding encoder function.
+
+    Args:
+        s (str): The input string command to be encoded.
+
+    Returns:
+        list or Pulses: The pulse and gap durations ("raw", "pronto" and "broadlink" return a list,
+            encoders a Pulses).
+
+    Raises:
+        ValueError: If the input string is not in the correct format, or if the format identifier
+                    is unknown.
+    """
+    fmt, data = _parse_command(s)
+    if fmt in PULSE_FORMATS or fmt == "tuya":
+        return data
+    encoder, _ = RC_CONVERTERS[fmt]
+    return _encode(encoder, data)
+
+def _encode(encoder, data):
+    # Run an encoder and return its output as Pulses
+    try:
+        pulses = encoder(**data)
+        if not isinstance(pulses, pulse.Pulses):
+            # Custom encoders may return a list, possibly of floats
+            pulses = pulse.Pulses(int(v) for v in pulses)
+    except OverflowError as e:
+        raise ValueError(f"Pulse duration out of range: {e}") from e
+    return pulses
+
+
+""" Precompiled commands """
+
+# Formats given as durations rather than protocol parameters
+PULSE_FORMATS = ("raw", "pronto", "broadlink")
+# Protocols with a toggle bit that must flip on every button press
+TOGGLE_PROTOCOLS = ("rc5", "rc6")
+# Maximum number of distinct command strings kept compiled
+COMPILED_COMMAND_CACHE_SIZE = 256
+
+def pulses_to_tuya(pulses):
+    """
+    Convert pulse and gap durations into a Tuya IR payload.
+
+    Args:
+        pulses (Pulses or list of int): The pulse and gap durations, microseconds.
+
+    Returns:
+        str: Durations packed as little-endian 16-bit integers, base64-encoded.
+    """
+    return tuya_codec.pulses_to_base64(pulses)
+
+class CompiledCommand:
+    """
+    A command string parsed and encoded once, ready to be sent many times.
+
+    Holds the pulses and the Tuya base64 payload of every variant of the command.
+    Commands for toggle-bit protocols (see TOGGLE_PROTOCOLS) without an explicit
+    `toggle` parameter have one variant per toggle value, and variant() picks
+    them through get_toggle(), so every send still flips the toggle bit exactly
+    like a fresh rc_auto_encode() call would. Instances are immutable and shared
+    through the compile_command() cache.
+
+    Attributes:
+        command (str): The original command string.
+        format (str): The command format ("raw", "tuya", "nec", ...).
+        toggles (bool): True if the command has a per-send toggle bit.
+    """
+    __slots__ = ("command", "format", "_variants")
+
+    def __init__(self, command, fmt, variants):
+        object.__setattr__(self, "command", command)
+        object.__setattr__(self, "format", fmt)
+        object.__setattr__(self, "_variants", tuple(variants))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CompiledCommand is immutable")
+
+    def __repr__(self):
+        return f"CompiledCommand({self.command!r})"
+
+    @property
+    def toggles(self):
+        return len(self._variants) > 1
+
+    def variant(self):
+        """
+        Return the variant to transmit next.
+
+        Returns:
+            tuple: (pulses, payload), where pulses is a tuple of durations (None for
+            commands given as a Tuya payload) and payload is the Tuya base64 string.
+        """
+        if len(self._variants) == 1:
+            return self._variants[0]
+        return self._variants[get_toggle()]
+
+    def payload(self):
+        """Return the Tuya base64 payload to transmit next."""
+        return self.variant()[1]
+
+def _compile_variant(encoder, data):
+    pulses = _encode(encoder, data)
+    return (tuple(pulses), pulses_to_tuya(pulses))
+
+@functools.lru_cache(maxsize=COMPILED_COMMAND_CACHE_SIZE)
+def compile_command(s):
+    """
+    Parse and encode a command string once, returning a cached CompiledCommand.
+
+    Accepts the same "fmt:data" strings as rc_auto_encode(). Results are kept in a
+    bounded LRU cache keyed by the command string; invalid commands are not cached.
+
+    Args:
+        s (str): The command string.
+
+    Returns:
+        CompiledCommand: The compiled command.
+
+    Raises:
+        ValueError: If the command cannot be parsed or encoded.
+    """
+    fmt, data = _parse_command(s)
+    if fmt == "tuya":
+        return CompiledCommand(s, fmt, [(None, data)])
+    if fmt in PULSE_FORMATS:
+        pulses = tuple(data)
+        return CompiledCommand(s, fmt, [(pulses, pulses_to_tuya(pulses))])
     encoder, _ = RC_CONVERTERS[fmt]
-    data = encoder(**data)
-    # Convert to ints
-    data = [int(v) for v in data]
-    return data
+    if fmt in TOGGLE_PROTOCOLS and "toggle" not in data:
+        # Index matches the toggle value returned by get_toggle()
+        return CompiledCommand(s, fmt, [_compile_variant(encoder, {**data, "toggle": t}) for t in (0, 1)])
+    return CompiledCommand(s, fmt, [_compile_variant(encoder, data)])
+
+
+""" Held buttons """
+
+# Sent every NEC_PERIOD after the frame while an NEC button is held
+NEC_REPEAT = (NEC_LEADING_PULSE, 2250, NEC_PULSE)
+NEC_PERIOD = 108000
+# Protocols whose held buttons send NEC_REPEAT instead of the frame
+NEC_REPEAT_PROTOCOLS = ("nec", "nec-ext", "nec42", "nec42-ext")
+
+def hold_trains(fmt, pulses, hold_secs):
+    """
+    Build the pulse trains of a button held down for hold_secs.
+
+    NEC-family frames are followed by NEC repeat codes, one per NEC_PERIOD;
+    the space between repeat codes is cut to the longest duration that fits a
+    Tuya code (tuya_codec.MAX_DURATION), which receivers still take as a held
+    button. Frames of other protocols are repeated as they are, with the
+    default frame gap. The button is held for one frame at least.
+
+    Args:
+        fmt (str): The command format ("nec", "raw", ...).
+        pulses (list of int): The pulse and gap durations of the frame.
+        hold_secs (float): How long the button is held, seconds.
+
+    Returns:
+        tuple: (trains, gaps) to join with tuya_codec.merge_pulses().
+    """
+    pulses = list(pulses)
+    hold = hold_secs * 1000000
+    if fmt in NEC_REPEAT_PROTOCOLS:
+        repeat = list(NEC_REPEAT)
+        repeat_gap = min(NEC_PERIOD - sum(repeat), tuya_codec.MAX_DURATION)
+        count = max(0, round((hold - NEC_PERIOD) / (sum(repeat) + repeat_gap)))
+        # The frame and each repeat code start one period after the previous one
+        frame_gap = min(max(NEC_PERIOD - sum(pulses), 1), tuya_codec.MAX_DURATION)
+        return [pulses] + [repeat] * count, [frame_gap] + [repeat_gap] * count
+    trailing = 0 if len(pulses) % 2 else pulses[-1]
+    period = sum(pulses) - trailing + max(trailing, tuya_codec.FRAME_GAP)
+    count = max(1, round(hold / period))
+    return [pulses] * count, [0] * count
@@ -1,7 +1,10 @@
 """Support for Tuya IR Remote Control."""
 import logging
 import asyncio
+import itertools
+import os
 import struct
+import time
 import voluptuous as vol
 import homeassistant.helpers.config_validation as cv
 from tinytuya import Contrib, ERR_JSON, ERR_TIMEOUT
@@ -16,10 +19,21 @@ from .const import (
     CONF_CONTROL_TYPE,
     CONF_CLOUD_INFO,
     CONF_PERSISTENT_CONNECTION,
-    CODE_STORAGE_VERSION,
-    CODE_STORAGE_CODES,
+    CONF_TRANSPORT,
+    CONF_SEND_QUEUE_OVERFLOW,
+    CONF_MERGE_COMMANDS,
     NOTIFICATION_TITLE,
-    DEFAULT_PERSISTENT_CONNECTION
+    DEFAULT_PERSISTENT_CONNECTION,
+    DEFAULT_TRANSPORT,
+    DEFAULT_SEND_QUEUE_OVERFLOW,
+    DEFAULT_MERGE_COMMANDS,
+    TRANSPORT_ASYNCIO,
+    TRANSPORTS,
+    SERVICE_IMPORT_CODES,
+    SERVICE_EXPORT_CODES,
+    ATTR_PATH,
+    ATTR_FORMAT,
+    ATTR_DECODE,
 )
 
 from homeassistant.const import (
@@ -27,6 +41,7 @@ from homeassistant.const import (
     CONF_HOST,
     CONF_DEVICE_ID,
 )
+from homeassistant.helpers import entity_platform
 from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.exceptions import HomeAssistantError
 from homeassistant.components.persistent_notification import async_create
@@ -43,9 +58,15 @@ from homeassistant.components.remote import (
     RemoteEntity,
     RemoteEntityFeature,
 )
-from homeassistant.helpers.storage import Store
 
-from .rc_encoder import rc_auto_encode, rc_auto_decode
+from .code_export import EXPORT_FORMATS, EXPORT_SUFFIXES, write_codes
+from .code_import import read_codes
+from .code_library import async_get_code_libraries
+from .code_store import async_get_code_index, async_get_code_store, async_register_hub, code_record, iter_codes
+from .rc_encoder import rc_auto_decode, compile_command, hold_trains
+from .send_queue import OVERFLOW_POLICIES, SendQueue
+from .tuya_codec import base64_to_pulses, merge_pulses, pulses_to_base64
+from .tuya_transport import TuyaTransport, TuyaTransportError, TuyaConnectionError, TuyaBatchError
 
 PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend(
     {
@@ -57,6 +78,9 @@ PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend(
                 ["3.1", "3.2", "3.3", "3.4", "3.5"]
             ),
             vol.Required(CONF_PERSISTENT_CONNECTION, default=DEFAULT_PERSISTENT_CONNECTION): cv.boolean,
+            vol.Required(CONF_TRANSPORT, default=DEFAULT_TRANSPORT): vol.In(TRANSPORTS),
+            vol.Required(CONF_SEND_QUEUE_OVERFLOW, default=DEFAULT_SEND_QUEUE_OVERFLOW): vol.In(OVERFLOW_POLICIES),
+            vol.Required(CONF_MERGE_COMMANDS, default=DEFAULT_MERGE_COMMANDS): cv.boolean,
     }
 )
 
@@ -67,6 +91,28 @@ _LOGGER = logging.getLogger(__name__)
 PARALLEL_UPDATES = 1
 
 
+def _read_records(path, device=None):
+    """
+    Read the codes of files to import (see code_import.read_codes()) as records.
+
+    Blocking, run it in the executor.
+
+    Returns:
+        tuple: ({device: {command: record}}, number of codes, list of "device/command: error"
+            of the signals that could not be converted).
+    """
+    records = {}
+    count = 0
+    errors = []
+    for device_name, command, code, error in read_codes(path, device):
+        if code is None:
+            errors.append(f"{device_name}/{command}: {error}")
+            continue
+        records.setdefault(device_name, {})[command] = code_record(code)
+        count += 1
+    return records, count, errors
+
+
 async def async_setup_entry(hass, entry, async_add_entities, discovery_info=None):
     """Set up the Tuya IR Remote Control entry."""
     await async_setup_platform(hass, entry.data, async_add_entities, discovery_info, entry=entry)
@@ -86,21 +132,51 @@ async def async_setup_platform(hass, config, async_add_entities, discovery_info=
     cloud_info = config.get(CONF_CLOUD_INFO, None)
     persistent_connection = config.get(CONF_PERSISTENT_CONNECTION, DEFAULT_PERSISTENT_CONNECTION)
     control_type = config.get(CONF_CONTROL_TYPE, 0)
+    transport = config.get(CONF_TRANSPORT, DEFAULT_TRANSPORT)
+    send_queue_overflow = config.get(CONF_SEND_QUEUE_OVERFLOW, DEFAULT_SEND_QUEUE_OVERFLOW)
+    merge_commands = config.get(CONF_MERGE_COMMANDS, DEFAULT_MERGE_COMMANDS)
 
     if name is None or host is None or dev_id is None or local_key is None:
         _LOGGER.error("Missing required configuration items")
         return
 
-    _LOGGER.debug("Setting up Tuya IR Remote Control: name=%s, dev_id=%s, host=%s, local_key=%s, protocol_version=%s, persistent_connection=%s, control_type=%s, cloud_info=%s", name, dev_id, host, local_key, protocol_version, persistent_connection, control_type, cloud_info)
+    _LOGGER.debug("Setting up Tuya IR Remote Control: name=%s, dev_id=%s, host=%s, local_key=%s, protocol_version=%s, persistent_connection=%s, control_type=%s, transport=%s, cloud_info=%s", name, dev_id, host, local_key, protocol_version, persistent_connection, control_type, transport, cloud_info)
 
-    remote = TuyaRC(name, dev_id, host, local_key, protocol_version, persistent_connection, cloud_info, control_type=control_type, entry=entry)
+    # Keeps the shared codes of older versions until this hub has its own copy
+    async_register_hub(hass, dev_id)
+    remote = TuyaRC(name, dev_id, host, local_key, protocol_version, persistent_connection, cloud_info, control_type=control_type, entry=entry, transport=transport, send_queue_overflow=send_queue_overflow, merge_commands=merge_commands)
     # Update availability of the device
-    await hass.async_add_executor_job(remote._update_availibility)
+    if remote._transport:
+        await remote._async_update_availibility()
+    else:
+        await hass.async_add_executor_job(remote._update_availibility)
 
     async_add_entities([remote])
 
+    platform = entity_platform.async_get_current_platform()
+    platform.async_register_entity_service(
+        SERVICE_IMPORT_CODES,
+        {
+            vol.Required(ATTR_PATH): cv.string,
+            vol.Optional(ATTR_DEVICE): cv.string,
+        },
+        "async_import_codes",
+    )
+    platform.async_register_entity_service(
+        SERVICE_EXPORT_CODES,
+        {
+            vol.Required(ATTR_PATH): cv.string,
+            vol.Optional(ATTR_FORMAT, default=EXPORT_FORMATS[0]): vol.In(EXPORT_FORMATS),
+            vol.Optional(ATTR_DECODE, default=False): cv.boolean,
+        },
+        "async_export_codes",
+    )
+
 
 class TuyaRC(RemoteEntity):
+    # Can be long and changes with every learn, the recorder keeps the count only
+    _unrecorded_attributes = frozenset({"learned_devices"})
+
     # Short network timeouts so that an offline device fails fast and does not
     # block the HA executor pool for tens of seconds. With these values, an
     # unreachable device returns an error in roughly 5 * 2 + 0.5 = ~10s instead
@@ -109,7 +185,7 @@ class TuyaRC(RemoteEntity):
     _CONNECTION_RETRY_DELAY = 0.5
     _CONNECTION_RETRY_LIMIT = 2
 
-    def __init__(self, name, dev_id, address, local_key, protocol_version, persistent_connection=DEFAULT_PERSISTENT_CONNECTION, cloud_info=None, control_type=0, entry=None):
+    def __init__(self, name, dev_id, address, local_key, protocol_version, persistent_connection=DEFAULT_PERSISTENT_CONNECTION, cloud_info=None, control_type=0, entry=None, transport=DEFAULT_TRANSPORT, send_queue_overflow=DEFAULT_SEND_QUEUE_OVERFLOW, merge_commands=DEFAULT_MERGE_COMMANDS):
         self._name = name
         self._dev_id = dev_id
         self._address = address
@@ -120,13 +196,29 @@ class TuyaRC(RemoteEntity):
         self._control_type = control_type or 0
         self._entry = entry
         
-        self._storage = None
+        self._code_store = None
         self._codes = {}
+        self._static_attributes = self._build_static_attributes()
         self._available = False
 
         self._device = None
         self._device_RF = None
         self._lock = threading.Lock()
+        # The hub on the event loop instead of tinytuya in the executor, see tuya_transport
+        self._transport = None
+        if transport == TRANSPORT_ASYNCIO:
+            self._transport = TuyaTransport(
+                dev_id,
+                address,
+                local_key,
+                protocol_version,
+                control_type=self._control_type,
+                persistent=persistent_connection,
+                timeout=self._CONNECTION_TIMEOUT,
+            )
+        self._merge_commands = merge_commands
+        # Sends run one at a time, in order, by the worker of the queue
+        self._send_queue = SendQueue(self._async_transmit, overflow=send_queue_overflow)
 
     def _init(self):
         if self._device:
@@ -238,18 +330,27 @@ class TuyaRC(RemoteEntity):
             serial_number=self._cloud_info['sn'] if self._cloud_info and 'sn' in self._cloud_info else None,
         )
 
-    @property
-    def extra_state_attributes(self):
+    def _build_static_attributes(self):
+        # Attributes that do not change while the entity exists
         # Make copy of self._cloud_info
         extra = self._cloud_info.copy() if self._cloud_info else {}
         if 'icon' in extra:
             extra['icon_url'] = extra['icon']
             del extra['icon']
-        # Add some extra attributes
         extra['protocol_version'] = self._protocol_version
+        return extra
+
+    @property
+    def extra_state_attributes(self):
+        extra = dict(self._static_attributes)
         if self._device:
             extra['control_type'] = self._device.control_type
-        extra['learned_commands'] = str({device: str(list(commands.keys())) for device, commands in self._codes.items()})
+        elif self._transport and self._transport.control_type:
+            extra['control_type'] = self._transport.control_type
+        # Cached by the code store until the codes change; the codes
+        # themselves are in the diagnostics of the config entry
+        if self._code_store:
+            extra.update(self._code_store.summary)
         return extra
 
     @property
@@ -272,7 +373,13 @@ class TuyaRC(RemoteEntity):
             entry_data = self.hass.data.get(DOMAIN, {}).get(self._entry.entry_id, {})
             if entry_data.get("remote_entity") is self:
                 del entry_data["remote_entity"]
+        await self._send_queue.async_stop()
         self._deinit()
+        if self._transport:
+            await self._transport.close()
+
+    def _busy(self):
+        return self._lock.locked() or (self._transport is not None and self._transport.busy)
 
     def _receive_button(self, timeout):
         with self._lock:
@@ -295,27 +402,30 @@ class TuyaRC(RemoteEntity):
     
     def _send_button(self, pulses):
         with self._lock:
-            try:
-                self._init()
-                if type(pulses) == str:
-                    _LOGGER.debug("Sending command as base64: '%s'", pulses)
-                    try:
-                        return self._device.send_button(pulses)
-                    except Exception as e:
-                        _LOGGER.error("Failed to send command as base64, exception %s: %s", type(e), e, exc_info=True)
-                        raise HomeAssistantError("tinytuya library internal error, please check the logs.")
-                else:
-                    _LOGGER.debug("Sending command as pulses: '%s'", pulses)
-                    b64 = Contrib.IRRemoteControlDevice.pulses_to_base64(pulses)
-                    _LOGGER.debug("Converted to base64: '%s'", b64)
-                    try:
-                        return self._device.send_button(b64)
-                    except Exception as e:
-                        _LOGGER.error("Failed to send command as pulses, exception %s: %s", type(e), e, exc_info=True)
-                        raise HomeAssistantError("tinytuya library internal error, please check the logs.")
-            except Exception as e:
-                self._deinit()
-                raise e
+            self._send_button_locked(pulses)
+
+    def _send_button_locked(self, pulses):
+        try:
+            self._init()
+            if type(pulses) == str:
+                _LOGGER.debug("Sending command as base64: '%s'", pulses)
+                try:
+                    return self._device.send_button(pulses)
+                except Exception as e:
+                    _LOGGER.error("Failed to send command as base64, exception %s: %s", type(e), e, exc_info=True)
+                    raise HomeAssistantError("tinytuya library internal error, please check the logs.")
+            else:
+                _LOGGER.debug("Sending command as pulses: '%s'", pulses)
+                b64 = pulses_to_base64(pulses)
+                _LOGGER.debug("Converted to base64: '%s'", b64)
+                try:
+                    return self._device.send_button(b64)
+                except Exception as e:
+                    _LOGGER.error("Failed to send command as pulses, exception %s: %s", type(e), e, exc_info=True)
+                    raise HomeAssistantError("tinytuya library internal error, please check the logs.")
+        except Exception as e:
+            self._deinit()
+            raise e
     
     def _receive_button_rf(self, timeout):
         with self._lock:
@@ -337,22 +447,146 @@ class TuyaRC(RemoteEntity):
     
     def _send_button_rf(self, base64):
         with self._lock:
+            self._send_button_rf_locked(base64)
+
+    def _send_button_rf_locked(self, base64):
+        try:
+            self._init_rf()
             try:
-                self._init_rf()
-                try:
-                    _LOGGER.debug("Sending command as base64: '%s'", base64)
-                    return self._device_RF.rf_send_button(base64)
-                except Exception as e:
-                    _LOGGER.error("Failed to send RF button, exception %s: %s", type(e), e, exc_info=True)
-                    raise HomeAssistantError("tinytuya library internal rf error, please check the logs.")
+                _LOGGER.debug("Sending command as base64: '%s'", base64)
+                return self._device_RF.rf_send_button(base64)
             except Exception as e:
-                self._deinit()
-                raise e
+                _LOGGER.error("Failed to send RF button, exception %s: %s", type(e), e, exc_info=True)
+                raise HomeAssistantError("tinytuya library internal rf error, please check the logs.")
+        except Exception as e:
+            self._deinit()
+            raise e
+
+    def _send_batch(self, steps):
+        # One lock and one connection for the whole batch, even when the
+        # connection is not persistent; tinytuya closes it after every command
+        # otherwise
+        with self._lock:
+            try:
+                for label, kind, code, delay in steps:
+                    try:
+                        if kind == "rf":
+                            self._init_rf()
+                            self._device_RF.set_socketPersistent(True)
+                            self._send_button_rf_locked(code)
+                        else:
+                            self._init()
+                            self._device.set_socketPersistent(True)
+                            self._send_button_locked(code)
+                    except Exception as e:
+                        raise HomeAssistantError(f"Cannot send command '{label}': {e}") from e
+                    if delay > 0:
+                        time.sleep(delay)
+            finally:
+                for device in (self._device, self._device_RF):
+                    if device:
+                        device.set_socketPersistent(self._persistent_connection)
+
+    async def _async_transmit(self, item):
+        # Called by the worker of the send queue with ("ir", payload),
+        # ("pulses", durations), ("rf", code) or ("batch", steps)
+        kind, code = item
+        if kind == "batch":
+            await self._async_send_batch(code)
+        elif kind == "rf":
+            await self._async_send_button_rf(code)
+        elif kind == "pulses":
+            await self._async_send_button(list(code))
+        else:
+            await self._async_send_button(code)
+
+    async def _async_send_button(self, payload):
+        if not self._transport:
+            return await self.hass.async_add_executor_job(self._send_button, payload)
+        if not isinstance(payload, str):
+            payload = pulses_to_base64(payload)
+        _LOGGER.debug("Sending command as base64: '%s'", payload)
+        try:
+            await self._transport.send_ir(payload)
+        except TuyaTransportError as e:
+            _LOGGER.error("Failed to send command, exception %s: %s", type(e), e, exc_info=True)
+            raise HomeAssistantError(f"Cannot send the command: {e}") from e
+
+    async def _async_send_button_rf(self, base64):
+        if not self._transport:
+            return await self.hass.async_add_executor_job(self._send_button_rf, base64)
+        _LOGGER.debug("Sending RF command as base64: '%s'", base64)
+        try:
+            await self._transport.send_rf(base64)
+        except TuyaTransportError as e:
+            _LOGGER.error("Failed to send RF button, exception %s: %s", type(e), e, exc_info=True)
+            raise HomeAssistantError(f"Cannot send the RF command: {e}") from e
+
+    async def _async_send_batch(self, steps):
+        # steps: (label, kind, code, delay) per command, see async_send_command()
+        if not self._transport:
+            return await self.hass.async_add_executor_job(self._send_batch, steps)
+        try:
+            await self._transport.send_batch([(kind, code, delay) for _, kind, code, delay in steps])
+        except TuyaBatchError as e:
+            _LOGGER.error("Failed to send command '%s', exception %s: %s", steps[e.index][0], type(e), e, exc_info=True)
+            raise HomeAssistantError(f"Cannot send command '{steps[e.index][0]}': {e}") from e
+
+    @staticmethod
+    def _hold_steps(label, fmt, payload, hold, delay):
+        # The held button as few codes as fit, see hold_trains(). Sends do not
+        # wait for the hub, so each code waits for the air time of the one before
+        trains, gaps = hold_trains(fmt, base64_to_pulses(payload), hold)
+        codes = merge_pulses(trains, gaps)
+        steps = [(label, "ir", pulses_to_base64(pulses), sum(pulses) / 1000000) for _, pulses in codes]
+        steps[-1] = steps[-1][:3] + (steps[-1][3] + delay,)
+        return steps
+
+    @staticmethod
+    def _merge_steps(steps):
+        # Runs of IR steps joined into as few codes as fit, see merge_pulses().
+        # A merged code waits for the air time of all but its last train too
+        merged = []
+        for kind, run in itertools.groupby(steps, key=lambda step: step[1]):
+            run = list(run)
+            if kind != "ir" or len(run) == 1:
+                merged += run
+                continue
+            trains = [base64_to_pulses(payload) for _, _, payload, _ in run]
+            gaps = [round(delay * 1000000) for _, _, _, delay in run]
+            start = 0
+            for count, pulses in merge_pulses(trains, gaps):
+                part = run[start:start + count]
+                start += count
+                if count == 1:
+                    merged += part
+                else:
+                    label = ", ".join(label for label, _, _, _ in part)
+                    delay = (sum(pulses) - sum(trains[start - 1])) / 1000000 + part[-1][3]
+                    merged.append((label, "ir", pulses_to_base64(pulses), delay))
+        return tuple(merged)
+
+    async def _async_receive_button(self, timeout, rf=False):
+        if not self._transport:
+            return await self.hass.async_add_executor_job(self._receive_button_rf if rf else self._receive_button, timeout)
+        try:
+            return await self._transport.study(timeout, rf=rf)
+        except TuyaTransportError as e:
+            _LOGGER.error("Failed to receive button, exception %s: %s", type(e), e, exc_info=True)
+            raise HomeAssistantError(f"Cannot learn the command: {e}") from e
 
     async def _async_load_storage_files(self):
-        if not self._storage:
-            self._storage = Store(self.hass, CODE_STORAGE_VERSION, CODE_STORAGE_CODES)
-        self._codes.update(await self._storage.async_load() or {})
+        # Read from disk only once, see CodeStore
+        if not self._code_store:
+            self._code_store = async_get_code_store(self.hass, self._dev_id)
+        self._codes = await self._code_store.async_load()
+
+    async def _async_library_code(self, device, command):
+        libraries = await async_get_code_libraries(self.hass)
+        if not libraries.libraries:
+            return None
+        # Reading the mapped pages may hit the disk
+        return await self.hass.async_add_executor_job(libraries.lookup_device, device, command)
 
     async def async_turn_on(self, **kwargs):
         """Turn the device on."""
@@ -425,19 +659,54 @@ class TuyaRC(RemoteEntity):
             self._deinit()
         _LOGGER.debug("Device %s is available: %s", self._dev_id, self._available)
 
+    async def _async_update_availibility(self):
+        # _update_availibility() on the event loop, for the asyncio transport
+        transport = self._transport
+        if transport.busy:
+            _LOGGER.debug("Skipping availability update for busy device %s", self._dev_id)
+            return
+        _LOGGER.debug("Updating device %s availibility...", self._dev_id)
+        try:
+            try:
+                status = await transport.status()
+            except TuyaConnectionError:
+                raise
+            except TuyaTransportError as e:
+                # The same wake probe as _update_availibility_locked()
+                if not transport.control_type:
+                    raise
+                _LOGGER.debug("Waking IR device %s after an unresponsive status request: %s", self._dev_id, e)
+                await transport.study_end()
+                status = await transport.status()
+            _LOGGER.debug("Device status: %s", status)
+            self._available = True
+        except TuyaTransportError as e:
+            self._available = False
+            _LOGGER.error("Failed to update device %s: %s", self._dev_id, e)
+        if self._available and not transport.control_type:
+            _LOGGER.warning("control_type for %s is not detected, will retry on next poll", self._dev_id)
+            self._available = False
+        if self._available:
+            self._control_type = transport.control_type
+            self._persist_control_type(self._control_type)
+        _LOGGER.debug("Device %s is available: %s", self._dev_id, self._available)
+
     async def async_update(self):
         """Update the device."""
-        if self._lock.locked():
+        if self._busy():
             _LOGGER.debug("Skipping availability update for busy device %s", self._dev_id)
             return
-        await self.hass.async_add_executor_job(self._update_availibility)
+        if self._transport:
+            await self._async_update_availibility()
+        else:
+            await self.hass.async_add_executor_job(self._update_availibility)
         await self._async_load_storage_files()
 
     async def async_send_ir_pulses(self, pulses):
         """Send raw IR pulses (unsigned mark/space durations in µs, tinytuya format)
         through this entity's connection, for infrared.py's emitter entity to reuse."""
         try:
-            await self.hass.async_add_executor_job(self._send_button, pulses)
+            await self._send_queue.async_send(("pulses", tuple(pulses)))
         except HomeAssistantError:
             raise
         except Exception as e:
@@ -451,31 +720,65 @@ class TuyaRC(RemoteEntity):
         repeat_delay = kwargs.get(ATTR_DELAY_SECS, 0)
         hold = kwargs.get(ATTR_HOLD_SECS, 0)
         
-        if hold != 0:
-            raise NotImplementedError("Hold time is not supported.")
-        
         try:
             await self._async_load_storage_files()
-            for n in range(repeat):
-                for cmd in command:
-                    if device:
-                        if not device in self._codes:
-                            raise KeyError(f"Device '{device}' not found in the codes storage.")
-                        if not cmd in self._codes[device]:
-                            raise KeyError(f"Command '{cmd}' not found in the codes storage for device '{device}'.")
-                        code = self._codes[device][cmd]
-                        _LOGGER.debug("Sending command '%s' for device '%s', code: %s", cmd, device, code)
+            # Resolved and encoded up front, then sent as one batch
+            resolved = []
+            for cmd in command:
+                if device and not device in self._codes:
+                    # Not learned, try the code libraries ("<brand>/<device>")
+                    code = await self._async_library_code(device, cmd)
+                    if code is None:
+                        # Learned with another hub maybe, the index knows without loading its codes
+                        hubs = async_get_code_index(self.hass).hubs(device)
+                        if hubs:
+                            raise KeyError(f"Device '{device}' not found in the codes storage, it was learned with the hub(s) {', '.join(hubs)}.")
+                        raise KeyError(f"Device '{device}' not found in the codes storage.")
+                    payload = None
+                    _LOGGER.debug("Sending command '%s' for device '%s' from a code library, code: %s", cmd, device, code)
+                elif device:
+                    if not cmd in self._codes[device]:
+                        raise KeyError(f"Command '{cmd}' not found in the codes storage for device '{device}'.")
+                    record = self._codes[device][cmd]
+                    _LOGGER.debug("Sending command '%s' for device '%s', record: %s", cmd, device, record)
+                    # Encoded when the code was stored, see code_record()
+                    payload = record.get("payload")
+                    code = record.get("code")
+                else:
+                    payload = None
+                    code = cmd
+                    _LOGGER.debug("Sending command, code: '%s'", code)
+                if payload is None and code.startswith("rf:"):
+                    if hold:
+                        raise ValueError(f"Hold time is not supported for RF command '{cmd}'.")
+                    resolved.append((cmd, "rf", code[3:], None, None))
+                elif payload is None:
+                    # Parsed and encoded once per distinct code, see compile_command()
+                    compiled = compile_command(code)
+                    if compiled.toggles:
+                        # The toggle bit flips on every send, picked per step below
+                        resolved.append((cmd, "ir", None, compiled, compiled.format))
                     else:
-                        code = cmd
-                        _LOGGER.debug("Sending command, code: '%s'", code)
-                    if code.startswith("rf:"):
-                        await self.hass.async_add_executor_job(self._send_button_rf, code[3:])
+                        resolved.append((cmd, "ir", compiled.payload(), None, compiled.format))
+                else:
+                    # Raw codes are stored as the payload only
+                    fmt = compile_command(code).format if hold and code else "raw"
+                    resolved.append((cmd, "ir", payload, None, fmt))
+            steps = []
+            for n in range(repeat):
+                delay = repeat_delay if n < repeat - 1 and repeat_delay > 0 else 0
+                for label, kind, payload, compiled, fmt in resolved:
+                    if compiled:
+                        payload = compiled.payload()
+                    if hold and kind == "ir":
+                        steps += self._hold_steps(label, fmt, payload, hold, delay)
                     else:
-                        pulses = rc_auto_encode(code)
-                        _LOGGER.debug("Command pulses: %s", pulses)
-                        await self.hass.async_add_executor_job(self._send_button, pulses)
-                    if n < repeat - 1 and repeat_delay > 0:
-                        await asyncio.sleep(repeat_delay)
+                        steps.append((label, kind, payload, delay))
+            steps = tuple(steps)
+            if self._merge_commands:
+                steps = self._merge_steps(steps)
+            _LOGGER.debug("Sending %d commands: %s", len(steps), steps)
+            await self._send_queue.async_send(("batch", steps))
         except Exception as e:
             _LOGGER.error("Failed to send command, exception %s: %s", type(e), e, exc_info=True)
             raise HomeAssistantError(str(e))
@@ -498,7 +801,7 @@ class TuyaRC(RemoteEntity):
             if not command: raise ValueError("You need to specify a command name to learn.")
             if command_type != "ir" and command_type != "rf": raise NotImplementedError(f'Unknown command type "{command_type}", only "ir" and "rf" is supported.')
             if alternative != None: raise ValueError('"Alternative" option is not supported.')
-            if self._lock.locked():
+            if self._busy():
                 raise HomeAssistantError("Device is busy, please wait and try again.")
             async_create(
                 self.hass,
@@ -508,10 +811,7 @@ class TuyaRC(RemoteEntity):
             )
             
             _LOGGER.debug(f"Waiting for button press...")
-            if command_type == "ir":
-                button = await self.hass.async_add_executor_job(self._receive_button, timeout)
-            elif command_type == "rf":
-                button = await self.hass.async_add_executor_job(self._receive_button_rf, timeout)
+            button = await self._async_receive_button(timeout, rf=command_type == "rf")
             _LOGGER.debug("Button pressed: %s", button)
             if button == None: raise TimeoutError("Timeout. Please try again.")
             if isinstance(button, dict) and "Error" in button:
@@ -528,7 +828,7 @@ class TuyaRC(RemoteEntity):
                 raise ValueError("The device did not report a button code in time. Please try again: hold the remote closer, press the button firmly for ~1 second, or increase the learn timeout.")
             
             if command_type == "ir":
-                pulses = Contrib.IRRemoteControlDevice.base64_to_pulses(button)
+                pulses = base64_to_pulses(button)
                 if len(pulses) < 4:
                     raise ValueError("This IR code is too short and seems to be invalid. Please try to learn the command again.")
                 decoded = rc_auto_decode(pulses)
@@ -544,8 +844,7 @@ class TuyaRC(RemoteEntity):
             
             if device:
                 await self._async_load_storage_files()
-                self._codes.setdefault(device, {}).update({command: decoded})
-                await self._storage.async_save(self._codes)
+                self._code_store.async_set_code(device, command, decoded)
                 self.schedule_update_ha_state() # Update device attributes
                 msg = f'Successfully learned command "<b>{command}</b>" for device "<b>{device}</b>", code:\r\n<pre>{decoded}</pre>' + \
                     (f"Raw code:<pre>{decoded_raw}</pre>" if not decoded.startswith("raw:") else "") + \
@@ -595,8 +894,7 @@ class TuyaRC(RemoteEntity):
 
         deleted = False
         for command in commands:
-            if device in self._codes and command in self._codes[device]:
-                del self._codes[device][command]
+            if self._code_store.async_delete_code(device, command):
                 deleted = True
                 async_create(
                     self.hass,
@@ -606,8 +904,62 @@ class TuyaRC(RemoteEntity):
         if not deleted:
             raise HomeAssistantError(f'Command "{command}" for device "{device}" not found.')
 
-        # Remove device if no commands left
-        if device in self._codes and not self._codes[device]:
-            del self._codes[device]
+    async def async_import_codes(self, path, device=None):
+        """Import the codes of Flipper, LIRC and Broadlink files (a file or a directory) into the codes storage."""
+        path = self._allowed_path(path)
+        try:
+            # Reading and converting the files is blocking
+            records, count, errors = await self.hass.async_add_executor_job(_read_records, path, device)
+        except (OSError, ValueError) as e:
+            _LOGGER.error("Failed to import codes from %s, exception %s: %s", path, type(e), e, exc_info=True)
+            raise HomeAssistantError(f"Cannot import codes from '{path}': {e}") from e
+
+        await self._async_load_storage_files()
+        self._code_store.async_set_records(records)
+        self.async_write_ha_state()
+
+        _LOGGER.debug("Imported %d code(s) from %s, %d skipped", count, path, len(errors))
+        msg = f'Imported {count} command(s) for device(s) {", ".join(f"<b>{d}</b>" for d in sorted(records)) or "-"} from "{path}".'
+        if errors:
+            msg += f"\n\n{len(errors)} signal(s) could not be converted:<pre>" + "\n".join(errors[:20]) + \
+                ("\n..." if len(errors) > 20 else "") + "</pre>"
+        async_create(
+            self.hass,
+            msg,
+            title=NOTIFICATION_TITLE,
+        )
+
+    async def async_export_codes(self, path, format=EXPORT_FORMATS[0], decode=False):
+        """Export the codes of the hub to a file (a directory of .ir files for the flipper format)."""
+        if path.endswith(("/", os.sep)):
+            # A directory, one export per hub
+            path += self.entity_id.split(".", 1)[-1] + EXPORT_SUFFIXES[format]
+        path = self._allowed_path(path)
+        await self._async_load_storage_files()
+        # The records are replaced, not changed, so copies of the device dicts
+        # are enough to write a consistent export while new codes are learned
+        codes = {device: dict(commands) for device, commands in self._code_store.codes.items()}
+        try:
+            count, skipped = await self.hass.async_add_executor_job(write_codes, path, iter_codes(codes), format, decode)
+        except (OSError, ValueError) as e:
+            _LOGGER.error("Failed to export codes to %s, exception %s: %s", path, type(e), e, exc_info=True)
+            raise HomeAssistantError(f"Cannot export codes to '{path}': {e}") from e
+
+        _LOGGER.debug("Exported %d code(s) to %s, %d skipped", count, path, skipped)
+        msg = f'Exported {count} command(s) of {len(codes)} device(s) to "{path}".'
+        if skipped:
+            msg += f"\n\n{skipped} command(s) cannot be written in the {format} format."
+        async_create(
+            self.hass,
+            msg,
+            title=NOTIFICATION_TITLE,
+        )
 
-        await self._storage.async_save(self._codes)
+    def _allowed_path(self, path):
+        # The absolute path, if it is in the configuration directory or allowed
+        path = self.hass.config.path(path)
+        config_dir = os.path.realpath(self.hass.config.config_dir)
+        inside_config = os.path.commonpath([os.path.realpath(path), config_dir]) == config_dir
+        if not inside_config and not self.hass.config.is_allowed_path(path):
+            raise HomeAssistantError(f"Access to '{path}' is not allowed, add it to allowlist_external_dirs.")
+        return path
@@ -0,0 +1,145 @@
+"""
+Send queue of a hub: transmissions run one at a time, in the order they were
+queued, by one worker task.
+
+Callers await the result of their own transmission. The queue is bounded;
+what happens to a transmission queued while it is full is the overflow policy:
+  - reject: it fails with SendQueueFullError
+  - drop_oldest: the oldest waiting transmission fails instead
+  - coalesce: it shares the result of an identical waiting transmission, and
+    is rejected if there is none; while there is room, identical transmissions
+    are all sent
+"""
+
+import asyncio
+import logging
+
+_LOGGER = logging.getLogger(__name__)
+
+OVERFLOW_REJECT = "reject"
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+OVERFLOW_COALESCE = "coalesce"
+OVERFLOW_POLICIES = [OVERFLOW_REJECT, OVERFLOW_DROP_OLDEST, OVERFLOW_COALESCE]
+
+# Transmissions waiting per hub
+SEND_QUEUE_SIZE = 16
+
+
+class SendQueueFullError(Exception):
+    """The transmission was rejected or dropped because the queue was full."""
+
+
+class SendQueue:
+    """Transmissions of one hub, sent by one worker task.
+
+    Args:
+        send (coroutine function): Called with the item of each transmission.
+        maxsize (int, optional): Transmissions waiting at most.
+        overflow (str, optional): One of OVERFLOW_POLICIES.
+
+    Attributes:
+        sent (int): Number of transmissions the worker ran, failed ones included.
+        coalesced (int): Number of transmissions merged into a waiting one.
+        dropped (int): Number of transmissions rejected or dropped.
+    """
+
+    def __init__(self, send, maxsize=SEND_QUEUE_SIZE, overflow=OVERFLOW_REJECT):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self._send = send
+        self._overflow = overflow
+        self._queue = asyncio.Queue(maxsize)
+        # item -> future of the last waiting transmission of the item
+        self._pending = {}
+        self._worker = None
+        self.sent = 0
+        self.coalesced = 0
+        self.dropped = 0
+
+    @property
+    def size(self):
+        """Number of transmissions waiting."""
+        return self._queue.qsize()
+
+    async def async_send(self, item):
+        """
+        Queue a transmission and wait until it is sent.
+
+        Args:
+            item (hashable): What to send, passed to the send function; identical
+                items are merged by the coalesce policy when the queue is full.
+
+        Returns:
+            The result of the send function.
+
+        Raises:
+            SendQueueFullError: If the queue is full, see the overflow policy.
+        """
+        future = self._put(item)
+        # A cancelled caller does not cancel a transmission others may share
+        return await asyncio.shield(future)
+
+    def _put(self, item):
+        if self._queue.full():
+            if self._overflow == OVERFLOW_COALESCE and item in self._pending:
+                # Only while full: every other transmission is sent, presses are not idempotent
+                self.coalesced += 1
+                return self._pending[item]
+            if self._overflow != OVERFLOW_DROP_OLDEST:
+                self.dropped += 1
+                raise SendQueueFullError(f"Too many commands waiting ({self._queue.maxsize}), try again later")
+            old_item, old_future = self._queue.get_nowait()
+            _LOGGER.debug("Send queue is full, dropping %r", old_item)
+            self._queue.task_done()
+            self._forget(old_item, old_future)
+            self.dropped += 1
+            if not old_future.done():
+                old_future.set_exception(SendQueueFullError("Dropped for a newer command, too many commands waiting"))
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((item, future))
+        self._pending[item] = future
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.ensure_future(self._run())
+        return future
+
+    def _forget(self, item, future):
+        if self._pending.get(item) is future:
+            del self._pending[item]
+
+    async def _run(self):
+        while True:
+            item, future = await self._queue.get()
+            self._forget(item, future)
+            try:
+                if future.done():
+                    continue
+                try:
+                    result = await self._send(item)
+                except asyncio.CancelledError:
+                    # Stopped while sending
+                    future.cancel()
+                    raise
+                except Exception as e:
+                    if not future.done():
+                        future.set_exception(e)
+                else:
+                    if not future.done():
+                        future.set_result(result)
+                self.sent += 1
+            finally:
+                self._queue.task_done()
+
+    async def async_stop(self):
+        """Stop the worker; waiting transmissions are cancelled."""
+        worker, self._worker = self._worker, None
+        if worker is not None:
+            worker.cancel()
+            try:
+                await worker
+            except asyncio.CancelledError:
+                pass
+        while not self._queue.empty():
+            item, future = self._queue.get_nowait()
+            self._queue.task_done()
+            self._forget(item, future)
+            future.cancel()
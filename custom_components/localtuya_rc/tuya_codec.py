@@ -0,0 +1,117 @@
+"""
+Conversion between pulse/gap durations and the base64 IR code format of Tuya devices.
+
+Drop-in replacements for tinytuya's Contrib.IRRemoteControlDevice.pulses_to_base64()
+and base64_to_pulses() with byte-identical output. A code is the list of durations
+(microseconds) packed as little-endian unsigned 16-bit integers and base64 encoded.
+The durations are packed into an array('H') in one go and base64 works directly on
+its buffer, instead of converting them element by element.
+"""
+
+import array
+import base64
+import sys
+
+# Largest duration that fits the format (microseconds)
+MAX_DURATION = 0xFFFF
+
+# Longest code sent in one transmission (durations); hubs drop longer payloads
+MAX_PULSES = 512
+
+# Space between merged frames when no delay is requested (microseconds)
+FRAME_GAP = 40000
+
+# The wire format is little-endian, array('H') uses the native byte order
+_SWAP = sys.byteorder == "big"
+
+def pulses_to_base64(pulses):
+    """
+    Encode pulse and gap durations as a Tuya base64 IR code.
+
+    Args:
+        pulses (iterable of int): Pulse and gap durations in microseconds. An
+            array('H'), such as pulse.Pulses, is encoded without a copy.
+
+    Returns:
+        str: The base64 encoded code.
+
+    Raises:
+        ValueError: If a duration is not an integer in range 0..MAX_DURATION.
+    """
+    if isinstance(pulses, array.array) and pulses.typecode == "H":
+        # Already packed (pulse.Pulses), encode its buffer as it is
+        buffer = array.array("H", pulses) if _SWAP else pulses
+    else:
+        try:
+            buffer = array.array("H", pulses)
+        except (OverflowError, TypeError) as e:
+            raise ValueError(f"Invalid pulse duration: {e}") from e
+    if _SWAP:
+        buffer.byteswap()
+    return base64.b64encode(buffer).decode("ascii")
+
+def base64_to_pulses(code):
+    """
+    Decode a Tuya base64 IR code into pulse and gap durations.
+
+    Codes may be prefixed with "1", like tinytuya accepts them.
+
+    Args:
+        code (str): The base64 encoded code.
+
+    Returns:
+        list of int: Pulse and gap durations in microseconds.
+
+    Raises:
+        ValueError: If the code is not valid base64 or does not hold 16-bit values.
+    """
+    if len(code) % 4 == 1 and code.startswith("1"):
+        # code can be padded with "1"
+        code = code[1:]
+    raw = base64.b64decode(code)
+    if len(raw) % 2:
+        raise ValueError(f"Invalid IR code length: {len(raw)} bytes (must be even)")
+    buffer = array.array("H")
+    buffer.frombytes(raw)
+    if _SWAP:
+        buffer.byteswap()
+    return buffer.tolist()
+
+def merge_pulses(trains, gaps, max_pulses=MAX_PULSES):
+    """
+    Join pulse trains into as few codes as possible, sent back to back.
+
+    Consecutive trains are joined with a space between them: the requested gap
+    added to the trailing space of the first train, or at least FRAME_GAP when
+    no gap is requested. Trains are not joined when that space does not fit a
+    duration (MAX_DURATION) or the code would exceed max_pulses durations; a
+    single train is never split.
+
+    Args:
+        trains (list of list of int): Pulse and gap durations of each train.
+        gaps (list of int): Space after each train (microseconds), 0 for the
+            default frame gap. The gap after the last train is not used.
+        max_pulses (int, optional): Durations per code at most.
+
+    Returns:
+        list of tuple: (count, pulses) per code, where the code holds the next
+        count trains.
+    """
+    codes = []
+    for train, gap in zip(trains, [0] + list(gaps)):
+        if codes:
+            count, pulses = codes[-1]
+            if len(pulses) % 2:
+                # Ends with a pulse
+                trailing, head = 0, len(pulses)
+            else:
+                trailing, head = pulses[-1], len(pulses) - 1
+            space = trailing + gap if gap else max(trailing, FRAME_GAP)
+            if space <= MAX_DURATION and head + 1 + len(train) <= max_pulses:
+                del pulses[head:]
+                pulses.append(space)
+                pulses.extend(train)
+                codes[-1] = (count + 1, pulses)
+                continue
+        codes.append((1, list(train)))
+    return codes
@@ -0,0 +1,566 @@
+"""
+Tuya LAN protocol (3.1 - 3.5) on asyncio streams, for IR/RF hubs.
+
+An alternative to the tinytuya devices of remote.py: TuyaTransport talks to the
+hub through asyncio.open_connection(), so a hub that does not answer costs a
+pending coroutine instead of an executor thread blocked on a socket timeout.
+
+Frames:
+  - 55AA (3.1 - 3.4): header, payload, CRC32 (HMAC-SHA256 for 3.4), suffix
+  - 6699 (3.5): header, IV, AES-GCM encrypted payload, tag, suffix
+
+Payloads are AES-ECB encrypted with the local key (control commands only for
+3.1, everything for 3.2 and 3.3), or with a session key negotiated after
+connecting (AES-ECB for 3.4, AES-GCM for 3.5). Frames of the device start with
+a return code, split off by unpack_message().
+"""
+
+import asyncio
+import base64
+import binascii
+import contextlib
+import hashlib
+import hmac
+import json
+import logging
+import os
+import struct
+import time
+from collections import namedtuple
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+_LOGGER = logging.getLogger(__name__)
+
+PORT = 6668
+
+PREFIX_55AA = 0x000055AA
+SUFFIX_55AA = 0x0000AA55
+PREFIX_6699 = 0x00006699
+SUFFIX_6699 = 0x00009966
+HEADER_55AA = struct.Struct(">4I")
+# prefix, reserved, seqno, command, length
+HEADER_6699 = struct.Struct(">IHIII")
+# Larger frames mean the stream is out of sync
+MAX_FRAME_LENGTH = 0x2000
+
+# Commands
+SESS_KEY_NEG_START = 0x03
+SESS_KEY_NEG_RESP = 0x04
+SESS_KEY_NEG_FINISH = 0x05
+CONTROL = 0x07
+STATUS = 0x08
+HEART_BEAT = 0x09
+DP_QUERY = 0x0A
+CONTROL_NEW = 0x0D
+DP_QUERY_NEW = 0x10
+UPDATEDPS = 0x12
+LAN_EXT_STREAM = 0x40
+# Commands sent without the "3.x" version header
+NO_VERSION_HEADER = frozenset({
+    SESS_KEY_NEG_START, SESS_KEY_NEG_RESP, SESS_KEY_NEG_FINISH,
+    HEART_BEAT, DP_QUERY, DP_QUERY_NEW, UPDATEDPS, LAN_EXT_STREAM,
+})
+
+# Data points of control type 1 (JSON commands in DP 201) and 2 (DPs 1-13)
+DP_SEND_IR = "201"
+DP_LEARNED_ID = "202"
+DP_MODE = "1"
+DP_LEARNED_REPORT = "2"
+DP_KEY_STUDY = "7"
+DP_CODE_TYPE = "13"
+
+# RF study and send settings, the frequency comes with the code
+RF_TYPE = "sub_2g"
+RF_VERSION = "2"
+RF_TIMES = 6
+
+TuyaMessage = namedtuple("TuyaMessage", "seqno cmd retcode payload")
+
+
+class TuyaTransportError(Exception):
+    """The hub failed to answer or answered with something unexpected."""
+
+
+class TuyaConnectionError(TuyaTransportError):
+    """The connection to the hub could not be opened."""
+
+
+class _QueryRejected(TuyaTransportError):
+    """The hub answered the status query with "data unvalid"."""
+
+
+class TuyaBatchError(TuyaTransportError):
+    """A command of TuyaTransport.send_batch() failed.
+
+    Attributes:
+        index (int): The index of the command; the commands before it were sent.
+    """
+
+    def __init__(self, index, error):
+        super().__init__(str(error))
+        self.index = index
+
+
+def _aes_ecb(key, data, encrypt):
+    cipher = Cipher(algorithms.AES(key), modes.ECB())
+    context = cipher.encryptor() if encrypt else cipher.decryptor()
+    return context.update(data) + context.finalize()
+
+
+def encrypt_ecb(key, data, pad=True):
+    """AES-ECB encrypt data, with PKCS7 padding by default."""
+    if pad:
+        n = 16 - len(data) % 16
+        data += bytes([n]) * n
+    return _aes_ecb(key, data, True)
+
+
+def decrypt_ecb(key, data):
+    """AES-ECB decrypt data and remove the PKCS7 padding."""
+    data = _aes_ecb(key, data, False)
+    n = data[-1] if data else 0
+    if 0 < n <= 16 and data.endswith(bytes([n]) * n):
+        data = data[:-n]
+    return data
+
+
+def session_key(version, local_key, local_nonce, remote_nonce):
+    """Return the session key of 3.4 and 3.5 connections."""
+    key = bytes(a ^ b for a, b in zip(local_nonce, remote_nonce))
+    if version >= 3.5:
+        # The ciphertext only, without the tag
+        return AESGCM(local_key).encrypt(local_nonce[:12], key, None)[:16]
+    return encrypt_ecb(local_key, key, pad=False)
+
+
+def pack_message(seqno, cmd, payload, hmac_key=None, retcode=None):
+    """
+    Pack a 55AA frame.
+
+    Args:
+        seqno (int): The sequence number.
+        cmd (int): The command.
+        payload (bytes): The payload, already encrypted.
+        hmac_key (bytes, optional): The HMAC-SHA256 key of 3.4, a CRC32 is used without it.
+        retcode (int, optional): The return code, for frames of the device.
+
+    Returns:
+        bytes: The frame.
+    """
+    if retcode is not None:
+        payload = struct.pack(">I", retcode) + payload
+    end_length = 36 if hmac_key else 8
+    data = HEADER_55AA.pack(PREFIX_55AA, seqno, cmd, len(payload) + end_length) + payload
+    if hmac_key:
+        data += hmac.new(hmac_key, data, hashlib.sha256).digest()
+    else:
+        data += struct.pack(">I", binascii.crc32(data))
+    return data + struct.pack(">I", SUFFIX_55AA)
+
+
+def pack_message_6699(seqno, cmd, payload, key, retcode=None, iv=None):
+    """
+    Pack and encrypt a 6699 frame.
+
+    Args:
+        seqno (int): The sequence number.
+        cmd (int): The command.
+        payload (bytes): The payload.
+        key (bytes): The AES-GCM key.
+        retcode (int, optional): The return code, for frames of the device.
+        iv (bytes, optional): The 12-byte IV, random by default.
+
+    Returns:
+        bytes: The frame.
+    """
+    if retcode is not None:
+        payload = struct.pack(">I", retcode) + payload
+    iv = iv or os.urandom(12)
+    header = HEADER_6699.pack(PREFIX_6699, 0, seqno, cmd, len(iv) + len(payload) + 16)
+    # The header after the prefix is authenticated too
+    return header + iv + AESGCM(key).encrypt(iv, payload, header[4:]) + struct.pack(">I", SUFFIX_6699)
+
+
+def unpack_message(data, key=None):
+    """
+    Unpack a frame of the device.
+
+    Args:
+        data (bytes): The frame.
+        key (bytes, optional): The AES-GCM key of 6699 frames, the HMAC key of
+            55AA frames of 3.4; 55AA frames are checked with their CRC32 without it.
+
+    Returns:
+        TuyaMessage: The frame, with the payload still encrypted for 55AA frames.
+
+    Raises:
+        TuyaTransportError: If the frame is truncated or its checksum is wrong.
+    """
+    prefix, = struct.unpack_from(">I", data)
+    if prefix == PREFIX_55AA:
+        _, seqno, cmd, length = HEADER_55AA.unpack_from(data)
+        end_length = 36 if key else 8
+        if length < 4 + end_length or len(data) != HEADER_55AA.size + length:
+            raise TuyaTransportError("Truncated frame")
+        body, end = data[:-end_length], data[-end_length:-4]
+        if key:
+            valid = hmac.compare_digest(end, hmac.new(key, body, hashlib.sha256).digest())
+        else:
+            valid = struct.unpack(">I", end)[0] == binascii.crc32(body)
+        if not valid:
+            raise TuyaTransportError("Frame checksum mismatch")
+        payload = body[HEADER_55AA.size:]
+    elif prefix == PREFIX_6699:
+        _, _, seqno, cmd, length = HEADER_6699.unpack_from(data)
+        if length < 12 + 4 + 16 or len(data) != HEADER_6699.size + length + 4:
+            raise TuyaTransportError("Truncated frame")
+        header, iv = data[:HEADER_6699.size], data[HEADER_6699.size:HEADER_6699.size + 12]
+        try:
+            payload = AESGCM(key).decrypt(iv, data[HEADER_6699.size + 12:-4], header[4:])
+        except InvalidTag:
+            raise TuyaTransportError("Frame authentication failed, check the local key") from None
+    else:
+        raise TuyaTransportError(f"Unknown frame prefix {prefix:08X}")
+    retcode, = struct.unpack_from(">I", payload)
+    return TuyaMessage(seqno, cmd, retcode, payload[4:])
+
+
+class TuyaTransport:
+    """Connection to a Tuya IR/RF hub on the local network.
+
+    Operations are run one at a time. The connection is opened by the first
+    operation and closed after every operation unless it is persistent; a
+    persistent connection the hub dropped while idle is opened again once.
+
+    Attributes:
+        control_type (int): 1 for hubs with DPs 201/202, 2 for DPs 1-13, 0 until
+            detected by status().
+    """
+
+    def __init__(self, dev_id, address, local_key, version, control_type=0, persistent=False, timeout=5, port=PORT):
+        self.dev_id = dev_id
+        self.address = address
+        self.local_key = local_key.encode("latin1")
+        self.version = float(version)
+        self.control_type = control_type or 0
+        self.persistent = persistent
+        self.timeout = timeout
+        self.port = port
+        self._version_header = str(self.version).encode() + bytes(12)
+        # 3.2 hubs, and 3.3 hubs answering "data unvalid", need the query of "device22"
+        self._device22 = self.version == 3.2
+        self._reader = None
+        self._writer = None
+        self._key = self.local_key
+        self._seqno = 1
+        self._lock = asyncio.Lock()
+
+    @property
+    def busy(self):
+        return self._lock.locked()
+
+    async def status(self):
+        """Return the data points of the hub ({dp: value}), detecting the control type."""
+        return await self._run(self._status)
+
+    async def send_ir(self, code):
+        """Send an IR code, the Tuya base64 payload (see tuya_codec)."""
+        await self._run(self._set, self._ir_command("send", code))
+
+    async def send_rf(self, code):
+        """Send an RF code, as received by study()."""
+        await self._run(self._set, self._rf_command("rfstudy_send", code))
+
+    async def send_batch(self, commands):
+        """
+        Send commands on one connection.
+
+        Args:
+            commands (list of tuple): (kind, code, delay); kind is "ir" or "rf", the
+                code as for send_ir() and send_rf(), delay the seconds to wait after it.
+
+        Raises:
+            TuyaBatchError: If a command fails.
+        """
+        progress = [0]
+        try:
+            await self._run(self._send_batch, commands, progress)
+        except TuyaTransportError as e:
+            raise TuyaBatchError(progress[0], e) from e
+
+    async def study(self, timeout, rf=False):
+        """
+        Wait for a button press on a remote.
+
+        Args:
+            timeout (float): Seconds to wait.
+            rf (bool, optional): Learn an RF code instead of an IR one.
+
+        Returns:
+            str: The code (the Tuya base64 payload for IR), or None on timeout.
+        """
+        return await self._run(self._study, timeout, rf)
+
+    async def study_end(self):
+        """Leave IR study mode; also wakes hubs that ignore status() after a reboot."""
+        await self._run(self._set, self._ir_command("study_exit"))
+
+    async def close(self):
+        async with self._lock:
+            await self._close()
+
+    async def _run(self, operation, *args):
+        async with self._lock:
+            try:
+                for attempt in range(2):
+                    reused = self._writer is not None
+                    try:
+                        return await operation(*args)
+                    except asyncio.TimeoutError:
+                        await self._close()
+                        raise TuyaTransportError(f"No response from {self.address}") from None
+                    except (OSError, EOFError) as e:
+                        await self._close()
+                        if reused and not attempt:
+                            _LOGGER.debug("Connection to %s was closed, reconnecting: %s", self.address, e)
+                            continue
+                        raise TuyaTransportError(f"Connection to {self.address} failed: {e}") from e
+                    except TuyaTransportError:
+                        await self._close()
+                        raise
+            finally:
+                if not self.persistent:
+                    await self._close()
+
+    async def _connect(self):
+        if self._writer is not None:
+            return
+        _LOGGER.debug("Connecting to %s (version %s)...", self.address, self.version)
+        try:
+            self._reader, self._writer = await asyncio.wait_for(
+                asyncio.open_connection(self.address, self.port), self.timeout
+            )
+        except (OSError, asyncio.TimeoutError) as e:
+            raise TuyaConnectionError(f"Cannot connect to {self.address}: {e or 'timeout'}") from e
+        self._seqno = 1
+        self._key = self.local_key
+        if self.version >= 3.4:
+            await asyncio.wait_for(self._negotiate_session_key(), self.timeout)
+
+    async def _close(self):
+        writer, self._reader, self._writer = self._writer, None, None
+        if writer is not None:
+            writer.close()
+            with contextlib.suppress(Exception):
+                await writer.wait_closed()
+
+    async def _negotiate_session_key(self):
+        local_nonce = os.urandom(16)
+        await self._send(SESS_KEY_NEG_START, local_nonce)
+        try:
+            # Hubs drop the connection or sign the answer with their key on a wrong key
+            msg = await self._receive()
+        except (TuyaTransportError, EOFError) as e:
+            raise TuyaTransportError(f"Session key negotiation failed, check the local key: {e}") from e
+        if msg.cmd != SESS_KEY_NEG_RESP:
+            raise TuyaTransportError(f"Session key negotiation failed, unexpected command {msg.cmd}")
+        payload = msg.payload
+        if self.version == 3.4:
+            payload = decrypt_ecb(self.local_key, payload)
+        expected = hmac.new(self.local_key, local_nonce, hashlib.sha256).digest()
+        if len(payload) < 48 or not hmac.compare_digest(payload[16:48], expected):
+            raise TuyaTransportError("Session key negotiation failed, check the local key")
+        remote_nonce = payload[:16]
+        await self._send(SESS_KEY_NEG_FINISH, hmac.new(self.local_key, remote_nonce, hashlib.sha256).digest())
+        self._key = session_key(self.version, self.local_key, local_nonce, remote_nonce)
+
+    def _encode(self, cmd, payload):
+        # The frame of a command, see the module docstring
+        seqno = self._seqno
+        self._seqno += 1
+        if self.version >= 3.4:
+            if cmd not in NO_VERSION_HEADER:
+                payload = self._version_header + payload
+            if self.version >= 3.5:
+                return pack_message_6699(seqno, cmd, payload, self._key)
+            return pack_message(seqno, cmd, encrypt_ecb(self._key, payload), hmac_key=self._key)
+        if self.version >= 3.2:
+            payload = encrypt_ecb(self._key, payload)
+            if cmd not in NO_VERSION_HEADER:
+                payload = self._version_header + payload
+        elif cmd == CONTROL:
+            payload = base64.b64encode(encrypt_ecb(self._key, payload))
+            digest = hashlib.md5(b"data=" + payload + b"||lpv=3.1||" + self._key).hexdigest()
+            payload = b"3.1" + digest[8:24].encode() + payload
+        return pack_message(seqno, cmd, payload)
+
+    def _decode(self, payload):
+        # The JSON of a payload of the device, None if it is empty
+        try:
+            if self.version == 3.4:
+                payload = decrypt_ecb(self._key, payload)
+            if self.version < 3.2:
+                if payload.startswith(b"3.1"):
+                    payload = decrypt_ecb(self._key, base64.b64decode(payload[19:]))
+            else:
+                if payload.startswith(self._version_header[:3]):
+                    payload = payload[len(self._version_header):]
+                if payload and self.version < 3.4:
+                    payload = decrypt_ecb(self._key, payload)
+            if not payload:
+                return None
+            if b"data unvalid" in payload:
+                raise _QueryRejected(f"The hub rejected the status query: {payload!r}")
+            data = json.loads(payload)
+        except (ValueError, binascii.Error) as e:
+            raise TuyaTransportError(f"Cannot decode the response: {payload!r}") from e
+        if isinstance(data, dict) and "dps" not in data and "dps" in data.get("data", {}):
+            # 3.4 and later
+            data["dps"] = data["data"]["dps"]
+        return data
+
+    async def _send(self, cmd, data):
+        if isinstance(data, dict):
+            data = json.dumps(data, separators=(",", ":")).encode()
+        self._writer.write(self._encode(cmd, data))
+        await self._writer.drain()
+
+    async def _receive(self):
+        reader = self._reader
+        prefix = await reader.readexactly(4)
+        # Skip anything before a frame
+        while prefix not in (b"\x00\x00\x55\xaa", b"\x00\x00\x66\x99"):
+            prefix = prefix[1:] + await reader.readexactly(1)
+        if prefix == b"\x00\x00\x55\xaa":
+            header = prefix + await reader.readexactly(HEADER_55AA.size - 4)
+            length = HEADER_55AA.unpack(header)[3]
+        else:
+            header = prefix + await reader.readexactly(HEADER_6699.size - 4)
+            length = HEADER_6699.unpack(header)[4] + 4
+        if length > MAX_FRAME_LENGTH:
+            raise TuyaTransportError(f"Frame of {length} bytes, the stream is out of sync")
+        data = header + await reader.readexactly(length)
+        return unpack_message(data, self._key if self.version >= 3.4 else None)
+
+    async def _response(self, cmds):
+        # The first frame of one of cmds with a payload; acks of commands have
+        # none, and reports the hub pushed after earlier commands are skipped
+        while True:
+            msg = await self._receive()
+            if msg.cmd not in cmds:
+                _LOGGER.debug("Skipping a frame of command %d from %s", msg.cmd, self.address)
+                continue
+            data = self._decode(msg.payload)
+            if data is not None:
+                return data
+
+    async def _status(self):
+        await self._connect()
+        try:
+            dps = await self._query()
+        except _QueryRejected:
+            if self._device22:
+                raise
+            # Like tinytuya, ask once more with the device22 query
+            _LOGGER.debug("Hub %s does not know the query, switching to device22", self.address)
+            self._device22 = True
+            dps = await self._query()
+        if not self.control_type:
+            if DP_SEND_IR in dps:
+                self.control_type = 1
+            elif DP_MODE in dps:
+                self.control_type = 2
+        return dps
+
+    async def _query(self):
+        t = int(time.time())
+        if self._device22:
+            await self._send(CONTROL_NEW, {"devId": self.dev_id, "uid": self.dev_id, "t": str(t), "dps": {"1": None}})
+            replies = (CONTROL_NEW, STATUS)
+        elif self.version >= 3.4:
+            await self._send(DP_QUERY_NEW, {})
+            replies = (DP_QUERY_NEW,)
+        else:
+            await self._send(DP_QUERY, {"gwId": self.dev_id, "devId": self.dev_id, "uid": self.dev_id, "t": str(t)})
+            replies = (DP_QUERY,)
+        data = await asyncio.wait_for(self._response(replies), self.timeout)
+        dps = data.get("dps") if isinstance(data, dict) else None
+        if dps is None:
+            raise TuyaTransportError(f"Unexpected response: {data}")
+        return dps
+
+    async def _set(self, dps):
+        # Set data points without waiting for the ack
+        await self._connect()
+        t = int(time.time())
+        if self.version >= 3.4:
+            await self._send(CONTROL_NEW, {"protocol": 5, "t": t, "data": {"dps": dps}})
+        else:
+            await self._send(CONTROL, {"devId": self.dev_id, "uid": self.dev_id, "t": str(t), "dps": dps})
+
+    async def _send_batch(self, commands, progress):
+        # progress[0] is the next command, so a retry on a new connection resumes there
+        while progress[0] < len(commands):
+            kind, code, delay = commands[progress[0]]
+            if kind == "rf":
+                await self._set(self._rf_command("rfstudy_send", code))
+            else:
+                await self._set(self._ir_command("send", code))
+            progress[0] += 1
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+    async def _study(self, timeout, rf):
+        if rf:
+            start, stop = self._rf_command("rf_study"), self._rf_command("rfstudy_exit")
+        else:
+            start, stop = self._ir_command("study"), self._ir_command("study_exit")
+        # Leave study mode in case the hub is still in it
+        await self._set(stop)
+        await self._set(start)
+        loop = asyncio.get_running_loop()
+        end = loop.time() + timeout
+        code = None
+        while code is None and loop.time() < end:
+            try:
+                # Learned codes are reported as status updates
+                data = await asyncio.wait_for(self._response((STATUS,)), end - loop.time())
+            except asyncio.TimeoutError:
+                break
+            dps = data.get("dps", {}) if isinstance(data, dict) else {}
+            code = dps.get(DP_LEARNED_ID, dps.get(DP_LEARNED_REPORT))
+        await self._set(stop)
+        return code
+
+    def _ir_command(self, mode, code=None):
+        # {dp: value} of an IR command, mode is "send", "study" or "study_exit"
+        if self.control_type == 1:
+            if mode == "send":
+                command = {"control": "send_ir", "type": 0, "head": "", "key1": "1" + code}
+            else:
+                command = {"control": mode}
+            return {DP_SEND_IR: json.dumps(command, separators=(",", ":"))}
+        if self.control_type == 2:
+            if mode == "send":
+                return {DP_MODE: "study_key", DP_CODE_TYPE: 0, DP_KEY_STUDY: code}
+            return {DP_MODE: mode}
+        raise TuyaTransportError("The control type is not detected yet")
+
+    @staticmethod
+    def _rf_command(mode, code=None):
+        # {dp: value} of an RF command, mode is "rfstudy_send", "rf_study" or "rfstudy_exit"
+        if mode == "rfstudy_send":
+            version = RF_VERSION
+            with contextlib.suppress(ValueError, TypeError, AttributeError):
+                # The code is base64 of JSON, with the version of the hub that learned it
+                version = json.loads(base64.b64decode(code)).get("ver", RF_VERSION)
+            command = {
+                "control": mode, "rf_type": RF_TYPE, "feq": 0, "mode": 0, "rate": 0, "ver": version,
+                "key1": {"code": code, "times": RF_TIMES, "delay": 0, "intervals": 0, "ver": version},
+            }
+        else:
+            command = {"control": mode, "rf_type": RF_TYPE, "study_feq": "0", "ver": RF_VERSION}
+        return {DP_SEND_IR: json.dumps(command, separators=(",", ":"))}
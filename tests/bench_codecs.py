@@ -0,0 +1,198 @@
+"""
+Micro-benchmarks for the IR codecs (rc_encoder, pulse, manchester).
+
+Run as:
+    python tests/bench_codecs.py [--quick] [--json report.json] [--compare baseline.json]
+
+No network and no Home Assistant are needed. Every benchmark runs on
+synthetic captures with realistic jitter (fixed seed, so runs are
+comparable). Measured:
+  - encode and decode of every protocol in RC_CONVERTERS
+  - rc_auto_decode() of every protocol, and its worst case (raw fallback)
+  - rc_auto_encode() command string parsing
+  - pulses -> Tuya base64 conversion
+
+Save a report with --json on a known good revision and check a change
+against it with --compare: benchmarks slower than the baseline by more
+than --threshold are reported and the exit code is 1.
+"""
+
+import argparse
+import importlib.util
+import json
+import platform
+import random
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+PKG_DIR = ROOT / "custom_components" / "localtuya_rc"
+
+# Load `pulse`, `manchester` and `tuya_codec` as top-level modules first so
+# `rc_encoder` can import them from its fallback path.
+for name in ("pulse", "manchester", "tuya_codec", "rc_encoder"):
+    spec = importlib.util.spec_from_file_location(name, PKG_DIR / f"{name}.py")
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    sys.modules[name] = mod
+rc_encoder = sys.modules["rc_encoder"]
+
+# One valid command for every protocol in RC_CONVERTERS.
+COMMANDS = {
+    "nec42": "addr=0x123,cmd=0x45",
+    "nec": "addr=0x12,cmd=0x34",
+    "nec42-ext": "addr=0x12345,cmd=0x4567",
+    "nec-ext": "addr=0x1234,cmd=0x5678",
+    "rc5": "addr=0x03,cmd=0x45,toggle=0",
+    "rc6": "addr=0x03,cmd=0x45,toggle=1",
+    "samsung32": "addr=0x07,cmd=0x09",
+    "sirc20": "addr=0x123,cmd=0x05",
+    "sirc15": "addr=0x83,cmd=0x05",
+    "sirc": "addr=0x03,cmd=0x05",
+    "kaseikyo": "vendor_id=0x2002,genre1=0x1,genre2=0x2,data=0x123,id=0x1",
+    "rca": "addr=0x03,cmd=0x45",
+    "pioneer": "addr=0x03,cmd=0x45",
+    "midea": "mode=cool,temp=22,fan=auto",
+    "ac": "addr=0x4C,cmd=0x1234,double=1",
+}
+
+# Relative jitter of learned captures (IR receivers stretch marks and
+# shorten spaces by up to ~10%)
+JITTER = 0.08
+# Distinct jittered captures per protocol
+CAPTURES = 50
+
+def jittered(values, rnd):
+    return [max(1, round(v * rnd.gauss(1, JITTER / 2))) for v in values]
+
+def parse_params(params):
+    return {k: rc_encoder._coerce(v) for k, v in (p.split("=") for p in params.split(","))}
+
+def build_benchmarks():
+    """
+    Return {name: (function, list of arguments)}; every call of the function
+    with one of the arguments is one operation.
+    """
+    rnd = random.Random(0)
+    benchmarks = {}
+    for name, (encoder, decoder) in rc_encoder.RC_CONVERTERS.items():
+        params = parse_params(COMMANDS[name])
+        clean = list(encoder(**params))
+        captures = [jittered(clean, rnd) for _ in range(CAPTURES)]
+        benchmarks[f"encode/{name}"] = (lambda p, encoder=encoder: encoder(**p), [params])
+        benchmarks[f"decode/{name}"] = (decoder, captures)
+        benchmarks[f"auto_decode/{name}"] = (rc_encoder.rc_auto_decode, captures)
+        benchmarks[f"auto_encode/{name}"] = (rc_encoder.rc_auto_encode, [f"{name}:{COMMANDS[name]}"])
+        benchmarks[f"to_tuya/{name}"] = (rc_encoder.pulses_to_tuya, captures)
+    # Worst cases of rc_auto_decode(): nothing matches and the capture is
+    # formatted as raw. Noise in the RC5 range keeps a Manchester decoder
+    # busy; a NEC header with broken data keeps the NEC family busy.
+    noise = []
+    while len(noise) < CAPTURES:
+        capture = [rnd.randint(rc_encoder.RC5_T // 2, rc_encoder.RC5_T * 5 // 2) for _ in range(200)]
+        if rc_encoder.rc_auto_decode(capture).startswith("raw:"):
+            noise.append(capture)
+    broken_nec = []
+    for capture in benchmarks["decode/nec42"][1]:
+        capture = list(capture)
+        capture[-2] = 3000  # last data gap
+        capture[20] = 3000  # a gap inside the 32-bit NEC frame
+        broken_nec.append(capture)
+    benchmarks["auto_decode/raw_noise"] = (rc_encoder.rc_auto_decode, noise)
+    benchmarks["auto_decode/raw_nec_header"] = (rc_encoder.rc_auto_decode, broken_nec)
+    benchmarks["auto_encode/raw"] = (rc_encoder.rc_auto_encode, ["raw:" + ",".join(map(str, noise[0][:-1]))])
+    return benchmarks
+
+def measure(function, args, min_time, rounds):
+    # Best operations per second over several rounds of at least min_time
+    # seconds each
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            for arg in args:
+                try:
+                    function(arg)
+                except ValueError:
+                    pass
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        loops *= 2
+    best = elapsed
+    for _ in range(rounds - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            for arg in args:
+                try:
+                    function(arg)
+                except ValueError:
+                    pass
+        best = min(best, time.perf_counter() - start)
+    return loops * len(args) / best
+
+def run(selected=None, min_time=0.2, rounds=3):
+    results = {}
+    for name, (function, args) in build_benchmarks().items():
+        if selected and not any(name.startswith(prefix) for prefix in selected):
+            continue
+        results[name] = measure(function, args, min_time, rounds)
+    return results
+
+def compare(results, baseline, threshold):
+    """
+    Compare operations per second against a baseline report.
+
+    Returns:
+        list of str: The benchmarks slower than baseline / threshold.
+    """
+    regressions = []
+    for name, ops in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:36} {ops:12.0f} ops/s  (new)")
+            continue
+        ratio = ops / base
+        flag = ""
+        if ratio * threshold < 1:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:36} {ops:12.0f} ops/s  {ratio:6.2f}x{flag}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="IR codec micro-benchmarks")
+    parser.add_argument("--quick", action="store_true", help="short smoke run, numbers are not meaningful")
+    parser.add_argument("--json", metavar="PATH", help="write the report to PATH")
+    parser.add_argument("--compare", metavar="PATH", help="compare against a report written with --json")
+    parser.add_argument("--threshold", type=float, default=1.2, help="allowed slowdown factor for --compare (default 1.2)")
+    parser.add_argument("benchmarks", nargs="*", help="only run benchmarks starting with these prefixes")
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        results = run(args.benchmarks, min_time=0, rounds=1)
+    else:
+        results = run(args.benchmarks)
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "unit": "ops/s",
+        "results": results,
+    }
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) slower than the baseline by more than {args.threshold}x")
+            return 1
+        return 0
+    for name, ops in results.items():
+        print(f"{name:36} {ops:12.0f} ops/s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,28 @@
+"""Smoke test for the codec benchmark script (tests/bench_codecs.py)."""
+
+import importlib.util
+import json
+from pathlib import Path
+
+
+spec = importlib.util.spec_from_file_location("bench_codecs", Path(__file__).resolve().parent / "bench_codecs.py")
+bench_codecs = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(bench_codecs)
+
+
+def test_every_protocol_has_a_benchmark_command():
+    assert set(bench_codecs.COMMANDS) == set(bench_codecs.rc_encoder.RC_CONVERTERS)
+
+
+def test_quick_run_writes_report_and_compares(tmp_path):
+    report = tmp_path / "report.json"
+    assert bench_codecs.main(["--quick", "--json", str(report), "decode/nec", "auto_decode/raw"]) == 0
+    results = json.loads(report.read_text())["results"]
+    assert set(results) == {"decode/nec", "decode/nec42", "decode/nec42-ext", "decode/nec-ext",
+                            "auto_decode/raw_noise", "auto_decode/raw_nec_header"}
+    assert all(ops > 0 for ops in results.values())
+
+    # A baseline ten times faster than anything we can do is a regression
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps({"results": {name: ops * 10 for name, ops in results.items()}}))
+    assert bench_codecs.main(["--quick", "--compare", str(baseline), "decode/nec"]) == 1
@@ -0,0 +1,92 @@
+"""Tests for the export of stored codes (code_export.py)."""
+
+import importlib.util
+import json
+import sys
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[1]
+PKG_DIR = ROOT / "custom_components" / "localtuya_rc"
+
+# code_export imports its codecs and `code_import` from the fallback path
+for name in ("pulse", "manchester", "tuya_codec", "rc_encoder", "rc_batch", "code_import", "code_export"):
+    spec = importlib.util.spec_from_file_location(name, PKG_DIR / f"{name}.py")
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    sys.modules[name] = mod
+rc_encoder = sys.modules["rc_encoder"]
+code_import = sys.modules["code_import"]
+code_export = sys.modules["code_export"]
+
+NEC_RAW = "raw:" + ",".join(map(str, rc_encoder.rc_auto_encode("nec:addr=0x04,cmd=0x08")))
+CODES = [
+    ("ac", "off", "rf:AAAA"),
+    ("tv", "input", "nec-ext:addr=0xBF04,cmd=0xE51A"),
+    ("tv", "mute", NEC_RAW),
+    ("tv", "power", "samsung32:addr=0x07,cmd=0x02"),
+]
+
+
+def test_json_export_is_imported_back(tmp_path):
+    path = str(tmp_path / "backup" / "codes.json")
+
+    assert code_export.write_codes(path, iter(CODES)) == (4, 0)
+
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f) == {
+            "ac": {"off": "rf:AAAA"},
+            "tv": {"input": CODES[1][2], "mute": NEC_RAW, "power": CODES[3][2]},
+        }
+    imported = list(code_import.read_codes(path))
+    # Like every import, raw codes a decoder matches are stored decoded
+    assert imported[2] == ("tv", "mute", "nec:addr=0x04,cmd=0x08", None)
+    assert imported[:2] + imported[3:] == [(device, command, code, None) for device, command, code in CODES[:2] + CODES[3:]]
+
+
+def test_decoded_forms_are_written_next_to_the_codes(tmp_path):
+    path = str(tmp_path / "codes.json")
+
+    code_export.write_codes(path, iter(CODES), decode=True)
+
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f)["tv"]["mute"] == {"code": NEC_RAW, "decoded": "nec:addr=0x04,cmd=0x08"}
+    imported = {(device, command): code for device, command, code, _ in code_import.read_codes(path)}
+    assert imported["tv", "mute"] == "nec:addr=0x04,cmd=0x08"
+
+
+def test_yaml_export(tmp_path):
+    path = str(tmp_path / "codes.yaml")
+
+    code_export.write_codes(path, iter(CODES), fmt="yaml", decode=True)
+
+    assert (tmp_path / "codes.yaml").read_text(encoding="utf-8") == (
+        '"ac":\n'
+        '  "off": "rf:AAAA"\n'
+        '"tv":\n'
+        '  "input": "nec-ext:addr=0xBF04,cmd=0xE51A"\n'
+        '  "mute":\n'
+        f'    code: "{NEC_RAW}"\n'
+        '    decoded: "nec:addr=0x04,cmd=0x08"\n'
+        '  "power": "samsung32:addr=0x07,cmd=0x02"\n'
+    )
+
+
+def test_flipper_export_is_a_directory_of_ir_files(tmp_path):
+    path = str(tmp_path / "flipper")
+
+    assert code_export.write_codes(path, iter(CODES), fmt="flipper") == (3, 1)
+
+    assert sorted(p.name for p in (tmp_path / "flipper").iterdir()) == ["ac.ir", "tv.ir"]
+    assert list(code_import.read_codes(path)) == [
+        ("tv", "input", "nec-ext:addr=0xBF04,cmd=0xE51A", None),
+        # Raw signals are decoded by the import
+        ("tv", "mute", "nec:addr=0x04,cmd=0x08", None),
+        ("tv", "power", "samsung32:addr=0x07,cmd=0x02", None),
+    ]
+    assert "type: raw" in (tmp_path / "flipper" / "tv.ir").read_text(encoding="utf-8")
+
+
+def test_flipper_rc5_commands_above_63_are_rc5x():
+    assert "protocol: RC5X\n" in code_export.flipper_signal("up", "rc5:addr=0x01,cmd=0x50")
+    assert "protocol: RC5\n" in code_export.flipper_signal("up", "rc5:addr=0x01,cmd=0x10")
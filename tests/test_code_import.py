@@ -0,0 +1,259 @@
+"""Tests for the bulk import of codes from other tools (code_import.py)."""
+
+import base64
+import importlib.util
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+
+ROOT = Path(__file__).resolve().parents[1]
+PKG_DIR = ROOT / "custom_components" / "localtuya_rc"
+
+# code_import imports `rc_batch` and `rc_encoder` (and rc_encoder its codecs)
+# from the fallback path
+for name in ("pulse", "manchester", "tuya_codec", "rc_encoder", "rc_batch", "code_import"):
+    spec = importlib.util.spec_from_file_location(name, PKG_DIR / f"{name}.py")
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    sys.modules[name] = mod
+rc_encoder = sys.modules["rc_encoder"]
+code_import = sys.modules["code_import"]
+
+
+FLIPPER_FILE = """Filetype: IR signals file
+Version: 1
+#
+name: Power
+type: parsed
+protocol: NEC
+address: 04 00 00 00
+command: 08 00 00 00
+#
+name: Vol_up
+type: parsed
+protocol: Samsung32
+address: 07 00 00 00
+command: 07 00 00 00
+#
+name: Input
+type: parsed
+protocol: NECext
+address: 04 BF 00 00
+command: 1A E5 00 00
+#
+name: Mode
+type: parsed
+protocol: Kaseikyo
+address: 41 54 32 00
+command: 1B 00 00 00
+"""
+
+
+def test_flipper_parsed_signals():
+    signals = list(code_import.read_flipper(FLIPPER_FILE.splitlines()))
+
+    assert signals == [
+        ("Power", "nec:addr=0x04,cmd=0x08", None),
+        ("Vol_up", "samsung32:addr=0x07,cmd=0x07", None),
+        ("Input", "nec-ext:addr=0xBF04,cmd=0xE51A", None),
+        ("Mode", None, "Unsupported protocol: Kaseikyo"),
+    ]
+
+
+def test_flipper_raw_signal_is_decoded_when_a_protocol_matches():
+    pulses = rc_encoder.rc_auto_encode("nec:addr=0x04,cmd=0x08")
+    lines = [
+        "name: Power",
+        "type: raw",
+        "frequency: 38000",
+        "duty_cycle: 0.330000",
+        "data: " + " ".join(map(str, pulses)),
+        "name: Unknown",
+        "type: raw",
+        "frequency: 38000",
+        "duty_cycle: 0.330000",
+        "data: 100 200 300",
+    ]
+
+    signals = list(code_import.read_flipper(lines))
+
+    assert signals == [
+        ("Power", "nec:addr=0x04,cmd=0x08", None),
+        ("Unknown", "raw:100,200,300", None),
+    ]
+
+
+def test_codes_of_a_directory_are_named_after_the_files(tmp_path):
+    (tmp_path / "tv.ir").write_text(FLIPPER_FILE, encoding="utf-8")
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "fan.ir").write_text("name: Off\ntype: parsed\nprotocol: RC5\naddress: 01 00 00 00\ncommand: 0C 00 00 00\n", encoding="utf-8")
+    (tmp_path / "notes.txt").write_text("not a signal", encoding="utf-8")
+
+    codes = list(code_import.read_codes(str(tmp_path)))
+
+    assert [(device, command) for device, command, _, _ in codes] == [
+        ("tv", "Power"), ("tv", "Vol_up"), ("tv", "Input"), ("tv", "Mode"), ("fan", "Off"),
+    ]
+    assert codes[-1][2] == "rc5:addr=0x01,cmd=0x0C"
+    assert all(device == "living_room" for device, _, _, _ in code_import.read_codes(str(tmp_path), "living_room"))
+
+
+def test_out_of_range_value_is_reported():
+    lines = ["name: Power", "type: parsed", "protocol: NEC", "address: 04 01 00 00", "command: 08 00 00 00"]
+
+    [(command, code, error)] = code_import.read_flipper(lines)
+
+    assert command == "Power" and code is None and error
+
+
+def test_unsupported_file_is_rejected(tmp_path):
+    path = tmp_path / "codes.csv"
+    path.write_text("", encoding="utf-8")
+
+    with pytest.raises(ValueError):
+        list(code_import.read_codes(str(path)))
+
+
+LIRC_FILE = """# Two remotes in one file
+begin remote
+  name  Samsung_TV
+  bits           16
+  flags SPACE_ENC|CONST_LENGTH
+  header       4500  4500
+  one           560  1690
+  zero          560   560
+  ptrail        560
+  pre_data_bits   16
+  pre_data       0xE0E0
+  gap          108000
+      begin codes
+          KEY_POWER                0x40BF   # power
+          KEY_MUTE                 0xF00F 0xF00F
+      end codes
+end remote
+
+begin remote
+  name  Philips_TV
+  bits           13
+  flags RC5|CONST_LENGTH
+  one           889   889
+  zero          889   889
+  plead         889
+  gap          113792
+  toggle_bit_mask 0x800
+      begin codes
+          KEY_POWER                0x100C
+      end codes
+end remote
+
+begin remote
+  name  Learned
+  flags RAW_CODES
+      begin raw_codes
+          name KEY_A
+             100 200 300 400
+             500
+          name KEY_B
+             9000 4500 560 oops
+      end raw_codes
+end remote
+
+begin remote
+  name  Media_Center
+  flags RC6|CONST_LENGTH
+  bits  8
+  one   444 444
+  zero  444 444
+      begin codes
+          KEY_OK 0x5C
+      end codes
+end remote
+"""
+
+
+def test_lirc_remotes():
+    codes = list(code_import.read_lirc(LIRC_FILE.splitlines()))
+
+    assert codes == [
+        ("Samsung_TV", "KEY_POWER", "samsung32:addr=0x07,cmd=0x02", None),
+        ("Samsung_TV", "KEY_MUTE", "samsung32:addr=0x07,cmd=0x0F", None),
+        ("Philips_TV", "KEY_POWER", "rc5:addr=0x00,cmd=0x0C", None),
+        ("Learned", "KEY_A", "raw:100,200,300,400,500", None),
+        ("Learned", "KEY_B", None, "Invalid raw code durations"),
+        ("Media_Center", "KEY_OK", None, "Unsupported encoding: RC6"),
+    ]
+
+
+def test_lirc_space_encoding_matches_the_encoder():
+    remote = {
+        "flags": frozenset({"SPACE_ENC"}),
+        "bits": 32,
+        "header": (9000, 4500),
+        "one": (560, 1690),
+        "zero": (560, 560),
+        "ptrail": 560,
+    }
+
+    pulses = code_import.lirc_pulses(remote, 0x20DF10EF)
+
+    assert pulses == list(rc_encoder.rc_auto_encode("nec:addr=0x04,cmd=0x08"))
+
+
+def test_lirc_reverse_flag_sends_the_least_significant_bit_first():
+    remote = {"flags": frozenset({"REVERSE"}), "bits": 4, "one": (1, 3), "zero": (1, 1), "ptrail": 1}
+
+    assert code_import.lirc_pulses(remote, 0b0001) == [1, 3, 1, 1, 1, 1, 1, 1, 1]
+
+
+def test_lirc_file_is_read_as_it_streams():
+    lines = iter(LIRC_FILE.splitlines())
+
+    first = next(code_import.read_lirc(lines))
+
+    assert first[1] == "KEY_POWER"
+    # The rest of the file was not read yet
+    assert next(lines).strip() == "KEY_MUTE                 0xF00F 0xF00F"
+
+
+def test_lirc_devices_are_named_after_the_remotes(tmp_path):
+    (tmp_path / "lircd.conf").write_text(LIRC_FILE, encoding="utf-8")
+    (tmp_path / "tv.ir").write_text(FLIPPER_FILE, encoding="utf-8")
+
+    devices = {device for device, _, _, _ in code_import.read_codes(str(tmp_path))}
+
+    assert devices == {"Samsung_TV", "Philips_TV", "Learned", "Media_Center", "tv"}
+
+
+def test_broadlink_storage_codes_are_decoded(tmp_path):
+    def packet(pulses):
+        # One tick is 269/8192 us; 0x00 prefixes the two byte form
+        body = b"".join(
+            bytes([ticks]) if ticks < 256 else b"\0" + ticks.to_bytes(2, "big")
+            for ticks in (round(v / rc_encoder.BROADLINK_TICK) for v in list(pulses) + [100000])
+        )
+        return base64.b64encode(bytes([0x26, 0]) + len(body).to_bytes(2, "little") + body).decode()
+
+    nec = packet(rc_encoder.rc_auto_encode("nec:addr=0x04,cmd=0x08"))
+    unknown = packet([1000, 2000, 3000])
+    (tmp_path / "broadlink_remote_34ea34aabbcc_codes").write_text(json.dumps({
+        "version": 1,
+        "key": "broadlink_remote_34ea34aabbcc_codes",
+        "data": {
+            "tv": {"power": nec, "light": [f"b64:{unknown}", nec]},
+            "fan": {"speed": "JgAEAA==", "off": 5},
+        },
+    }), encoding="utf-8")
+
+    codes = list(code_import.read_codes(str(tmp_path)))
+
+    assert codes[:2] == [
+        ("tv", "power", "nec:addr=0x04,cmd=0x08", None),
+        ("tv", "light", f"broadlink:{unknown}", None),
+    ]
+    assert [(device, command, code) for device, command, code, _ in codes[2:]] == [
+        ("fan", "speed", None),
+        ("fan", "off", None),
+    ]
@@ -0,0 +1,149 @@
+"""Tests for the memory-mapped code libraries (code_library.py)."""
+
+import asyncio
+import importlib.util
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+
+ROOT = Path(__file__).resolve().parents[1]
+PKG_DIR = ROOT / "custom_components" / "localtuya_rc"
+
+# code_library imports `const` from its fallback path
+for name in ("const", "code_library"):
+    spec = importlib.util.spec_from_file_location(name, PKG_DIR / f"{name}.py")
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    sys.modules[name] = mod
+code_library = sys.modules["code_library"]
+
+
+def sample_entries(count, seed=0):
+    rnd = random.Random(seed)
+    entries = {}
+    while len(entries) < count:
+        key = (f"brand{rnd.randint(0, 50)}", f"model{rnd.randint(0, 20)}", f"button{rnd.randint(0, 99)}")
+        entries[key] = f"nec:addr=0x{rnd.randint(0, 255):02X},cmd=0x{rnd.randint(0, 255):02X}"
+    return entries
+
+
+def test_lookup_finds_every_code(tmp_path):
+    entries = sample_entries(2000)
+    path = str(tmp_path / "codes")
+    assert code_library.write_library(path, ((*key, code) for key, code in entries.items())) == len(entries)
+
+    library = code_library.CodeLibrary(path)
+
+    assert len(library) == len(entries)
+    for (brand, device, command), code in entries.items():
+        assert library.lookup(brand, device, command) == code
+    assert library.lookup("brand1", "model1", "missing") is None
+    assert library.lookup("", "", "") is None
+    assert library.lookup("￿", "", "") is None
+    library.close()
+
+
+def test_later_entries_replace_earlier_ones(tmp_path):
+    path = str(tmp_path / "codes")
+    code_library.write_library(path, [
+        ("Samsung", "TV", "power", "samsung32:addr=0x07,cmd=0x02"),
+        ("Samsung", "TV", "power", "samsung32:addr=0x07,cmd=0xE6"),
+    ])
+
+    library = code_library.CodeLibrary(path)
+
+    assert len(library) == 1
+    assert library.lookup("Samsung", "TV", "power") == "samsung32:addr=0x07,cmd=0xE6"
+
+
+def test_empty_library(tmp_path):
+    path = str(tmp_path / "empty")
+    code_library.write_library(path, [])
+
+    library = code_library.CodeLibrary(path)
+
+    assert len(library) == 0
+    assert library.lookup("Samsung", "TV", "power") is None
+
+
+def test_invalid_index_is_rejected(tmp_path):
+    (tmp_path / "broken.index").write_bytes(b"not a library")
+
+    with pytest.raises(ValueError):
+        code_library.CodeLibrary(str(tmp_path / "broken"))
+
+
+def test_libraries_of_a_directory_resolve_brand_and_device(tmp_path):
+    code_library.write_library(str(tmp_path / "a"), [("LG", "TV", "power", "nec:addr=0x04,cmd=0x08")])
+    code_library.write_library(str(tmp_path / "b"), [
+        ("LG", "TV", "power", "nec:addr=0x04,cmd=0x09"),
+        ("LG", "Sound/Bar", "mute", "nec:addr=0x2C,cmd=0x1E"),
+    ])
+
+    libraries = code_library.CodeLibraries(str(tmp_path))
+
+    assert libraries.lookup_device("LG/TV", "power") == "nec:addr=0x04,cmd=0x08"
+    assert libraries.lookup_device("LG/Sound/Bar", "mute") == "nec:addr=0x2C,cmd=0x1E"
+    assert libraries.lookup_device("TV", "power") is None
+    assert code_library.CodeLibraries(str(tmp_path / "missing")).libraries == []
+
+
+def test_libraries_that_cannot_be_opened_are_skipped(tmp_path):
+    code_library.write_library(str(tmp_path / "a"), [("LG", "TV", "power", "nec:addr=0x04,cmd=0x08")])
+    (tmp_path / "b.index").write_bytes(b"not a library")
+    code_library.write_library(str(tmp_path / "c"), [("LG", "TV", "mute", "nec:addr=0x04,cmd=0x09")])
+    (tmp_path / "c.data").unlink()
+
+    libraries = code_library.CodeLibraries(str(tmp_path))
+
+    assert [Path(library.path).name for library in libraries.libraries] == ["a"]
+    assert libraries.lookup_device("LG/TV", "power") == "nec:addr=0x04,cmd=0x08"
+    libraries.close()
+    assert libraries.libraries == []
+
+
+class _FakeHass:
+    def __init__(self, directory):
+        self.data = {}
+        self.config = type("Config", (), {"path": lambda _self, name: str(directory / name)})()
+
+    async def async_add_executor_job(self, func, *args):
+        return func(*args)
+
+
+def test_failed_open_is_not_cached(tmp_path, monkeypatch):
+    hass = _FakeHass(tmp_path)
+    calls = []
+    open_libraries = code_library.CodeLibraries
+
+    def _open(directory):
+        calls.append(directory)
+        if len(calls) == 1:
+            raise OSError("busy")
+        return open_libraries(directory)
+
+    monkeypatch.setattr(code_library, "CodeLibraries", _open)
+
+    async def run():
+        with pytest.raises(OSError):
+            await code_library.async_get_code_libraries(hass)
+        libraries = await code_library.async_get_code_libraries(hass)
+        assert await code_library.async_get_code_libraries(hass) is libraries
+        await code_library.async_close_code_libraries(hass)
+
+    asyncio.run(run())
+
+    assert len(calls) == 2
+    assert code_library.DATA_CODE_LIBRARIES not in hass.data
+
+
+def test_build_from_tsv(tmp_path, capsys):
+    tsv = tmp_path / "codes.tsv"
+    tsv.write_text("# brand\tdevice\tcommand\tcode\nSony\tTV\tpower\tsirc:addr=0x01,cmd=0x15\n", encoding="utf-8")
+
+    assert code_library.main(["build", str(tmp_path / "sony"), str(tsv)]) == 0
+
+    assert code_library.CodeLibrary(str(tmp_path / "sony")).lookup("Sony", "TV", "power") == "sirc:addr=0x01,cmd=0x15"
@@ -0,0 +1,289 @@
+"""Tests for the per-hub in-memory code store (code_store.py).
+
+Stubs homeassistant.helpers.storage with an in-memory Store (no HA test
+harness here) and drives async entry points with asyncio.run().
+"""
+
+import asyncio
+import importlib.util
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+
+ROOT = Path(__file__).resolve().parents[1]
+PKG_DIR = ROOT / "custom_components" / "localtuya_rc"
+PACKAGE_NAME = "localtuya_rc_code_store_test"
+
+LEGACY_KEY = "localtuya_rc_codes"
+INDEX_KEY = "localtuya_rc_codes_index"
+
+
+class _FakeStore:
+    """In-memory stand-in for homeassistant.helpers.storage.Store."""
+
+    files = {}
+    versions = {}
+    reads = []
+
+    def __init__(self, hass, version, key):
+        self.version = version
+        self.key = key
+        self.delayed = []
+        self.data_func = None
+
+    async def async_load(self):
+        self.reads.append(self.key)
+        # Give concurrent callers a chance to run
+        await asyncio.sleep(0)
+        data = self.files.get(self.key)
+        version = self.versions.get(self.key, self.version)
+        if data is not None and version != self.version:
+            data = await self._async_migrate_func(version, 1, data)
+        return data
+
+    async def async_save(self, data):
+        self.files[self.key] = data
+        self.versions[self.key] = self.version
+
+    async def async_remove(self):
+        self.files.pop(self.key, None)
+
+    def async_delay_save(self, data_func, delay=0):
+        self.delayed.append(delay)
+        self.data_func = data_func
+
+    def write(self):
+        # What the Store does once the delay has passed
+        self.files[self.key] = self.data_func()
+        self.versions[self.key] = self.version
+
+
+class _FakeHass:
+    def __init__(self, dev_ids=()):
+        self.data = {}
+        entries = [types.SimpleNamespace(data={"device_id": dev_id}) for dev_id in dev_ids]
+        self.config_entries = types.SimpleNamespace(async_entries=lambda _domain: entries)
+
+
+def _install_module(monkeypatch, name, **attributes):
+    module = types.ModuleType(name)
+    module.__dict__.update(attributes)
+    monkeypatch.setitem(sys.modules, name, module)
+    return module
+
+
+@pytest.fixture
+def code_store(monkeypatch):
+    homeassistant = _install_module(monkeypatch, "homeassistant")
+    homeassistant.__path__ = []
+    helpers = _install_module(monkeypatch, "homeassistant.helpers")
+    helpers.__path__ = []
+    _install_module(monkeypatch, "homeassistant.const", CONF_DEVICE_ID="device_id")
+    monkeypatch.setattr(_FakeStore, "files", {})
+    monkeypatch.setattr(_FakeStore, "versions", {})
+    monkeypatch.setattr(_FakeStore, "reads", [])
+    _install_module(monkeypatch, "homeassistant.helpers.storage", Store=_FakeStore)
+
+    package = _install_module(monkeypatch, PACKAGE_NAME)
+    package.__path__ = []
+    _install_module(
+        monkeypatch,
+        f"{PACKAGE_NAME}.const",
+        DOMAIN="localtuya_rc",
+        CODE_STORAGE_VERSION=2,
+        CODE_STORAGE_CODES=LEGACY_KEY,
+        CODE_STORAGE_INDEX=INDEX_KEY,
+        CODE_INDEX_STORAGE_VERSION=1,
+    )
+
+    # The codecs are pure Python, use the real ones
+    for name in ("pulse", "manchester", "tuya_codec", "rc_encoder", "code_store"):
+        spec = importlib.util.spec_from_file_location(
+            f"{PACKAGE_NAME}.{name}", PKG_DIR / f"{name}.py"
+        )
+        module = importlib.util.module_from_spec(spec)
+        monkeypatch.setitem(sys.modules, spec.name, module)
+        spec.loader.exec_module(module)
+    return module
+
+
+def test_code_store_is_shared_per_hub(code_store):
+    hass = _FakeHass()
+
+    assert code_store.async_get_code_store(hass, "hub-1") is code_store.async_get_code_store(hass, "hub-1")
+    assert code_store.async_get_code_store(hass, "hub-1") is not code_store.async_get_code_store(hass, "hub-2")
+
+
+def test_codes_are_read_from_disk_once(code_store):
+    _FakeStore.files[code_store.code_storage_key("hub-1")] = {"tv": {"power": {"code": "nec:addr=0x01,cmd=0x02"}}}
+    store = code_store.async_get_code_store(_FakeHass(), "hub-1")
+
+    async def _load_concurrently():
+        return await asyncio.gather(*(store.async_load() for _ in range(5)))
+
+    results = asyncio.run(_load_concurrently())
+    asyncio.run(store.async_load())
+
+    assert _FakeStore.reads.count(code_store.code_storage_key("hub-1")) == 1
+    assert store.loads == 1
+    assert all(codes is results[0] for codes in results)
+    assert store.codes == {"tv": {"power": {"code": "nec:addr=0x01,cmd=0x02"}}}
+
+
+def test_burst_of_changes_is_saved_once(code_store):
+    store = code_store.async_get_code_store(_FakeHass(), "hub-1")
+    asyncio.run(store.async_load())
+
+    for n in range(10):
+        store.async_set_code("tv", f"button_{n}", f"nec:addr=0x01,cmd=0x{n:02X}")
+    assert store.async_delete_code("tv", "button_0")
+    assert not store.async_delete_code("tv", "missing")
+    assert store.saves == 0
+    store._store.write()
+
+    assert store.changes == 11
+    assert store.saves == 1
+    assert store._store.delayed == [code_store.SAVE_DELAY] * 11
+    assert sorted(_FakeStore.files[code_store.code_storage_key("hub-1")]["tv"]) == [f"button_{n}" for n in range(1, 10)]
+
+
+def test_device_is_removed_with_its_last_command(code_store):
+    store = code_store.async_get_code_store(_FakeHass(), "hub-1")
+    asyncio.run(store.async_load())
+    store.async_set_code("tv", "power", "nec:addr=0x01,cmd=0x02")
+
+    assert store.async_delete_code("tv", "power")
+
+    assert store.codes == {}
+
+
+def test_hubs_keep_their_codes_apart(code_store):
+    hass = _FakeHass()
+    hub_1 = code_store.async_get_code_store(hass, "hub-1")
+    hub_2 = code_store.async_get_code_store(hass, "hub-2")
+    asyncio.run(hub_1.async_load())
+    asyncio.run(hub_2.async_load())
+
+    hub_1.async_set_code("tv", "power", "nec:addr=0x01,cmd=0x02")
+    hub_2.async_set_code("ac", "off", "nec:addr=0x03,cmd=0x04")
+
+    assert hub_1.code("tv", "power") == "nec:addr=0x01,cmd=0x02"
+    assert hub_1.code("ac", "off") is None
+    assert hub_2.code("ac", "off") == "nec:addr=0x03,cmd=0x04"
+    index = code_store.async_get_code_index(hass)
+    assert index.hubs("tv") == ["hub-1"]
+    assert index.hubs("ac") == ["hub-2"]
+
+
+def test_shared_codes_are_migrated_once_per_hub(code_store):
+    _FakeStore.files[LEGACY_KEY] = {"tv": {"power": "nec:addr=0x01,cmd=0x02"}}
+    _FakeStore.versions[LEGACY_KEY] = 1
+    legacy = {"tv": {"power": code_store.code_record("nec:addr=0x01,cmd=0x02")}}
+    hass = _FakeHass(["hub-1", "hub-2"])
+
+    hub_1 = code_store.async_get_code_store(hass, "hub-1")
+    asyncio.run(hub_1.async_load())
+    # hub-2 is not migrated yet, the shared file stays
+    assert LEGACY_KEY in _FakeStore.files
+    hub_2 = code_store.async_get_code_store(hass, "hub-2")
+    asyncio.run(hub_2.async_load())
+
+    assert hub_1.codes == legacy and hub_2.codes == legacy
+    assert hub_1.codes is not hub_2.codes
+    assert _FakeStore.files[code_store.code_storage_key("hub-1")] == legacy
+    assert _FakeStore.files[code_store.code_storage_key("hub-2")] == legacy
+    assert _FakeStore.reads.count(LEGACY_KEY) == 1
+    assert LEGACY_KEY not in _FakeStore.files
+    assert _FakeStore.files[code_store.CODE_STORAGE_LEGACY_BACKUP] == legacy
+    index = code_store.async_get_code_index(hass)
+    assert index.is_migrated("hub-1") and index.is_migrated("hub-2")
+    assert index.hubs("tv") == ["hub-1", "hub-2"]
+
+
+def test_shared_codes_are_kept_until_yaml_hubs_are_migrated(code_store):
+    _FakeStore.files[LEGACY_KEY] = {"tv": {"power": {"code": "nec:addr=0x01,cmd=0x02"}}}
+    hass = _FakeHass(["hub-1"])
+    code_store.async_register_hub(hass, "hub-1")
+    code_store.async_register_hub(hass, "hub-yaml")
+
+    asyncio.run(code_store.async_get_code_store(hass, "hub-1").async_load())
+    assert LEGACY_KEY in _FakeStore.files
+    asyncio.run(code_store.async_get_code_store(hass, "hub-yaml").async_load())
+
+    assert LEGACY_KEY not in _FakeStore.files
+    assert code_store.CODE_STORAGE_LEGACY_BACKUP in _FakeStore.files
+
+
+def test_migrated_hub_does_not_migrate_again(code_store):
+    _FakeStore.files[LEGACY_KEY] = {"tv": {"power": "nec:addr=0x01,cmd=0x02"}}
+    _FakeStore.files[INDEX_KEY] = {"hubs": {}, "migrated": ["hub-1"]}
+    store = code_store.async_get_code_store(_FakeHass(["hub-1", "hub-2"]), "hub-1")
+
+    asyncio.run(store.async_load())
+
+    assert store.codes == {}
+    assert LEGACY_KEY not in _FakeStore.reads
+
+
+def test_summary_is_cached_until_the_codes_change(code_store):
+    store = code_store.async_get_code_store(_FakeHass(), "hub-1")
+    asyncio.run(store.async_load())
+    store.async_set_code("tv", "power", "nec:addr=0x01,cmd=0x02")
+    store.async_set_code("tv", "mute", "nec:addr=0x01,cmd=0x03")
+    store.async_set_code("ac", "off", "nec:addr=0x03,cmd=0x04")
+
+    summary = store.summary
+
+    assert summary == {"learned_devices": ["ac", "tv"], "learned_commands_count": 3}
+    assert store.summary is summary
+    store.async_delete_code("ac", "off")
+    assert store.summary == {"learned_devices": ["tv"], "learned_commands_count": 2}
+
+
+def test_version_1_codes_are_migrated_to_records(code_store):
+    key = code_store.code_storage_key("hub-1")
+    _FakeStore.files[key] = {"tv": {"power": "nec:addr=0x01,cmd=0x02", "light": "rf:AAAA"}}
+    _FakeStore.versions[key] = 1
+    store = code_store.async_get_code_store(_FakeHass(), "hub-1")
+
+    asyncio.run(store.async_load())
+    store._store.write()
+
+    assert _FakeStore.versions[key] == 2
+    assert _FakeStore.files[key]["tv"]["light"] == {"code": "rf:AAAA"}
+    assert store.code("tv", "power") == "nec:addr=0x01,cmd=0x02"
+    assert store.codes["tv"]["power"]["payload"] == \
+        code_store.compile_command("nec:addr=0x01,cmd=0x02").payload()
+
+
+def test_raw_code_record_holds_the_payload_only(code_store):
+    code = "raw:" + ",".join(str(1000 + n * 20) for n in range(199))
+
+    record = code_store.code_record(code)
+
+    assert record == {"payload": code_store.compile_command(code).payload()}
+    assert code_store.record_code(record) == code
+    assert len(record["payload"]) < len(code) * 3 // 5
+
+
+@pytest.mark.parametrize("code", [
+    "rc5:addr=0x03,cmd=0x45",
+    "nec:addr=0x1FF,cmd=0x02",
+    "rf:AAAA",
+])
+def test_codes_without_a_fixed_payload_keep_the_command_string(code_store, code):
+    assert code_store.code_record(code) == {"code": code}
+
+
+def test_imported_codes_are_saved_once(code_store):
+    store = code_store.async_get_code_store(_FakeHass(), "hub-1")
+    asyncio.run(store.async_load())
+
+    store.async_set_records({"tv": {"Power": code_store.code_record("nec:addr=0x04,cmd=0x08")}})
+
+    assert store.code("tv", "Power") == "nec:addr=0x04,cmd=0x08"
+    assert store._store.delayed == [code_store.SAVE_DELAY]
+    assert store.summary["learned_commands_count"] == 1
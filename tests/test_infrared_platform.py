@@ -15,6 +15,7 @@ import pytest
 
 ROOT = Path(__file__).resolve().parents[1]
 INFRARED_PATH = ROOT / "custom_components" / "localtuya_rc" / "infrared.py"
+TUYA_CODEC_PATH = ROOT / "custom_components" / "localtuya_rc" / "tuya_codec.py"
 PACKAGE_NAME = "localtuya_rc_infrared_test"
 
 
@@ -141,6 +142,14 @@ def infrared_module(monkeypatch):
     package.__path__ = []
     _install_module(monkeypatch, f"{PACKAGE_NAME}.const", DOMAIN="localtuya_rc")
 
+    # tuya_codec is pure Python, use the real one
+    codec_spec = importlib.util.spec_from_file_location(
+        f"{PACKAGE_NAME}.tuya_codec", TUYA_CODEC_PATH
+    )
+    codec = importlib.util.module_from_spec(codec_spec)
+    monkeypatch.setitem(sys.modules, codec_spec.name, codec)
+    codec_spec.loader.exec_module(codec)
+
     spec = importlib.util.spec_from_file_location(
         f"{PACKAGE_NAME}.infrared", INFRARED_PATH
     )
@@ -53,11 +53,20 @@ def _load_init_module(monkeypatch, *, has_infrared_platform):
     package = _install_module(monkeypatch, PACKAGE_NAME)
     package.__path__ = []
     _install_module(monkeypatch, f"{PACKAGE_NAME}.const", DOMAIN="localtuya_rc")
+    closed = []
+
+    async def async_close_code_libraries(hass):
+        closed.append(hass)
+
+    _install_module(
+        monkeypatch, f"{PACKAGE_NAME}.code_library", async_close_code_libraries=async_close_code_libraries
+    )
 
     spec = importlib.util.spec_from_file_location(f"{PACKAGE_NAME}.__init__", INIT_PATH)
     module = importlib.util.module_from_spec(spec)
     monkeypatch.setitem(sys.modules, spec.name, module)
     spec.loader.exec_module(module)
+    module.closed_libraries = closed
     return module
 
 
@@ -198,3 +207,15 @@ def test_unload_entry_retains_hass_data_when_unload_fails(monkeypatch):
 
     assert result is False
     assert "entry-1" in hass.data[module.DOMAIN]
+
+
+def test_unload_of_the_last_entry_closes_the_code_libraries(monkeypatch):
+    module = _load_init_module(monkeypatch, has_infrared_platform=False)
+    hass = _FakeHass(unload_result=True)
+    hass.data[module.DOMAIN] = {"entry-1": {}, "entry-2": {}}
+
+    asyncio.run(module.async_unload_entry(hass, _FakeEntry("entry-1")))
+    assert module.closed_libraries == []
+
+    asyncio.run(module.async_unload_entry(hass, _FakeEntry("entry-2")))
+    assert module.closed_libraries == [hass]
@@ -10,9 +10,9 @@ import pytest
 ROOT = Path(__file__).resolve().parents[1]
 PKG_DIR = ROOT / "custom_components" / "localtuya_rc"
 
-# Load `pulse` and `manchester` as top-level modules first so `rc_encoder`
-# can `import pulse` / `import manchester` from its fallback path.
-for name in ("pulse", "manchester"):
+# Load `pulse`, `manchester` and `tuya_codec` as top-level modules first so
+# `rc_encoder` can import them from its fallback path.
+for name in ("pulse", "manchester", "tuya_codec"):
     spec = importlib.util.spec_from_file_location(name, PKG_DIR / f"{name}.py")
     mod = importlib.util.module_from_spec(spec)
     spec.loader.exec_module(mod)
@@ -0,0 +1,101 @@
+"""Tests for batch decoding (rc_batch)."""
+
+import importlib.util
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+
+ROOT = Path(__file__).resolve().parents[1]
+PKG_DIR = ROOT / "custom_components" / "localtuya_rc"
+
+# rc_batch imports `pulse` and `rc_encoder` from its fallback path, so load
+# them (and `manchester` and `tuya_codec` for rc_encoder) as top-level
+# modules first.
+for name in ("pulse", "manchester", "tuya_codec", "rc_encoder", "rc_batch"):
+    spec = importlib.util.spec_from_file_location(name, PKG_DIR / f"{name}.py")
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    sys.modules[name] = mod
+rc_encoder = sys.modules["rc_encoder"]
+rc_batch = sys.modules["rc_batch"]
+
+
+COMMANDS = [
+    "nec:addr=0x12,cmd=0x34",
+    "nec-ext:addr=0x1234,cmd=0x5678",
+    "nec42:addr=0x123,cmd=0x45",
+    "samsung32:addr=0x07,cmd=0x09",
+    "kaseikyo:vendor_id=0x2002,genre1=0x1,genre2=0x2,data=0x123,id=0x1",
+    "rca:addr=0x03,cmd=0x45",
+    "pioneer:addr=0x03,cmd=0x45",
+    "rc5:addr=0x03,cmd=0x45,toggle=0",
+    "rc6:addr=0x03,cmd=0x45,toggle=1",
+    "sirc:addr=0x03,cmd=0x05",
+    "midea:mode=cool,temp=22,fan=auto",
+    "ac:addr=0x4C,cmd=0x1234,double=1",
+]
+
+
+def sample_captures(seed, count):
+    rnd = random.Random(seed)
+    captures = []
+    for _ in range(count):
+        if rnd.random() < 0.2:
+            captures.append([rnd.randint(100, 10000) for _ in range(rnd.randint(0, 250))])
+            continue
+        clean = rc_encoder.rc_auto_encode(rnd.choice(COMMANDS))
+        jitter = rnd.uniform(0, 0.4)
+        values = [max(1, int(v * rnd.uniform(1 - jitter, 1 + jitter))) for v in clean]
+        if rnd.random() < 0.3:
+            values = values[:rnd.randint(0, len(values))]
+        captures.append(values)
+    return captures
+
+
+def test_batch_decode_without_numpy_matches_rc_auto_decode(monkeypatch):
+    monkeypatch.setattr(rc_batch, "np", None)
+    captures = sample_captures(0, 200)
+    assert rc_batch.rc_auto_decode_batch(captures) == [rc_encoder.rc_auto_decode(c) for c in captures]
+
+
+@pytest.mark.parametrize("batch_size", [1, 7, rc_batch.BATCH_SIZE])
+def test_batch_decode_with_numpy_matches_rc_auto_decode(batch_size):
+    pytest.importorskip("numpy")
+    captures = sample_captures(batch_size, 1000)
+    assert rc_batch.rc_auto_decode_batch(captures, batch_size) == [rc_encoder.rc_auto_decode(c) for c in captures]
+
+
+def test_batch_decode_fills_the_bit_cache():
+    pytest.importorskip("numpy")
+    capture = rc_encoder.pulse.Capture(rc_encoder.rc_auto_encode("ac:addr=0x4C,cmd=0x1234,double=1"))
+    rc_batch._classify([capture], rc_batch._timing_families())
+    key = (100, rc_encoder.AC_PULSE, rc_encoder.AC_GAP_0, rc_encoder.AC_GAP_1, rc_encoder.pulse.MAX_ERROR_PERCENT)
+    bits, error = capture.bit_cache[key]
+    assert len(bits) == 48 and error is None
+
+
+def test_batch_decode_of_nothing():
+    assert rc_batch.rc_auto_decode_batch([]) == []
+
+
+def test_canonical_commands_rewrites_the_codes_a_decoder_matches():
+    nec = ",".join(map(str, rc_encoder.rc_auto_encode("nec:addr=0x04,cmd=0x08")))
+    pronto = rc_encoder.rc_auto_decode(rc_encoder.rc_auto_encode("samsung32:addr=0x07,cmd=0x02"), force_pronto=True)
+    commands = [
+        f"raw:{nec}",
+        "raw:100,200,300",
+        pronto,
+        "rc5:addr=0x03,cmd=0x45",
+        "raw:broken",
+    ]
+
+    assert rc_batch.canonical_commands(commands, batch_size=2) == [
+        "nec:addr=0x04,cmd=0x08",
+        "raw:100,200,300",
+        "samsung32:addr=0x07,cmd=0x02",
+        "rc5:addr=0x03,cmd=0x45",
+        "raw:broken",
+    ]
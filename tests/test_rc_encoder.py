@@ -0,0 +1,454 @@
+"""Tests for the generic rc_encoder machinery (dispatch, caching, codecs)."""
+
+import base64
+import importlib.util
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+
+ROOT = Path(__file__).resolve().parents[1]
+PKG_DIR = ROOT / "custom_components" / "localtuya_rc"
+
+# Load `pulse`, `manchester` and `tuya_codec` as top-level modules first so
+# `rc_encoder` can import them from its fallback path.
+for name in ("pulse", "manchester", "tuya_codec"):
+    spec = importlib.util.spec_from_file_location(name, PKG_DIR / f"{name}.py")
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    sys.modules[name] = mod
+manchester = sys.modules["manchester"]
+pulse = sys.modules["pulse"]
+
+spec = importlib.util.spec_from_file_location("rc_encoder", PKG_DIR / "rc_encoder.py")
+rc_encoder = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(rc_encoder)
+
+
+# One valid parameter set for every protocol in RC_CONVERTERS.
+SAMPLE_PARAMS = {
+    "nec42": dict(addr=0x123, cmd=0x45),
+    "nec": dict(addr=0x12, cmd=0x34),
+    "nec42-ext": dict(addr=0x12345, cmd=0x4567),
+    "nec-ext": dict(addr=0x1234, cmd=0x5678),
+    "rc5": dict(addr=0x03, cmd=0x45, toggle=0),
+    "rc6": dict(addr=0x03, cmd=0x45, toggle=1),
+    "samsung32": dict(addr=0x07, cmd=0x09),
+    "sirc20": dict(addr=0x123, cmd=0x05),
+    "sirc15": dict(addr=0x83, cmd=0x05),
+    "sirc": dict(addr=0x03, cmd=0x05),
+    "kaseikyo": dict(vendor_id=0x2002, genre1=0x1, genre2=0x2, data=0x123, id=0x1),
+    "rca": dict(addr=0x03, cmd=0x45),
+    "pioneer": dict(addr=0x03, cmd=0x45),
+    "midea": dict(a=0xBF, b=0x70),
+    "ac": dict(addr=0x4C, cmd=0x1234, double=1),
+}
+
+
+def encode_sample(name):
+    encoder, _ = rc_encoder.RC_CONVERTERS[name]
+    return list(encoder(**SAMPLE_PARAMS[name]))
+
+
+def exhaustive_decode(values):
+    """The pre-dispatch rc_auto_decode(): try every decoder in order."""
+    for name, (_, decoder) in rc_encoder.RC_CONVERTERS.items():
+        try:
+            return f"{name}:{decoder(values)}"
+        except ValueError:
+            pass
+    return rc_encoder.rc_auto_decode(values, force_raw=True)
+
+
+def outcome(decode, values):
+    try:
+        return decode(values)
+    except Exception as e:
+        return type(e)
+
+
+def test_sample_params_cover_every_converter():
+    assert set(SAMPLE_PARAMS) == set(rc_encoder.RC_CONVERTERS)
+
+
+def test_every_converter_has_a_dispatch_header():
+    assert set(rc_encoder.RC_DECODER_HEADERS) == set(rc_encoder.RC_CONVERTERS)
+
+
+def test_candidates_keep_priority_order_for_nec_capture():
+    names = [name for name, _ in rc_encoder.decoder_candidates(encode_sample("nec"))]
+    assert names == ["nec", "nec-ext", "pioneer"]
+
+
+def test_candidates_for_long_nec_header_capture_keep_nec42_first():
+    names = [name for name, _ in rc_encoder.decoder_candidates(encode_sample("nec42"))]
+    assert names == ["nec42", "nec", "nec42-ext", "nec-ext", "pioneer"]
+
+
+def test_candidates_skip_unrelated_protocols():
+    names = [name for name, _ in rc_encoder.decoder_candidates(encode_sample("sirc"))]
+    assert names == ["rc6", "sirc20", "sirc15", "sirc"]
+
+
+def test_too_short_capture_has_no_candidates_and_falls_back_to_raw():
+    assert rc_encoder.decoder_candidates([9000]) == ()
+    assert rc_encoder.rc_auto_decode([9000]) == "raw:9000"
+
+
+@pytest.mark.parametrize("name", sorted(SAMPLE_PARAMS))
+def test_auto_decode_matches_exhaustive_search(name):
+    rnd = random.Random(name)
+    clean = encode_sample(name)
+    assert outcome(rc_encoder.rc_auto_decode, clean) == outcome(exhaustive_decode, clean)
+    for _ in range(50):
+        jitter = rnd.uniform(0.05, 0.4)
+        values = [max(1, int(v * rnd.uniform(1 - jitter, 1 + jitter))) for v in clean]
+        if rnd.random() < 0.3:
+            values = values[:rnd.randint(2, len(values))]
+        assert outcome(rc_encoder.rc_auto_decode, values) == outcome(exhaustive_decode, values)
+
+
+def test_auto_decode_matches_exhaustive_search_on_noise():
+    rnd = random.Random(0)
+    for _ in range(200):
+        values = [rnd.randint(100, 10000) for _ in range(rnd.randint(2, 250))]
+        assert outcome(rc_encoder.rc_auto_decode, values) == outcome(exhaustive_decode, values)
+
+
+# --- compile_command ---
+
+
+def test_compile_command_is_cached_per_command_string():
+    first = rc_encoder.compile_command("nec:addr=0x12,cmd=0x34")
+    assert rc_encoder.compile_command("nec:addr=0x12,cmd=0x34") is first
+    assert rc_encoder.compile_command("nec:addr=0x12,cmd=0x35") is not first
+
+
+def test_compiled_payload_matches_rc_auto_encode():
+    command = "midea:mode=cool,temp=22,fan=auto"
+    pulses, payload = rc_encoder.compile_command(command).variant()
+    assert list(pulses) == rc_encoder.rc_auto_encode(command)
+    assert payload == rc_encoder.pulses_to_tuya(rc_encoder.rc_auto_encode(command))
+
+
+def test_compiled_raw_and_tuya_commands():
+    raw = rc_encoder.compile_command("raw:9000,4500,560")
+    assert raw.variant() == ((9000, 4500, 560), rc_encoder.pulses_to_tuya([9000, 4500, 560]))
+    tuya = rc_encoder.compile_command("tuya:KCMyEQ==")
+    assert tuya.variant() == (None, "KCMyEQ==")
+
+
+def test_pulses_to_tuya_is_little_endian_uint16_base64():
+    assert rc_encoder.pulses_to_tuya([9000, 4500]) == "KCOUEQ=="
+
+
+@pytest.mark.parametrize("fmt", ["rc5", "rc6"])
+def test_compiled_toggle_command_flips_toggle_on_every_send(fmt):
+    compiled = rc_encoder.compile_command(f"{fmt}:addr=0x03,cmd=0x05")
+    assert compiled.toggles
+    sent = [compiled.variant()[0] for _ in range(4)]
+    assert sent[0] != sent[1]
+    assert sent[0] == sent[2] and sent[1] == sent[3]
+    expected = {tuple(rc_encoder.rc_auto_encode(f"{fmt}:addr=0x03,cmd=0x05,toggle={t}")) for t in (0, 1)}
+    assert set(sent) == expected
+
+
+def test_compiled_toggle_command_with_explicit_toggle_has_one_variant():
+    compiled = rc_encoder.compile_command("rc5:addr=0x03,cmd=0x05,toggle=1")
+    assert not compiled.toggles
+    assert compiled.variant() == compiled.variant()
+
+
+def test_compiled_command_is_immutable():
+    compiled = rc_encoder.compile_command("nec:addr=0x12,cmd=0x34")
+    with pytest.raises(AttributeError):
+        compiled.command = "nec:addr=0x00,cmd=0x00"
+
+
+def test_compile_command_rejects_invalid_commands():
+    with pytest.raises(ValueError, match="Unknown format"):
+        rc_encoder.compile_command("foo:addr=1")
+    with pytest.raises(ValueError, match="Invalid command format"):
+        rc_encoder.compile_command("nec:addr")
+
+
+# --- manchester ---
+
+
+@pytest.mark.parametrize("double_bits", [[], [4], [1, 5]])
+@pytest.mark.parametrize("phase", [False, True])
+def test_manchester_round_trip(double_bits, phase):
+    rnd = random.Random(f"{double_bits}{phase}")
+    start = [True] * 6 + [False] * 2
+    for _ in range(50):
+        values = [rnd.randint(0, 255) for _ in range(3)]
+        encoded = manchester.encode(values, 444, 21, start, phase, double_bits)
+        decoded = manchester.decode(encoded, 444, 21, start, phase, double_bits)
+        assert decoded[:2] == values[:2]
+        assert decoded[2] == values[2] & 0xF8
+
+
+def test_manchester_encode_merges_equal_half_bits():
+    # Start bit + bits 1,0 (MSB first, phase=False): T | T T | 2T T
+    assert manchester.encode([0b10000000], 888, 2, [True], False) == [888, 888, 1776]
+
+
+def test_manchester_decode_handles_long_captures():
+    values = rc_encoder.rc5_encode(0x03, 0x05, toggle=0) + [888] * 20000
+    assert rc_encoder.rc5_decode(values) == "addr=0x03,cmd=0x05"
+
+
+def test_manchester_truncated_double_bit_raises_value_error():
+    # RC6 leader followed by too few half-bits to reach the double (toggle) bit
+    with pytest.raises(ValueError):
+        rc_encoder.rc6_decode([2664, 888, 444, 444])
+    assert rc_encoder.rc_auto_decode([2664, 888, 444, 444, 444]) == "raw:2664,888,444,444,444"
+
+
+# --- shared bit extraction ---
+
+
+def test_capture_shares_extracted_bits_between_nec_family_decoders():
+    capture = pulse.Capture(encode_sample("nec"))
+    assert rc_encoder.nec_decode(capture) == "addr=0x12,cmd=0x34"
+    assert len(capture.bit_cache) == 1
+    (bits, error), = capture.bit_cache.values()
+    assert len(bits) == 32 and error is None
+    rc_encoder.nec_ext_decode(capture)
+    assert [entry[0] for entry in capture.bit_cache.values()] == [bits]
+
+
+def test_capture_decodes_like_a_list():
+    values = encode_sample("nec42")
+    for name, (_, decoder) in rc_encoder.RC_CONVERTERS.items():
+        assert outcome(decoder, pulse.Capture(values)) == outcome(decoder, values), name
+
+
+def test_distance_decode_at_offset_matches_slice():
+    values = encode_sample("nec")
+    padded = [1234, 5678, 91] + values
+    args = (9000, 4500, 560, 560, 1690, 32)
+    assert pulse.distance_decode(padded, *args, offset=3) == pulse.distance_decode(values, *args)
+    with pytest.raises(ValueError, match="Invalid leading pulse length"):
+        pulse.distance_decode(padded, *args, offset=2)
+
+
+# --- IncrementalDecoder ---
+
+
+def feed_in_chunks(values, size):
+    decoder = rc_encoder.IncrementalDecoder()
+    for i in range(0, len(values), size):
+        if decoder.feed(values[i:i + size]) is not None:
+            return decoder, i + size
+    return decoder, len(values)
+
+
+def test_incremental_decoder_reports_nec_after_the_first_frame():
+    frame = encode_sample("nec")
+    values = frame + [40000] + [9000, 2250, 560, 96000] * 20
+    decoder, consumed = feed_in_chunks(values, 1)
+    assert decoder.result == "nec:addr=0x12,cmd=0x34"
+    # One more duration (the long gap) rules out NEC42
+    assert consumed == len(frame) + 1
+    assert decoder.finish() == rc_encoder.rc_auto_decode(values)
+
+
+def test_incremental_decoder_reports_ac_before_the_whole_buffer():
+    frame = encode_sample("ac")
+    values = frame + [40000] + frame * 3
+    decoder, consumed = feed_in_chunks(values, 10)
+    assert decoder.result == rc_encoder.rc_auto_decode(values)
+    assert consumed <= 210
+
+
+def test_incremental_decoder_drops_candidates_on_bad_bit_timing():
+    decoder = rc_encoder.IncrementalDecoder()
+    assert decoder.feed([9000, 4500, 560, 560]) is None
+    assert "nec" in decoder.candidates
+    decoder.feed([560, 3000])
+    assert decoder.candidates == []
+    assert decoder.finish() == "raw:9000,4500,560,560,560"
+
+
+def test_incremental_decoder_waits_for_open_ended_protocols():
+    values = encode_sample("sirc")
+    decoder, _ = feed_in_chunks(values, 4)
+    assert decoder.result is None
+    assert decoder.finish() == rc_encoder.rc_auto_decode(values)
+
+
+@pytest.mark.parametrize("name", sorted(SAMPLE_PARAMS))
+def test_incremental_decoder_matches_rc_auto_decode(name):
+    rnd = random.Random(f"incremental-{name}")
+    clean = encode_sample(name)
+    for _ in range(30):
+        jitter = rnd.uniform(0, 0.4)
+        values = [max(1, int(v * rnd.uniform(1 - jitter, 1 + jitter))) for v in clean]
+        if rnd.random() < 0.3:
+            values = values[:rnd.randint(0, len(values))]
+        if rnd.random() < 0.5:
+            values += [rnd.randint(100, 40000)] + clean * rnd.randint(0, 2)
+        decoder, _ = feed_in_chunks(values, rnd.randint(1, 10))
+        assert outcome(lambda _: decoder.finish(), None) == outcome(rc_encoder.rc_auto_decode, values)
+
+
+# --- pulse encoders ---
+
+
+def _bitwise_distance_encode(values, lp, lg, p, g0, g1, bit_length, msb_first):
+    out = [lp, lg]
+    for n in range(bit_length):
+        byte, bit = divmod(n, 8)
+        mask = 1 << (7 - bit) if msb_first else 1 << bit
+        out += [p, g1 if values[byte] & mask else g0]
+    return out + [p]
+
+
+@pytest.mark.parametrize("msb_first", [False, True])
+@pytest.mark.parametrize("bit_length", [8, 12, 33, 42, 48])
+def test_distance_encode_matches_bitwise_reference(msb_first, bit_length):
+    rnd = random.Random(bit_length)
+    values = [rnd.randint(0, 255) for _ in range(6)]
+    assert pulse.distance_encode(values, 9000, 4500, 560, 560, 1690, bit_length, msb_first) == \
+        _bitwise_distance_encode(values, 9000, 4500, 560, 560, 1690, bit_length, msb_first)
+
+
+def test_width_encode_partial_byte():
+    # 3 bits of 0b101 LSB first: 1, 0, 1 (pulse width carries the bit)
+    assert pulse.width_encode([0b101], 2400, 600, 600, 600, 1200, 3) == [2400, 600, 1200, 600, 600, 600, 1200, 600]
+
+
+def test_distance_encode_encodes_all_bits_without_bit_length():
+    assert len(pulse.distance_encode([0x00, 0xFF], 9000, 4500, 560, 560, 1690)) == 2 + 16 * 2 + 1
+
+
+@pytest.mark.parametrize("name", sorted(SAMPLE_PARAMS))
+def test_encoders_return_pulses(name):
+    encoder, _ = rc_encoder.RC_CONVERTERS[name]
+    pulses = encoder(**SAMPLE_PARAMS[name])
+    assert isinstance(pulses, pulse.Pulses)
+    assert rc_encoder.pulses_to_tuya(pulses) == rc_encoder.pulses_to_tuya(pulses.tolist())
+
+
+def test_pulses_behave_like_a_list_of_durations():
+    pulses = pulse.Pulses([9000, 4500, 560])
+    assert pulses == [9000, 4500, 560] and pulses == (9000, 4500, 560)
+    assert pulses != [9000, 4500]
+    for value in (pulses[1:], pulses + [560], [1] + pulses, pulses * 2):
+        assert isinstance(value, pulse.Pulses)
+    assert pulses[1:] == [4500, 560]
+    assert pulses * 2 == [9000, 4500, 560] * 2
+    with pytest.raises(OverflowError):
+        pulses.append(0x10000)
+
+
+def test_sirc_repeats_are_joined_by_the_inter_frame_gap():
+    frame = rc_encoder.sirc_encode(addr=0x03, cmd=0x05, rep=1)
+    pulses = rc_encoder.sirc_encode(addr=0x03, cmd=0x05, rep=3)
+    inter_gap = rc_encoder.SIRC_FRAME_PERIOD - sum(frame[:-1])
+    assert pulses == (frame[:-1] + [inter_gap]) * 2 + frame[:-1]
+
+
+# NEC addr=0x04,cmd=0x08 as a repeat-only Pronto code (as published online)
+PRONTO_NEC = (
+    "pronto:0000 006D 0000 0022 0156 00AB "
+    + "0015 0015 0015 0015 0015 0040 0015 0015 0015 0015 0015 0015 0015 0015 0015 0015 "
+    + "0015 0040 0015 0040 0015 0015 0015 0040 0015 0040 0015 0040 0015 0040 0015 0040 "
+    + "0015 0015 0015 0015 0015 0015 0015 0040 0015 0015 0015 0015 0015 0015 0015 0015 "
+    + "0015 0040 0015 0040 0015 0040 0015 0015 0015 0040 0015 0040 0015 0040 0015 0040 "
+    + "0015 05F1"
+)
+
+
+def test_pronto_code_is_converted_to_microseconds():
+    pulses = rc_encoder.rc_auto_encode(PRONTO_NEC)
+    assert len(pulses) == 67
+    assert pulses[:3] == [round(0x156 * 0x6D * rc_encoder.PRONTO_CLOCK), round(0xAB * 0x6D * rc_encoder.PRONTO_CLOCK), 552]
+    assert rc_encoder.rc_auto_decode(pulses) == "nec:addr=0x04,cmd=0x08"
+    assert rc_encoder.compile_command(PRONTO_NEC).variant() == (tuple(pulses), rc_encoder.pulses_to_tuya(pulses))
+
+
+def test_pronto_once_sequence_is_sent_without_the_repeat_sequence():
+    pulses = rc_encoder.rc_auto_encode("pronto:0000 006D 0001 0001 0010 0020 0030 0040")
+    assert pulses == [round(0x10 * 0x6D * rc_encoder.PRONTO_CLOCK)]
+
+
+def test_decoded_pronto_round_trips():
+    pulses = rc_encoder.rc_auto_encode("nec:addr=0x04,cmd=0x08")
+    pronto = rc_encoder.rc_auto_decode(pulses, force_pronto=True)
+    assert pronto.replace("0022 0000", "0000 0022", 1) == PRONTO_NEC
+    assert rc_encoder.rc_auto_decode(rc_encoder.rc_auto_encode(pronto)) == "nec:addr=0x04,cmd=0x08"
+
+
+@pytest.mark.parametrize("code", [
+    "pronto:0000 006D 0001",
+    "pronto:5000 0073 0000 0001 0001 0001",
+    "pronto:0000 006D 0002 0000 0010 0020",
+    "pronto:0000 006D 0000 0000",
+    "pronto:0000 006D 0000 0001 0010 zz",
+])
+def test_invalid_pronto_codes_are_rejected(code):
+    with pytest.raises(ValueError):
+        rc_encoder.compile_command(code)
+
+
+def broadlink_code(pulses, gap=100000):
+    # A Broadlink IR packet of the durations, padded like the hubs do
+    body = bytearray()
+    for value in list(pulses) + [gap]:
+        ticks = round(value / rc_encoder.BROADLINK_TICK)
+        body += bytes([ticks]) if 0 < ticks < 256 else b"\0" + ticks.to_bytes(2, "big")
+    packet = bytes([0x26, 0]) + len(body).to_bytes(2, "little") + body
+    return "broadlink:" + base64.b64encode(packet + b"\0" * (-len(packet) % 16)).decode()
+
+
+def test_broadlink_code_is_converted_to_microseconds():
+    pulses = rc_encoder.rc_auto_encode("nec:addr=0x04,cmd=0x08")
+    code = broadlink_code(pulses)
+
+    converted = rc_encoder.rc_auto_encode(code)
+
+    assert len(converted) == len(pulses)
+    # 9000 us does not fit one byte of ticks, it uses the extended form
+    assert abs(converted[0] - 9000) <= rc_encoder.BROADLINK_TICK
+    assert rc_encoder.rc_auto_decode(converted) == "nec:addr=0x04,cmd=0x08"
+    assert rc_encoder.compile_command(code).variant() == (tuple(converted), rc_encoder.pulses_to_tuya(converted))
+
+
+@pytest.mark.parametrize("code", [
+    "broadlink:sgAEAAoKCgo=",  # RF packet
+    "broadlink:JgAQAAoKCgo=",  # length past the end
+    "broadlink:not base64!",
+])
+def test_invalid_broadlink_codes_are_rejected(code):
+    with pytest.raises(ValueError):
+        rc_encoder.compile_command(code)
+
+
+# --- hold_trains ---
+
+
+def test_held_nec_button_sends_repeat_codes():
+    pulses = rc_encoder.rc_auto_encode("nec:addr=0x04,cmd=0x08")
+
+    trains, gaps = rc_encoder.hold_trains("nec", pulses, 1)
+
+    assert trains[0] == list(pulses)
+    assert trains[1:] == [[9000, 2250, 560]] * 12
+    # The first repeat code starts one period after the frame
+    assert sum(pulses) + gaps[0] == rc_encoder.NEC_PERIOD
+    assert set(gaps[1:]) == {rc_encoder.tuya_codec.MAX_DURATION}
+
+
+def test_held_button_of_other_protocols_repeats_the_frame():
+    pulses = rc_encoder.rc_auto_encode("samsung32:addr=0x07,cmd=0x02")
+
+    trains, gaps = rc_encoder.hold_trains("samsung32", pulses, 1)
+
+    assert trains == [list(pulses)] * 10
+    assert gaps == [0] * 10
+    # Held for one frame at least
+    assert len(rc_encoder.hold_trains("samsung32", pulses, 0.01)[0]) == 1
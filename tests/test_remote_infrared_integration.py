@@ -16,6 +16,7 @@ import pytest
 
 ROOT = Path(__file__).resolve().parents[1]
 REMOTE_PATH = ROOT / "custom_components" / "localtuya_rc" / "remote.py"
+PKG_DIR = ROOT / "custom_components" / "localtuya_rc"
 PACKAGE_NAME = "localtuya_rc_remote_infrared_test"
 
 
@@ -70,6 +71,7 @@ def remote_module(monkeypatch):
         CONF_HOST="host",
         CONF_DEVICE_ID="device_id",
     )
+    _install_module(monkeypatch, "homeassistant.helpers.entity_platform")
     _install_module(monkeypatch, "homeassistant.helpers.entity", DeviceInfo=dict)
 
     class HomeAssistantError(Exception):
@@ -125,17 +127,55 @@ def remote_module(monkeypatch):
         CONF_CONTROL_TYPE="control_type",
         CONF_CLOUD_INFO="cloud_info",
         CONF_PERSISTENT_CONNECTION="persistent_connection",
-        CODE_STORAGE_VERSION=1,
+        CODE_STORAGE_VERSION=2,
+        CODE_INDEX_STORAGE_VERSION=1,
         CODE_STORAGE_CODES="localtuya_rc_codes",
+        CODE_STORAGE_INDEX="localtuya_rc_codes_index",
         NOTIFICATION_TITLE="Tuya IR Remote Control",
+        SERVICE_IMPORT_CODES="import_codes",
+        SERVICE_EXPORT_CODES="export_codes",
+        ATTR_PATH="path",
+        ATTR_FORMAT="format",
+        ATTR_DECODE="decode",
         DEFAULT_PERSISTENT_CONNECTION=False,
+        CONF_TRANSPORT="transport",
+        DEFAULT_TRANSPORT="tinytuya",
+        TRANSPORT_ASYNCIO="asyncio",
+        TRANSPORTS=["tinytuya", "asyncio"],
+        CONF_SEND_QUEUE_OVERFLOW="send_queue_overflow",
+        DEFAULT_SEND_QUEUE_OVERFLOW="reject",
+        CONF_MERGE_COMMANDS="merge_commands",
+        DEFAULT_MERGE_COMMANDS=False,
     )
     _install_module(
         monkeypatch,
         f"{PACKAGE_NAME}.rc_encoder",
-        rc_auto_encode=lambda value: value,
         rc_auto_decode=lambda value, **_kwargs: value,
+        compile_command=lambda value: value,
+        hold_trains=lambda _fmt, pulses, _hold_secs: ([list(pulses)], [0]),
     )
+    _install_module(monkeypatch, f"{PACKAGE_NAME}.rc_batch", canonical_commands=list)
+
+    class TuyaTransportError(Exception):
+        pass
+
+    _install_module(
+        monkeypatch,
+        f"{PACKAGE_NAME}.tuya_transport",
+        TuyaTransport=object,
+        TuyaTransportError=TuyaTransportError,
+        TuyaConnectionError=type("TuyaConnectionError", (TuyaTransportError,), {}),
+        TuyaBatchError=type("TuyaBatchError", (TuyaTransportError,), {}),
+    )
+
+    # These modules only need the stubs above, use the real ones
+    for name in ("tuya_codec", "code_import", "code_export", "code_store", "code_library", "send_queue"):
+        module_spec = importlib.util.spec_from_file_location(
+            f"{PACKAGE_NAME}.{name}", PKG_DIR / f"{name}.py"
+        )
+        module = importlib.util.module_from_spec(module_spec)
+        monkeypatch.setitem(sys.modules, module_spec.name, module)
+        module_spec.loader.exec_module(module)
 
     spec = importlib.util.spec_from_file_location(
         f"{PACKAGE_NAME}.remote", REMOTE_PATH
@@ -208,6 +248,191 @@ def test_async_send_ir_pulses_does_not_double_wrap_home_assistant_error(remote_m
     assert exc_info.value is original
 
 
+# --- async_send_command batching ---
+
+
+class _FakeDevice:
+    def __init__(self, fail_on=None):
+        self.sent = []
+        self.persistent = []
+        self.fail_on = fail_on
+
+    def set_socketPersistent(self, persist):
+        self.persistent.append(persist)
+
+    def send_button(self, payload):
+        if payload == self.fail_on:
+            raise RuntimeError("no reply")
+        self.sent.append(payload)
+
+    def close(self):
+        pass
+
+
+def _make_batch_remote(remote_module, monkeypatch, device):
+    remote = _make_remote(remote_module)
+    remote._device = device
+    jobs = []
+
+    async def _executor_job(func, *args):
+        jobs.append(func)
+        return func(*args)
+
+    async def _no_storage():
+        remote._codes = {}
+
+    remote.hass.async_add_executor_job = _executor_job
+    remote._async_load_storage_files = _no_storage
+    monkeypatch.setattr(
+        remote_module,
+        "compile_command",
+        lambda code: types.SimpleNamespace(toggles=False, format="nec", payload=lambda: code.upper()),
+    )
+    return remote, jobs
+
+
+def test_send_command_sends_every_repeat_in_one_executor_job(remote_module, monkeypatch):
+    device = _FakeDevice()
+    remote, jobs = _make_batch_remote(remote_module, monkeypatch, device)
+
+    asyncio.run(remote.async_send_command(["vol_up", "mute"], num_repeats=3))
+
+    assert device.sent == ["VOL_UP", "MUTE"] * 3
+    assert len(jobs) == 1
+    # Kept open for the batch, then back to the configured persistence
+    assert device.persistent[0] is True and device.persistent[-1] is False
+
+
+def test_send_command_flips_the_toggle_bit_on_every_repeat(remote_module, monkeypatch):
+    device = _FakeDevice()
+    remote, _ = _make_batch_remote(remote_module, monkeypatch, device)
+    variants = iter(["RC5_T0", "RC5_T1", "RC5_T0"])
+    compiled = types.SimpleNamespace(toggles=True, format="rc5", payload=lambda: next(variants))
+    monkeypatch.setattr(remote_module, "compile_command", lambda code: compiled)
+
+    asyncio.run(remote.async_send_command(["rc5:addr=0x00,cmd=0x10"], num_repeats=3))
+
+    assert device.sent == ["RC5_T0", "RC5_T1", "RC5_T0"]
+
+
+def test_send_command_merges_the_codes_into_one_transmission(remote_module, monkeypatch):
+    device = _FakeDevice()
+    remote, _ = _make_batch_remote(remote_module, monkeypatch, device)
+    remote._merge_commands = True
+    codec = sys.modules[f"{PACKAGE_NAME}.tuya_codec"]
+    codes = {"1": codec.pulses_to_base64([9000, 4500, 560]), "2": codec.pulses_to_base64([9000, 4500, 560, 560])}
+    monkeypatch.setattr(
+        remote_module,
+        "compile_command",
+        lambda code: types.SimpleNamespace(toggles=False, format="nec", payload=lambda: codes[code]),
+    )
+
+    asyncio.run(remote.async_send_command(["1", "2", "1"], delay_secs=0.03, num_repeats=2))
+
+    sent, = device.sent
+    pulses = codec.base64_to_pulses(sent)
+    assert pulses[:8] == [9000, 4500, 560, 30000, 9000, 4500, 560, 30560]
+    assert len(pulses) == 6 * 3 + 5
+
+    # Too long for one code: split, the merged part waits until it is on air
+    codes["long"] = codec.pulses_to_base64([560] * 199)
+    device.sent.clear()
+    sleeps = []
+    monkeypatch.setattr(remote_module.time, "sleep", sleeps.append)
+
+    asyncio.run(remote.async_send_command(["long"], delay_secs=0.03, num_repeats=3))
+
+    assert [len(codec.base64_to_pulses(code)) for code in device.sent] == [199 * 2 + 1, 199]
+    assert sleeps == pytest.approx([(199 * 560 + 30000) / 1000000 + 0.03])
+
+
+def test_send_command_names_the_hub_a_missing_device_was_learned_with(remote_module, monkeypatch):
+    remote, _ = _make_batch_remote(remote_module, monkeypatch, _FakeDevice())
+    code_store = sys.modules[f"{PACKAGE_NAME}.code_store"]
+    remote.hass.data[code_store.DATA_CODE_INDEX] = types.SimpleNamespace(hubs=lambda device: ["hub-2"])
+
+    async def _no_library_code(_device, _command):
+        return None
+
+    remote._async_library_code = _no_library_code
+
+    with pytest.raises(remote_module.HomeAssistantError, match="learned with the hub\\(s\\) hub-2"):
+        asyncio.run(remote.async_send_command(["power"], device="tv"))
+
+
+def test_send_command_streams_a_held_button(remote_module, monkeypatch):
+    device = _FakeDevice()
+    remote, jobs = _make_batch_remote(remote_module, monkeypatch, device)
+    codec = sys.modules[f"{PACKAGE_NAME}.tuya_codec"]
+    monkeypatch.setattr(
+        remote_module,
+        "compile_command",
+        lambda code: types.SimpleNamespace(toggles=False, format="nec", payload=lambda: codec.pulses_to_base64([9000, 4500, 560])),
+    )
+    holds = []
+
+    def _hold_trains(fmt, pulses, hold_secs):
+        holds.append((fmt, hold_secs))
+        # Two codes' worth of repeat codes
+        return [pulses] + [[9000, 2250, 560]] * 200, [40000] + [65535] * 200
+
+    monkeypatch.setattr(remote_module, "hold_trains", _hold_trains)
+
+    asyncio.run(remote.async_send_command(["vol_up"], hold_secs=2))
+
+    assert holds == [("nec", 2)]
+    assert len(device.sent) == 2 and len(jobs) == 1
+    pulses = [p for code in device.sent for p in codec.base64_to_pulses(code)]
+    assert pulses[:7] == [9000, 4500, 560, 40000, 9000, 2250, 560]
+    # Split once, where the code would get too long
+    assert len(pulses) == 3 * 201 + 199
+
+
+def test_held_button_codes_wait_for_the_air_time_of_the_code_before(remote_module, monkeypatch):
+    codec = sys.modules[f"{PACKAGE_NAME}.tuya_codec"]
+    frame = [2400, 600, 1200, 600, 600]
+    monkeypatch.setattr(
+        remote_module, "hold_trains", lambda _fmt, pulses, _hold_secs: ([pulses] * 300, [0] * 300)
+    )
+
+    steps = remote_module.TuyaRC._hold_steps("vol_up", "sirc", codec.pulses_to_base64(frame), 5, 0.5)
+
+    assert len(steps) > 2
+    for _, _, payload, delay in steps[:-1]:
+        assert delay == sum(codec.base64_to_pulses(payload)) / 1000000
+    last_payload, last_delay = steps[-1][2], steps[-1][3]
+    # delay_secs only after the last code
+    assert last_delay == pytest.approx(sum(codec.base64_to_pulses(last_payload)) / 1000000 + 0.5)
+
+
+def test_send_command_failure_names_the_failed_command(remote_module, monkeypatch):
+    device = _FakeDevice(fail_on="MUTE")
+    remote, _ = _make_batch_remote(remote_module, monkeypatch, device)
+
+    with pytest.raises(remote_module.HomeAssistantError, match="'mute'"):
+        asyncio.run(remote.async_send_command(["vol_up", "mute", "vol_down"]))
+
+    assert device.sent == ["VOL_UP"]
+
+
+# --- import_codes ---
+
+
+def test_read_records_collects_records_and_errors(remote_module, monkeypatch):
+    signals = [
+        ("tv", "Power", "nec:addr=0x04,cmd=0x08", None),
+        ("tv", "Mode", None, "Unsupported protocol: Kaseikyo"),
+    ]
+    monkeypatch.setattr(remote_module, "read_codes", lambda path, device=None: iter(signals))
+    monkeypatch.setattr(remote_module, "code_record", lambda code: {"code": code})
+
+    records, count, errors = remote_module._read_records("/config/tv.ir")
+
+    assert records == {"tv": {"Power": {"code": "nec:addr=0x04,cmd=0x08"}}}
+    assert count == 1
+    assert errors == ["tv/Mode: Unsupported protocol: Kaseikyo"]
+
+
 # --- async_added_to_hass publishing for infrared.py ---
 
 
@@ -1,5 +1,6 @@
 """Regression tests for unavailable IR bridge recovery."""
 
+import asyncio
 import importlib.util
 import json
 import sys
@@ -11,6 +12,7 @@ import pytest
 
 ROOT = Path(__file__).resolve().parents[1]
 REMOTE_PATH = ROOT / "custom_components" / "localtuya_rc" / "remote.py"
+PKG_DIR = ROOT / "custom_components" / "localtuya_rc"
 MANIFEST_PATH = ROOT / "custom_components" / "localtuya_rc" / "manifest.json"
 PACKAGE_NAME = "localtuya_rc_test"
 
@@ -58,6 +60,7 @@ def remote_module(monkeypatch):
         CONF_HOST="host",
         CONF_DEVICE_ID="device_id",
     )
+    _install_module(monkeypatch, "homeassistant.helpers.entity_platform")
     _install_module(monkeypatch, "homeassistant.helpers.entity", DeviceInfo=dict)
 
     class HomeAssistantError(Exception):
@@ -113,17 +116,55 @@ def remote_module(monkeypatch):
         CONF_CONTROL_TYPE="control_type",
         CONF_CLOUD_INFO="cloud_info",
         CONF_PERSISTENT_CONNECTION="persistent_connection",
-        CODE_STORAGE_VERSION=1,
+        CODE_STORAGE_VERSION=2,
+        CODE_INDEX_STORAGE_VERSION=1,
         CODE_STORAGE_CODES="localtuya_rc_codes",
+        CODE_STORAGE_INDEX="localtuya_rc_codes_index",
         NOTIFICATION_TITLE="Tuya IR Remote Control",
+        SERVICE_IMPORT_CODES="import_codes",
+        SERVICE_EXPORT_CODES="export_codes",
+        ATTR_PATH="path",
+        ATTR_FORMAT="format",
+        ATTR_DECODE="decode",
         DEFAULT_PERSISTENT_CONNECTION=False,
+        CONF_TRANSPORT="transport",
+        DEFAULT_TRANSPORT="tinytuya",
+        TRANSPORT_ASYNCIO="asyncio",
+        TRANSPORTS=["tinytuya", "asyncio"],
+        CONF_SEND_QUEUE_OVERFLOW="send_queue_overflow",
+        DEFAULT_SEND_QUEUE_OVERFLOW="reject",
+        CONF_MERGE_COMMANDS="merge_commands",
+        DEFAULT_MERGE_COMMANDS=False,
     )
     _install_module(
         monkeypatch,
         f"{PACKAGE_NAME}.rc_encoder",
-        rc_auto_encode=lambda value: value,
         rc_auto_decode=lambda value, **_kwargs: value,
+        compile_command=lambda value: value,
+        hold_trains=lambda _fmt, pulses, _hold_secs: ([list(pulses)], [0]),
     )
+    _install_module(monkeypatch, f"{PACKAGE_NAME}.rc_batch", canonical_commands=list)
+
+    class TuyaTransportError(Exception):
+        pass
+
+    _install_module(
+        monkeypatch,
+        f"{PACKAGE_NAME}.tuya_transport",
+        TuyaTransport=object,
+        TuyaTransportError=TuyaTransportError,
+        TuyaConnectionError=type("TuyaConnectionError", (TuyaTransportError,), {}),
+        TuyaBatchError=type("TuyaBatchError", (TuyaTransportError,), {}),
+    )
+
+    # These modules only need the stubs above, use the real ones
+    for name in ("tuya_codec", "code_import", "code_export", "code_store", "code_library", "send_queue"):
+        module_spec = importlib.util.spec_from_file_location(
+            f"{PACKAGE_NAME}.{name}", PKG_DIR / f"{name}.py"
+        )
+        module = importlib.util.module_from_spec(module_spec)
+        monkeypatch.setitem(sys.modules, module_spec.name, module)
+        module_spec.loader.exec_module(module)
 
     spec = importlib.util.spec_from_file_location(
         f"{PACKAGE_NAME}.remote", REMOTE_PATH
@@ -280,6 +321,64 @@ def test_available_device_does_not_receive_wake_command(remote_module):
     assert device_class.instance.study_end_calls == 0
 
 
+def _make_async_remote(remote_module, statuses, control_type=1):
+    class Transport:
+        instance = None
+
+        def __init__(self, *_args, control_type=0, **_kwargs):
+            self.control_type = control_type
+            self.busy = False
+            self.status_calls = 0
+            self.study_end_calls = 0
+            self._statuses = iter(statuses)
+            Transport.instance = self
+
+        async def status(self):
+            self.status_calls += 1
+            status = next(self._statuses)
+            if isinstance(status, Exception):
+                raise status
+            return status
+
+        async def study_end(self):
+            self.study_end_calls += 1
+
+    remote_module.TuyaTransport = Transport
+    return remote_module.TuyaRC(
+        "Test",
+        "device-id",
+        "127.0.0.1",
+        "local-key",
+        "3.3",
+        control_type=control_type,
+        transport="asyncio",
+    ), Transport
+
+
+def test_asyncio_transport_wakes_a_silent_device(remote_module):
+    """The asyncio transport gets the same wake probe, on the event loop."""
+
+    remote, transport_class = _make_async_remote(
+        remote_module, [remote_module.TuyaTransportError("No response"), {"201": ""}]
+    )
+    asyncio.run(remote._async_update_availibility())
+
+    assert remote.available is True
+    assert remote._device is None
+    assert transport_class.instance.status_calls == 2
+    assert transport_class.instance.study_end_calls == 1
+
+
+def test_asyncio_transport_does_not_wake_an_unreachable_device(remote_module):
+    remote, transport_class = _make_async_remote(
+        remote_module, [remote_module.TuyaConnectionError("Cannot connect")]
+    )
+    asyncio.run(remote._async_update_availibility())
+
+    assert remote.available is False
+    assert transport_class.instance.study_end_calls == 0
+
+
 def test_platform_declares_single_parallel_request(remote_module):
     """Home Assistant must serialize this remote's polls and actions."""
 
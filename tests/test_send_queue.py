@@ -0,0 +1,174 @@
+"""Tests for the per-hub send queue (send_queue)."""
+
+import asyncio
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+
+ROOT = Path(__file__).resolve().parents[1]
+spec = importlib.util.spec_from_file_location(
+    "send_queue", ROOT / "custom_components" / "localtuya_rc" / "send_queue.py"
+)
+send_queue = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(send_queue)
+
+
+class FakeHub:
+    """Records transmissions; each one waits until released."""
+
+    def __init__(self):
+        self.sent = []
+        self.active = 0
+        self.max_active = 0
+        self.release = asyncio.Event()
+
+    async def send(self, item):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await self.release.wait()
+        self.active -= 1
+        if item == "bad":
+            raise ValueError("cannot send")
+        self.sent.append(item)
+        return f"sent {item}"
+
+
+async def _burst(queue, items):
+    # The worker takes the first item, the others wait behind it
+    tasks = [asyncio.ensure_future(queue.async_send(items[0]))]
+    for _ in range(2):
+        await asyncio.sleep(0)
+    tasks += [asyncio.ensure_future(queue.async_send(item)) for item in items[1:]]
+    await asyncio.sleep(0)
+    return tasks
+
+
+def test_transmissions_run_one_at_a_time_in_order():
+    async def run():
+        hub = FakeHub()
+        queue = send_queue.SendQueue(hub.send)
+        tasks = await _burst(queue, [f"tv_{n}" for n in range(8)])
+        hub.release.set()
+        results = await asyncio.gather(*tasks)
+        return hub, queue, results
+
+    hub, queue, results = asyncio.run(run())
+
+    assert hub.sent == [f"tv_{n}" for n in range(8)]
+    assert results == [f"sent tv_{n}" for n in range(8)]
+    assert hub.max_active == 1
+    assert queue.sent == 8
+
+
+def test_failure_goes_to_its_own_caller():
+    async def run():
+        hub = FakeHub()
+        queue = send_queue.SendQueue(hub.send)
+        tasks = await _burst(queue, ["power", "bad", "mute"])
+        hub.release.set()
+        return hub, await asyncio.gather(*tasks, return_exceptions=True)
+
+    hub, results = asyncio.run(run())
+
+    assert results[0] == "sent power" and results[2] == "sent mute"
+    assert isinstance(results[1], ValueError)
+    assert hub.sent == ["power", "mute"]
+
+
+def test_full_queue_rejects_new_transmissions():
+    async def run():
+        hub = FakeHub()
+        queue = send_queue.SendQueue(hub.send, maxsize=2)
+        # The first one is taken by the worker, two wait
+        tasks = await _burst(queue, ["a", "b", "c", "d"])
+        hub.release.set()
+        return hub, queue, await asyncio.gather(*tasks, return_exceptions=True)
+
+    hub, queue, results = asyncio.run(run())
+
+    assert hub.sent == ["a", "b", "c"]
+    assert isinstance(results[3], send_queue.SendQueueFullError)
+    assert queue.dropped == 1
+
+
+def test_full_queue_drops_the_oldest_waiting_transmission():
+    async def run():
+        hub = FakeHub()
+        queue = send_queue.SendQueue(hub.send, maxsize=2, overflow=send_queue.OVERFLOW_DROP_OLDEST)
+        tasks = await _burst(queue, ["a", "b", "c", "d"])
+        hub.release.set()
+        return hub, await asyncio.gather(*tasks, return_exceptions=True)
+
+    hub, results = asyncio.run(run())
+
+    assert hub.sent == ["a", "c", "d"]
+    assert isinstance(results[1], send_queue.SendQueueFullError)
+
+
+def test_identical_transmissions_are_coalesced_only_when_the_queue_is_full():
+    async def run():
+        hub = FakeHub()
+        queue = send_queue.SendQueue(hub.send, maxsize=2, overflow=send_queue.OVERFLOW_COALESCE)
+        tasks = await _burst(queue, ["a", "up", "up", "up", "down"])
+        hub.release.set()
+        return hub, queue, await asyncio.gather(*tasks, return_exceptions=True)
+
+    hub, queue, results = asyncio.run(run())
+
+    # Both presses that fit are sent, the third shares the last one
+    assert hub.sent == ["a", "up", "up"]
+    assert results[1:4] == ["sent up"] * 3
+    assert isinstance(results[4], send_queue.SendQueueFullError)
+    assert queue.coalesced == 1
+
+
+def test_identical_transmissions_are_all_sent_while_there_is_room():
+    async def run():
+        hub = FakeHub()
+        queue = send_queue.SendQueue(hub.send, overflow=send_queue.OVERFLOW_COALESCE)
+        tasks = await _burst(queue, ["a", "vol_up", "vol_up", "vol_up"])
+        hub.release.set()
+        await asyncio.gather(*tasks)
+        return hub, queue
+
+    hub, queue = asyncio.run(run())
+
+    assert hub.sent == ["a"] + ["vol_up"] * 3
+    assert queue.coalesced == 0
+
+
+def test_cancelled_caller_does_not_cancel_a_shared_transmission():
+    async def run():
+        hub = FakeHub()
+        queue = send_queue.SendQueue(hub.send, maxsize=1, overflow=send_queue.OVERFLOW_COALESCE)
+        tasks = await _burst(queue, ["a", "up", "up"])
+        tasks[1].cancel()
+        hub.release.set()
+        return hub, await asyncio.gather(*tasks, return_exceptions=True)
+
+    hub, results = asyncio.run(run())
+
+    assert hub.sent == ["a", "up"]
+    assert isinstance(results[1], asyncio.CancelledError)
+    assert results[2] == "sent up"
+
+
+def test_stop_cancels_waiting_transmissions():
+    async def run():
+        hub = FakeHub()
+        queue = send_queue.SendQueue(hub.send)
+        tasks = await _burst(queue, ["a", "b"])
+        await queue.async_stop()
+        return queue, await asyncio.gather(*tasks, return_exceptions=True)
+
+    queue, results = asyncio.run(run())
+
+    assert all(isinstance(result, asyncio.CancelledError) for result in results)
+    assert queue.size == 0
+
+
+def test_unknown_overflow_policy_is_rejected():
+    with pytest.raises(ValueError):
+        send_queue.SendQueue(None, overflow="newest")
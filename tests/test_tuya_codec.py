@@ -0,0 +1,86 @@
+"""Tests for the Tuya base64 pulse codec (tuya_codec)."""
+
+import base64
+import importlib.util
+import random
+import struct
+from pathlib import Path
+
+import pytest
+
+
+ROOT = Path(__file__).resolve().parents[1]
+spec = importlib.util.spec_from_file_location(
+    "tuya_codec", ROOT / "custom_components" / "localtuya_rc" / "tuya_codec.py"
+)
+tuya_codec = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(tuya_codec)
+
+
+# tinytuya's Contrib.IRRemoteControlDevice implementation, for reference
+def tinytuya_pulses_to_base64(pulses):
+    fmt = "<" + str(len(pulses)) + "H"
+    return base64.b64encode(struct.pack(fmt, *pulses)).decode("ascii")
+
+
+def tinytuya_base64_to_pulses(code_base_64):
+    if len(code_base_64) % 4 == 1 and code_base_64.startswith("1"):
+        code_base_64 = code_base_64[1:]
+    raw_bytes = base64.b64decode(code_base_64)
+    fmt = "<%dH" % (len(raw_bytes) >> 1)
+    return list(struct.unpack(fmt, raw_bytes))
+
+
+def test_matches_tinytuya_both_ways():
+    rnd = random.Random(0)
+    for length in list(range(10)) + [67, 199, 1000]:
+        pulses = [rnd.randint(0, 0xFFFF) for _ in range(length)]
+        code = tuya_codec.pulses_to_base64(pulses)
+        assert code == tinytuya_pulses_to_base64(pulses)
+        assert tuya_codec.base64_to_pulses(code) == tinytuya_base64_to_pulses(code) == pulses
+
+
+def test_known_code():
+    assert tuya_codec.pulses_to_base64([9000, 4500]) == "KCOUEQ=="
+    assert tuya_codec.base64_to_pulses("KCOUEQ==") == [9000, 4500]
+
+
+def test_strips_leading_one_padding():
+    assert tuya_codec.base64_to_pulses("1KCOUEQ==") == [9000, 4500]
+
+
+def test_accepts_any_iterable():
+    assert tuya_codec.pulses_to_base64(iter((9000, 4500))) == "KCOUEQ=="
+
+
+@pytest.mark.parametrize("pulses", [[0x10000], [-1], [1.5]])
+def test_rejects_durations_that_do_not_fit(pulses):
+    with pytest.raises(ValueError):
+        tuya_codec.pulses_to_base64(pulses)
+
+
+def test_rejects_odd_byte_count():
+    with pytest.raises(ValueError, match="must be even"):
+        tuya_codec.base64_to_pulses(base64.b64encode(b"\x01\x02\x03").decode())
+
+
+def test_merge_pulses_joins_trains_with_the_frame_gap():
+    codes = tuya_codec.merge_pulses([[9000, 4500, 560], [9000, 4500, 560, 1000]], [0, 0])
+
+    assert codes == [(2, [9000, 4500, 560, tuya_codec.FRAME_GAP, 9000, 4500, 560, 1000])]
+
+
+def test_merge_pulses_adds_the_requested_gap_to_the_trailing_space():
+    codes = tuya_codec.merge_pulses([[500, 20000], [500], [500]], [30000, 30000])
+
+    assert codes == [(3, [500, 50000, 500, 30000, 500])]
+
+
+def test_merge_pulses_splits_when_the_gap_or_the_length_does_not_fit():
+    # 70 ms does not fit a duration
+    assert tuya_codec.merge_pulses([[500], [500]], [70000]) == [(1, [500]), (1, [500])]
+    codes = tuya_codec.merge_pulses([[500, 500, 500]] * 5, [0] * 5, max_pulses=8)
+    assert [count for count, _ in codes] == [2, 2, 1]
+    assert all(len(pulses) <= 8 for _, pulses in codes)
+    # Too long on its own, sent as it is
+    assert tuya_codec.merge_pulses([[500] * 9], [0], max_pulses=8) == [(1, [500] * 9)]
@@ -0,0 +1,347 @@
+"""Tests for the asyncio Tuya LAN transport (tuya_transport).
+
+A fake hub on a local socket answers the transport with frames built by the
+same helpers, the way a real hub of each protocol version does.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import importlib.util
+import json
+import struct
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("cryptography")
+
+ROOT = Path(__file__).resolve().parents[1]
+spec = importlib.util.spec_from_file_location(
+    "tuya_transport", ROOT / "custom_components" / "localtuya_rc" / "tuya_transport.py"
+)
+tuya_transport = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(tuya_transport)
+
+LOCAL_KEY = "0123456789abcdef"
+DEV_ID = "bf0123456789abcdef"
+VERSIONS = ["3.1", "3.3", "3.4", "3.5"]
+
+
+class FakeHub:
+    """A hub of control type 1 answering queries and reporting a learned code."""
+
+    def __init__(self, version, local_key=LOCAL_KEY, learned="AAAA", drop_after=None, push_status=False, device22=False):
+        self.version = float(version)
+        self.local_key = local_key.encode()
+        self.learned = learned
+        # Close the connection after this many commands
+        self.drop_after = drop_after
+        # Report the changed data points after each command, as hubs do
+        self.push_status = push_status
+        # Reject DP_QUERY, answer the device22 query (CONTROL_NEW) instead
+        self.device22 = device22
+        self.received = []
+        self.connections = 0
+        self._header = version.encode() + bytes(12)
+
+    async def __aenter__(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, *_args):
+        self._server.close()
+        await self._server.wait_closed()
+
+    def transport(self, **kwargs):
+        kwargs.setdefault("control_type", 1)
+        return tuya_transport.TuyaTransport(DEV_ID, "127.0.0.1", LOCAL_KEY, self.version, port=self.port, **kwargs)
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        self._key = self.local_key
+        self._seqno = 0
+        commands = len(self.received)
+        try:
+            while self.drop_after is None or len(self.received) - commands < self.drop_after:
+                cmd, payload = await self._read(reader)
+                if cmd == tuya_transport.SESS_KEY_NEG_START:
+                    self._local_nonce, remote_nonce = payload, b"0123456789ABCDEF"
+                    self._remote_nonce = remote_nonce
+                    proof = hmac.new(self.local_key, payload, hashlib.sha256).digest()
+                    self._write(writer, tuya_transport.SESS_KEY_NEG_RESP, remote_nonce + proof, header=False)
+                elif cmd == tuya_transport.SESS_KEY_NEG_FINISH:
+                    self._key = tuya_transport.session_key(self.version, self.local_key, self._local_nonce, self._remote_nonce)
+                else:
+                    self._command(writer, cmd, json.loads(payload))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, tuya_transport.InvalidTag):
+            pass
+        finally:
+            writer.close()
+
+    def _command(self, writer, cmd, data):
+        self.received.append((cmd, data))
+        if self.device22 and cmd == tuya_transport.DP_QUERY:
+            self._write(writer, cmd, b"json obj data unvalid", header=False)
+            return
+        if self.device22 and cmd == tuya_transport.CONTROL_NEW:
+            self._write(writer, cmd, {"dps": {"201": "", "202": ""}}, header=False)
+            return
+        if cmd in (tuya_transport.DP_QUERY, tuya_transport.DP_QUERY_NEW):
+            self._write(writer, cmd, {"dps": {"201": "", "202": ""}}, header=False)
+            return
+        # An ack, then the study report
+        self._write(writer, cmd, b"", header=False)
+        dps = data.get("dps") or data["data"]["dps"]
+        if self.push_status:
+            self._write(writer, tuya_transport.STATUS, {"dps": {"201": dps.get("201")}})
+        if json.loads(dps.get("201", "{}")).get("control") == "study":
+            self._write(writer, tuya_transport.STATUS, {"dps": {"202": self.learned}})
+
+    async def _read(self, reader):
+        prefix = await reader.readexactly(4)
+        if prefix == b"\x00\x00\x66\x99":
+            header = prefix + await reader.readexactly(tuya_transport.HEADER_6699.size - 4)
+            length = tuya_transport.HEADER_6699.unpack(header)[4]
+            body = await reader.readexactly(length + 4)
+            iv, data = body[:12], body[12:-4]
+            _, _, _, cmd, _ = tuya_transport.HEADER_6699.unpack(header)
+            payload = tuya_transport.AESGCM(self._key).decrypt(iv, data, header[4:])
+        else:
+            header = prefix + await reader.readexactly(12)
+            _, _, cmd, length = tuya_transport.HEADER_55AA.unpack(header)
+            end = 36 if self.version >= 3.4 else 8
+            payload = (await reader.readexactly(length))[:-end]
+            if self.version >= 3.4:
+                payload = tuya_transport.decrypt_ecb(self._key, payload)
+            elif self.version >= 3.2:
+                if cmd not in tuya_transport.NO_VERSION_HEADER:
+                    payload = payload[len(self._header):]
+                payload = tuya_transport.decrypt_ecb(self._key, payload)
+            elif payload.startswith(b"3.1"):
+                payload = tuya_transport.decrypt_ecb(self._key, tuya_transport.base64.b64decode(payload[19:]))
+        if payload.startswith(self._header):
+            payload = payload[len(self._header):]
+        return cmd, payload
+
+    def _write(self, writer, cmd, data, header=True):
+        # header: add the version header, as hubs do for reports
+        if isinstance(data, dict):
+            data = json.dumps(data).encode()
+        if data and header and self.version >= 3.2:
+            data = self._header + data if self.version >= 3.4 else data
+        self._seqno += 1
+        if self.version >= 3.5:
+            frame = tuya_transport.pack_message_6699(self._seqno, cmd, data, self._key, retcode=0)
+        elif self.version >= 3.4:
+            frame = tuya_transport.pack_message(
+                self._seqno, cmd, tuya_transport.encrypt_ecb(self._key, data), hmac_key=self._key, retcode=0
+            )
+        elif self.version >= 3.2 and data:
+            encrypted = tuya_transport.encrypt_ecb(self._key, data)
+            frame = tuya_transport.pack_message(
+                self._seqno, cmd, (self._header if header else b"") + encrypted, retcode=0
+            )
+        else:
+            frame = tuya_transport.pack_message(self._seqno, cmd, data, retcode=0)
+        writer.write(frame)
+
+
+@pytest.mark.parametrize("version", VERSIONS)
+def test_status_detects_the_control_type(version):
+    async def run():
+        async with FakeHub(version) as hub:
+            transport = hub.transport(control_type=0)
+            dps = await transport.status()
+            return dps, transport.control_type, hub
+
+    dps, control_type, hub = asyncio.run(run())
+
+    assert dps == {"201": "", "202": ""}
+    assert control_type == 1
+    assert hub.connections == 1
+
+
+@pytest.mark.parametrize("version", VERSIONS)
+def test_send_ir_sets_the_send_dp(version):
+    async def run():
+        async with FakeHub(version) as hub:
+            await hub.transport().send_ir("AQID")
+            # Let the hub read the command
+            await asyncio.sleep(0.05)
+            return hub.received
+
+    (cmd, data), = asyncio.run(run())
+
+    assert cmd == (tuya_transport.CONTROL_NEW if float(version) >= 3.4 else tuya_transport.CONTROL)
+    dps = data["data"]["dps"] if float(version) >= 3.4 else data["dps"]
+    assert json.loads(dps["201"]) == {"control": "send_ir", "type": 0, "head": "", "key1": "1AQID"}
+
+
+@pytest.mark.parametrize("version", VERSIONS)
+def test_study_returns_the_learned_code(version):
+    async def run():
+        async with FakeHub(version, learned="IyMj") as hub:
+            code = await hub.transport().study(timeout=2)
+            await asyncio.sleep(0.05)
+            return code, hub.received
+
+    code, received = asyncio.run(run())
+
+    assert code == "IyMj"
+    controls = [json.loads((data.get("dps") or data["data"]["dps"])["201"])["control"] for _, data in received]
+    assert controls == ["study_exit", "study", "study_exit"]
+
+
+def test_study_times_out_without_a_button_press():
+    async def run():
+        async with FakeHub("3.3", learned=None) as hub:
+            hub.learned = None
+            transport = hub.transport()
+            # Control type 2 has no study report in the fake hub
+            transport.control_type = 2
+            return await transport.study(timeout=0.2)
+
+    assert asyncio.run(run()) is None
+
+
+def test_send_rf_keeps_the_version_of_the_code():
+    code = tuya_transport.base64.b64encode(json.dumps({"ver": "3", "data": "x"}).encode()).decode()
+
+    async def run():
+        async with FakeHub("3.3") as hub:
+            await hub.transport().send_rf(code)
+            await asyncio.sleep(0.05)
+            return hub.received
+
+    (_, data), = asyncio.run(run())
+
+    command = json.loads(data["dps"]["201"])
+    assert command["control"] == "rfstudy_send"
+    assert command["ver"] == command["key1"]["ver"] == "3"
+    assert command["key1"]["code"] == code
+
+
+@pytest.mark.parametrize("version", ["3.4", "3.5"])
+def test_wrong_local_key_fails_the_session_negotiation(version):
+    async def run():
+        async with FakeHub(version, local_key="fedcba9876543210") as hub:
+            await hub.transport().status()
+
+    with pytest.raises(tuya_transport.TuyaTransportError, match="local key"):
+        asyncio.run(run())
+
+
+def test_unreachable_hub_raises_a_connection_error():
+    async def run():
+        async with FakeHub("3.3") as hub:
+            port = hub.port
+        transport = tuya_transport.TuyaTransport(DEV_ID, "127.0.0.1", LOCAL_KEY, 3.3, port=port, timeout=1)
+        await transport.status()
+
+    with pytest.raises(tuya_transport.TuyaConnectionError):
+        asyncio.run(run())
+
+
+def test_persistent_connection_is_reused_and_reopened_once_dropped():
+    async def run():
+        async with FakeHub("3.4", drop_after=2) as hub:
+            transport = hub.transport(persistent=True)
+            for _ in range(3):
+                await transport.status()
+            connections = hub.connections
+            await transport.close()
+            return connections
+
+    # The hub closed the connection after the second query
+    assert asyncio.run(run()) == 2
+
+
+def test_frames_round_trip_and_reject_bad_checksums():
+    frame = tuya_transport.pack_message(7, tuya_transport.STATUS, b"{}", retcode=1)
+
+    assert tuya_transport.unpack_message(frame) == tuya_transport.TuyaMessage(7, tuya_transport.STATUS, 1, b"{}")
+    corrupt = frame[:-9] + bytes([frame[-9] ^ 1]) + frame[-8:]
+    with pytest.raises(tuya_transport.TuyaTransportError, match="checksum"):
+        tuya_transport.unpack_message(corrupt)
+
+    key = LOCAL_KEY.encode()
+    frame = tuya_transport.pack_message_6699(8, tuya_transport.STATUS, b"{}", key, retcode=0)
+    assert tuya_transport.unpack_message(frame, key).payload == b"{}"
+    with pytest.raises(tuya_transport.TuyaTransportError, match="authentication"):
+        tuya_transport.unpack_message(frame, b"fedcba9876543210")
+
+
+def test_3_3_frames_match_the_reference_layout():
+    # 55AA, seqno, command, length, payload, CRC32, AA55
+    frame = tuya_transport.pack_message(1, tuya_transport.DP_QUERY, b"{}")
+
+    assert struct.unpack(">4I", frame[:16]) == (0x55AA, 1, 0x0A, 2 + 8)
+    assert frame[16:18] == b"{}"
+    assert frame[-4:] == b"\x00\x00\xaa\x55"
+
+
+def test_send_batch_uses_one_connection():
+    async def run():
+        async with FakeHub("3.4") as hub:
+            await hub.transport().send_batch([("ir", "AQID", 0.01), ("ir", "BAUG", 0), ("ir", "AQID", 0)])
+            await asyncio.sleep(0.05)
+            return hub.connections, hub.received
+
+    connections, received = asyncio.run(run())
+
+    assert connections == 1
+    assert [json.loads(data["data"]["dps"]["201"])["key1"] for _, data in received] == ["1AQID", "1BAUG", "1AQID"]
+
+
+def test_send_batch_reports_the_failed_command():
+    async def run():
+        async with FakeHub("3.3") as hub:
+            port = hub.port
+        transport = tuya_transport.TuyaTransport(DEV_ID, "127.0.0.1", LOCAL_KEY, 3.3, control_type=1, port=port, timeout=1)
+        await transport.send_batch([("ir", "AQID", 0), ("ir", "BAUG", 0)])
+
+    with pytest.raises(tuya_transport.TuyaBatchError) as exc_info:
+        asyncio.run(run())
+
+    assert exc_info.value.index == 0
+    assert isinstance(exc_info.value.__cause__, tuya_transport.TuyaConnectionError)
+
+
+@pytest.mark.parametrize("version", VERSIONS)
+def test_status_skips_reports_pushed_after_commands(version):
+    async def run():
+        async with FakeHub(version, push_status=True, learned="IyMj") as hub:
+            transport = hub.transport(persistent=True)
+            await transport.send_ir("AQID")
+            await transport.send_ir("BAUG")
+            # Let the reports reach the connection before the query
+            await asyncio.sleep(0.05)
+            dps = await transport.status()
+            code = await transport.study(timeout=2)
+            await transport.close()
+            return dps, code, hub.connections
+
+    dps, code, connections = asyncio.run(run())
+
+    assert dps == {"201": "", "202": ""}
+    assert code == "IyMj"
+    assert connections == 1
+
+
+def test_status_retries_with_the_device22_query():
+    async def run():
+        async with FakeHub("3.3", device22=True) as hub:
+            transport = hub.transport(control_type=0)
+            first = await transport.status()
+            second = await transport.status()
+            return first, second, transport.control_type, [cmd for cmd, _ in hub.received]
+
+    first, second, control_type, commands = asyncio.run(run())
+
+    assert first == second == {"201": "", "202": ""}
+    assert control_type == 1
+    # Rejected once, then the device22 query only
+    assert commands == [tuya_transport.DP_QUERY] + [tuya_transport.CONTROL_NEW] * 2